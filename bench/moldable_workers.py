@@ -0,0 +1,107 @@
+# coding: utf-8
+"""
+Search time of the alternatives of a moldable job, sequentially and with
+KAMELOT_MOLDABLE_WORKERS forked processes (see find_mld_alternatives), compared to
+the cost of a process pool kept for a whole scheduling round: such a pool does not
+see the slot set modified by each scheduled job, the slot set would have to be
+pickled to the workers for each moldable job.
+
+Usage: python bench/moldable_workers.py [nb_nodes] [nb_jobs] [nb_workers]
+"""
+import copyreg
+import multiprocessing
+import pickle
+import random
+import sys
+import time
+import types
+
+from procset import ProcSet
+
+from oar.kao.scheduling import (
+    find_first_suitable_contiguous_slots,
+    find_mld_alternatives,
+)
+from oar.kao.slot import Slot, SlotSet
+from oar.lib.job_handling import JobPseudo
+
+# empty timesharing and placeholder dicts of slots are shared read-only mappings
+copyreg.pickle(types.MappingProxyType, lambda m: (dict, (dict(m),)))
+
+
+def gantt(nb_nodes, nb_jobs):
+    random.seed(0)
+    res = ProcSet((1, nb_nodes * 8))
+    hy = {"node": [ProcSet((i * 8 + 1, i * 8 + 8)) for i in range(nb_nodes)]}
+    slot_set = SlotSet(Slot(1, 0, 0, res, 0, 10**7))
+    jobs = []
+    for i in range(nb_jobs):
+        b = random.randint(0, nb_nodes - 4)
+        jobs.append(
+            JobPseudo(
+                id=i,
+                start_time=i * 100,
+                walltime=random.randint(50, 5000),
+                res_set=ProcSet((b * 8 + 1, (b + random.randint(1, 3)) * 8)),
+                ts=False,
+                ph=0,
+            )
+        )
+    slot_set.split_slots_jobs(jobs)
+    mld_res_rqts = [
+        (k, 3600 * k, [([("node", nb_nodes // (k + 1))], res)]) for k in range(1, 5)
+    ]
+    job = JobPseudo(id=-1, key_cache={}, mld_res_rqts=mld_res_rqts, ts=False, ph=0)
+    return slot_set, job, hy
+
+
+def mean_time(f, n=5):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        f()
+    return (time.perf_counter() - t0) / n
+
+
+def noop(i):
+    return i
+
+
+def pool_fork(ctx, nb_workers):
+    with ctx.Pool(nb_workers) as pool:
+        pool.map(noop, range(nb_workers))
+
+
+if __name__ == "__main__":
+    nb_nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    nb_jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    nb_workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    slot_set, job, hy = gantt(nb_nodes, nb_jobs)
+    ctx = multiprocessing.get_context("fork")
+    snapshot = pickle.dumps((slot_set, job, hy, -1, None))
+
+    print("# nb_nodes, nb_slots:", nb_nodes, len(slot_set.slots))
+    print(
+        "sequential search:",
+        mean_time(
+            lambda: [
+                find_first_suitable_contiguous_slots(slot_set, job, res_rqt, hy, -1)
+                for res_rqt in job.mld_res_rqts
+            ]
+        ),
+    )
+    print(
+        "forked workers search:",
+        mean_time(lambda: find_mld_alternatives(slot_set, job, hy, -1, nb_workers)),
+    )
+    print(
+        "pool fork only:",
+        mean_time(lambda: pool_fork(ctx, nb_workers)),
+    )
+    print(
+        "slot set pickling (round pool):",
+        mean_time(lambda: pickle.dumps((slot_set, job, hy, -1, None))),
+    )
+    print(
+        "slot set unpickling (round pool):", mean_time(lambda: pickle.loads(snapshot))
+    )
@@ -0,0 +1,107 @@
+# coding: utf-8
+"""
+Per scheduling round write time of the gantt (save_assigns and
+update_gantt_visualization) with INSERT statements (default mode) and with COPY
+(copy mode of SCHEDULER_SAVE_ASSIGNS_MODE).
+
+Needs a PostgreSQL database with the OAR schema, set by the usual DB_* variables
+below. Usage: python bench/save_assigns_copy.py [nb_rounds] [job_size]
+
+With PostgreSQL 16 on a single core, save_assigns of 512 jobs of 1000 resources
+(512000 rows of gantt_jobs_resources) takes 6.9s with INSERT statements and 2.0s
+with COPY, 0.79s and 0.22s for 64 jobs.
+"""
+import os
+import sys
+import tempfile
+import time
+
+from procset import ProcSet
+
+from oar.kao.meta_sched import update_gantt_visualization
+from oar.kao.simsim import ResourceSetSimu
+from oar.lib import (
+    GanttJobsPrediction,
+    GanttJobsPredictionsVisu,
+    GanttJobsResource,
+    GanttJobsResourcesVisu,
+    config,
+    db,
+)
+from oar.lib.job_handling import JobPseudo, is_copy_available, save_assigns
+
+nb_max_res = 200000
+rs = ResourceSetSimu(rid_o2i=range(nb_max_res))
+
+
+def create_db():
+    config.clear()
+    config.update(config.DEFAULT_CONFIG)
+    tempdir = tempfile.mkdtemp()
+    config["LOG_FILE"] = os.path.join(tempdir, "oar.log")
+    config["DB_TYPE"] = "Pg"
+    config["DB_PORT"] = os.environ.get("DB_PORT", "5432")
+    config["DB_BASE_NAME"] = os.environ.get("DB_BASE_NAME", "oar")
+    config["DB_BASE_PASSWD"] = os.environ.get("DB_BASE_PASSWD", "oar")
+    config["DB_BASE_LOGIN"] = os.environ.get("DB_BASE_LOGIN", "oar")
+    config["DB_HOSTNAME"] = os.environ.get("DB_HOSTNAME", "localhost")
+
+    db.create_all()
+
+
+def delete_tables():
+    for model in (
+        GanttJobsPrediction,
+        GanttJobsResource,
+        GanttJobsPredictionsVisu,
+        GanttJobsResourcesVisu,
+    ):
+        db.query(model).delete()
+    db.commit()
+
+
+def generate_jobs(nb_jobs, job_size):
+    # jobs do not exist in the jobs table, their messages are not updated
+    return {
+        i: JobPseudo(
+            id=-i,
+            moldable_id=i,
+            start_time=10,
+            walltime=60,
+            type="PASSIVE",
+            res_set=ProcSet((0, job_size - 1)),
+        )
+        for i in range(1, nb_jobs + 1)
+    }
+
+
+def bench_rounds(nb_rounds, job_size, save_assigns_mode):
+    config["SCHEDULER_SAVE_ASSIGNS_MODE"] = save_assigns_mode
+    print("# bench:", save_assigns_mode)
+    print("# nb_jobs, job_size, save_assigns time, update_gantt_visualization time")
+    for r in range(nb_rounds):
+        nb_jobs = 2**r
+        jobs = generate_jobs(nb_jobs, job_size)
+        delete_tables()
+
+        t0 = time.time()
+        save_assigns(jobs, rs)
+        t1 = time.time()
+        update_gantt_visualization()
+        t2 = time.time()
+        print(nb_jobs, job_size, t1 - t0, t2 - t1)
+
+    delete_tables()
+
+
+if __name__ == "__main__":
+    nb_rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    job_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    create_db()
+    if not is_copy_available():
+        print("PostgreSQL (psycopg2) database is needed")
+        sys.exit(1)
+
+    bench_rounds(nb_rounds, job_size, "default")
+    bench_rounds(nb_rounds, job_size, "copy")
@@ -1,10 +1,15 @@
+import itertools
 import os
+import threading
+from contextvars import ContextVar
 
 from fastapi import FastAPI, Request
+from sqlalchemy.util import ScopedRegistry
 
 # from oar import VERSION
 from oar.lib import config, db
 
+from .dependencies import dispose_read_engine
 from .query import APIQuery, APIQueryCollection
 from .routers import frontend, job, media, proxy, resource, stress_factor
 
@@ -18,6 +23,19 @@ default_config = {
 }
 
 
+# Database sessions are scoped by request (see the request_session middleware), and
+# by thread outside of requests
+request_scope = ContextVar("request_scope", default=None)
+request_counter = itertools.count()
+
+
+def session_scope():
+    scope = request_scope.get()
+    if scope is None:
+        return threading.get_ident()
+    return scope
+
+
 class WSGIProxyFix(object):
     def __init__(self, app):
         self.app = app
@@ -54,30 +72,48 @@ def create_app():
     app.include_router(media.router)
     app.include_router(stress_factor.router)
 
-    @app.middleware("http")
-    async def reflect_database(request: Request, call_next):
+    @app.on_event("startup")
+    def setup_database():
+        # Reflection is done once for all the requests
         db.reflect()
-        # Calls next middleware
-        response = await call_next(request)
-        return response
+        app.state.session_registry = ScopedRegistry(
+            db.session.session_factory, session_scope
+        )
+        db.session.registry = app.state.session_registry
 
     @app.middleware("http")
     async def authenticate(request: Request, call_next):
-        current_user = request.scope.get("USER", None)
-        if current_user is not None:
-            os.environ["OARDO_USER"] = current_user
-        else:
-            if "OARDO_USER" in os.environ:
-                del os.environ["OARDO_USER"]
+        # The user is kept in the request, the environment is shared by all the
+        # requests served by the process
+        request.state.user = request.scope.get("USER", None)
 
         # Calls next middleware
         response = await call_next(request)
         return response
 
+    @app.middleware("http")
+    async def request_session(request: Request, call_next):
+        token = request_scope.set(("request", next(request_counter)))
+        try:
+            # Calls next middleware
+            response = await call_next(request)
+        finally:
+            # Gives the connection of the session of the request back to the pool
+            registry = request.app.state.session_registry
+            if registry.has():
+                registry().close()
+                registry.clear()
+            request_scope.reset(token)
+        return response
+
     @app.on_event("shutdown")
     def shutdown_db_session():
         db.session.remove()
 
+    @app.on_event("shutdown")
+    async def shutdown_read_engine():
+        await dispose_read_engine()
+
     app.add_middleware(WSGIProxyFix)
     return app
 
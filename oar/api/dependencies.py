@@ -1,15 +1,63 @@
-from typing import Optional
+from fastapi import HTTPException, Request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 
-from fastapi import Header, HTTPException
+from oar.lib import db
+from oar.lib.database import EngineConnector
 
+# Asynchronous drivers of the read-only engine, by database backend
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
 
-async def need_authentication(x_remote_ident: Optional[str] = Header(None)):
-    if x_remote_ident is None:
+# Engine of the read-only sessions, created at the first read (see get_read_engine)
+read_engine = None
+
+
+def request_user(request: Request):
+    # Set by the authenticate middleware from the authenticated user of the request
+    return getattr(request.state, "user", request.scope.get("USER", None))
+
+
+async def need_authentication(request: Request):
+    user = request_user(request)
+    if user is None:
         raise HTTPException(status_code=403)
-    return x_remote_ident
+    return user
+
+
+async def get_user(request: Request):
+    return request_user(request)
+
+
+def create_read_engine(uri):
+    """Create an asynchronous engine on the database of `uri`, with the pool
+    settings (SQLALCHEMY_POOL_*) of the synchronous engine."""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    url = url.set(drivername=ASYNC_DRIVERS.get(backend, url.drivername))
+    options = {}
+    if backend != "sqlite":
+        EngineConnector(db).apply_pool_defaults(options)
+    return create_async_engine(url, **options)
+
+
+def get_read_engine():
+    global read_engine
+
+    if read_engine is None:
+        read_engine = create_read_engine(db.uri_ro)
+    return read_engine
+
+
+async def dispose_read_engine():
+    global read_engine
+
+    if read_engine is not None:
+        await read_engine.dispose()
+        read_engine = None
 
 
-async def get_user(x_remote_ident: Optional[str] = Header(None)):
-    if x_remote_ident is None:
-        return None
-    return x_remote_ident
+async def get_read_session():
+    """Asynchronous session on the read-only database (DB_BASE_LOGIN_RO), used by
+    the read endpoints, closed at the end of the request."""
+    async with AsyncSession(get_read_engine()) as session:
+        yield session
@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 from math import ceil
 
+from fastapi import HTTPException
 from flask import abort, current_app
+from sqlalchemy import func, select
 
+from oar.lib import config
 from oar.lib.basequery import BaseQuery, BaseQueryCollection
 
 # from oar.lib.models import (db, Job, Resource)
@@ -29,6 +32,36 @@ class APIQuery(BaseQuery):
             abort(404)
         return PaginationQuery(self, offset, limit, error_out)
 
+    async def paginate_async(self, session, offset, limit, error_out=True):
+        """Paginate the query, executed by the asynchronous `session`."""
+        if limit is None:
+            limit = config.get("API_DEFAULT_MAX_ITEMS_NUMBER")
+        if error_out and offset < 0:
+            raise HTTPException(status_code=404)
+        query = self.limit(limit).offset(offset)
+        result = await session.execute(query.statement)
+        # Like Query.all(), a query of one entity gives entities, not rows
+        descriptions = self.column_descriptions
+        if (
+            len(descriptions) == 1
+            and descriptions[0]["expr"] is descriptions[0]["entity"]
+        ):
+            items = result.scalars().all()
+        else:
+            items = result.all()
+
+        # No need to count if we're on the first page and there are fewer
+        # items than we expected.
+        if offset == 0 and len(items) < limit:
+            total = len(items)
+        else:
+            subquery = self.order_by(None).statement.subquery()
+            total = await session.scalar(select(func.count()).select_from(subquery))
+
+        if not items and offset != 0 and error_out:
+            raise HTTPException(status_code=404)
+        return AsyncPaginationQuery(query, offset, limit, items, total)
+
 
 class PaginationQuery(object):
     """Internal helper class returned by :meth:`APIBaseQuery.paginate`."""
@@ -86,5 +119,16 @@ class PaginationQuery(object):
                 yield item
 
 
+class AsyncPaginationQuery(PaginationQuery):
+    """Internal helper class returned by :meth:`APIQuery.paginate_async`."""
+
+    def __init__(self, query, offset, limit, items, total):
+        self.query = query
+        self.items = items
+        self.offset = offset
+        self.limit = limit
+        self.total = total
+
+
 class APIQueryCollection(BaseQueryCollection):
     pass
@@ -4,14 +4,20 @@ from typing import List, Optional
 
 from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from oar.cli.oardel import oardel
 from oar.cli.oarhold import oarhold
 from oar.cli.oarresume import oarresume
 from oar.lib import Job, db
-from oar.lib.submission import JobParameters, Submission, check_reservation
+from oar.lib.submission import (
+    JobParameters,
+    Submission,
+    add_micheline_jobs_batch,
+    check_reservation,
+)
 
-from ..dependencies import need_authentication
+from ..dependencies import get_read_session, need_authentication
 from . import TimestampRoute
 
 router = APIRouter(
@@ -40,9 +46,16 @@ def attach_nodes(job, jobs_resources):
             network_addresses.append(node["network_address"])
 
 
+async def get_assigned_jobs_resources(session, jobs):
+    """Read the assigned resources of `jobs` with the asynchronous `session`."""
+    query = db.queries.get_assigned_jobs_resources_query(jobs)
+    result = await session.execute(query.statement)
+    return db.queries.groupby_jobs_resources(jobs, result)
+
+
 @router.get("")
 @router.get("/")
-def index(
+async def index(
     user: str = None,
     start_time: int = None,
     stop_time: int = None,
@@ -52,19 +65,20 @@ def index(
     details: str = None,
     offset: int = 0,
     limit: int = 500,
+    session: AsyncSession = Depends(get_read_session),
 ):
     # import pdb; pdb.set_trace()
     query = db.queries.get_jobs_for_user(
         user, start_time, stop_time, states, job_ids, array, None, details
     )
     data = {}
-    page = query.paginate(offset, limit)
+    page = await query.paginate_async(session, offset, limit)
     data["total"] = page.total
     data["offset"] = offset
     data["items"] = []
 
     if details:
-        jobs_resources = db.queries.get_assigned_jobs_resources(page.items)
+        jobs_resources = await get_assigned_jobs_resources(session, page.items)
         pass
     for item in page:
         if details:
@@ -76,13 +90,19 @@ def index(
 
 
 @router.get("/{job_id}")
-def show(job_id: int, details: Optional[bool] = None):
-    job = db.query(Job).get_or_404(job_id)
+async def show(
+    job_id: int,
+    details: Optional[bool] = None,
+    session: AsyncSession = Depends(get_read_session),
+):
+    job = await session.get(Job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
     data = job.asdict()
     if details:
         job = Job()
         job.id = job_id
-        job_resources = db.queries.get_assigned_jobs_resources([job])
+        job_resources = await get_assigned_jobs_resources(session, [job])
         attach_resources(data, job_resources)
         # attach_nodes(data, job_resources)
 
@@ -100,15 +120,16 @@ def nodes(
 
 
 @router.get("/{job_id}/resources")
-def get_resources(
+async def get_resources(
     job_id: int,
     offset: int = 0,
     limit: int = 500,
+    session: AsyncSession = Depends(get_read_session),
 ):
     job = Job()
     job.id = job_id
     query = db.queries.get_assigned_one_job_resources(job)
-    page = query.paginate(offset, limit)
+    page = await query.paginate_async(session, offset, limit)
     data = {}
     data["total"] = page.total
     data["offset"] = offset
@@ -149,6 +170,67 @@ class SumbitParameters(BaseModel):
     use_job_key: bool = Body(False, alias="use-job-key")
 
 
+def submit_job_parameters(sp, user):
+    """Build the JobParameters of a submission"""
+    initial_request = ""  # TODO Json version ?
+
+    reservation_date = 0
+    if sp.reservation:
+        (error, reservation_date) = check_reservation(sp.reservation)
+        if error[0] != 0:
+            pass  # TODO
+
+    if sp.command and re.match(r".*\$HOME.*", sp.command):
+        sp.command = sp.command.replace("$HOME", os.path.expanduser("~" + user))
+
+    if sp.directory and re.match(r".*\$HOME.*", sp.directory):
+        sp.directory = sp.directory.replace("$HOME", os.path.expanduser("~" + user))
+
+    if sp.workdir and re.match(r".*\$HOME.*", sp.workdir):
+        sp.workdir = sp.workdir.replace("$HOME", os.path.expanduser("~" + user))
+
+    array_params = []
+    # array_nb = 1 # TODO
+    if sp.param_file:
+        array_params = sp.param_file.split("\n")
+        # array_nb = len(array_params)
+    # if not isinstance(resource, list):
+    #    resource = [resource]
+
+    job_parameters = JobParameters(
+        job_type="PASSIVE",
+        command=sp.command,
+        resource=sp.resource,
+        workdir=sp.workdir,  # TODO
+        array_params=array_params,
+        array=sp.array,
+        # scanscript=scanscript, TODO
+        queue=sp.queue,
+        properties=sp.properties,
+        reservation=reservation_date,
+        checkpoint=sp.checkpoint,
+        signal=sp.signal,
+        types=sp.types,
+        directory=sp.directory,
+        project=sp.project,
+        initial_request=initial_request,
+        user=user,
+        name=sp.name,
+        dependencies=sp.dependencies,
+        notify=sp.notify,
+        resubmit=sp.resubmit,
+        use_job_key=sp.use_job_key,
+        import_job_key_from_file=sp.import_job_key_from_file,
+        import_job_key_inline=sp.import_job_key_inline,
+        export_job_key_to_file=sp.export_job_key_to_file,
+        stdout=sp.stdout,
+        stderr=sp.stderr,
+        hold=sp.hold,
+    )
+
+    return job_parameters
+
+
 @router.post("")
 @router.post("/")
 def submit(sp: SumbitParameters, user: str = Depends(need_authentication)):
@@ -242,61 +324,7 @@ def submit(sp: SumbitParameters, user: str = Depends(need_authentication)):
         Note: up to now yaml is no supported, only json and html form.
 
     """
-    initial_request = ""  # TODO Json version ?
-
-    reservation_date = 0
-    if sp.reservation:
-        (error, reservation_date) = check_reservation(sp.reservation)
-        if error[0] != 0:
-            pass  # TODO
-
-    if sp.command and re.match(r".*\$HOME.*", sp.command):
-        sp.command = sp.command.replace("$HOME", os.path.expanduser("~" + user))
-
-    if sp.directory and re.match(r".*\$HOME.*", sp.directory):
-        sp.directory = sp.directory.replace("$HOME", os.path.expanduser("~" + user))
-
-    if sp.workdir and re.match(r".*\$HOME.*", sp.workdir):
-        sp.workdir = sp.workdir.replace("$HOME", os.path.expanduser("~" + user))
-
-    array_params = []
-    # array_nb = 1 # TODO
-    if sp.param_file:
-        array_params = sp.param_file.split("\n")
-        # array_nb = len(array_params)
-    # if not isinstance(resource, list):
-    #    resource = [resource]
-
-    job_parameters = JobParameters(
-        job_type="PASSIVE",
-        command=sp.command,
-        resource=sp.resource,
-        workdir=sp.workdir,  # TODO
-        array_params=array_params,
-        array=sp.array,
-        # scanscript=scanscript, TODO
-        queue=sp.queue,
-        properties=sp.properties,
-        reservation=reservation_date,
-        checkpoint=sp.checkpoint,
-        signal=sp.signal,
-        types=sp.types,
-        directory=sp.directory,
-        project=sp.project,
-        initial_request=initial_request,
-        user=user,
-        name=sp.name,
-        dependencies=sp.dependencies,
-        notify=sp.notify,
-        resubmit=sp.resubmit,
-        use_job_key=sp.use_job_key,
-        import_job_key_from_file=sp.import_job_key_from_file,
-        import_job_key_inline=sp.import_job_key_inline,
-        export_job_key_to_file=sp.export_job_key_to_file,
-        stdout=sp.stdout,
-        stderr=sp.stderr,
-        hold=sp.hold,
-    )
+    job_parameters = submit_job_parameters(sp, user)
 
     # import pdb; pdb.set_trace()
 
@@ -324,6 +352,35 @@ def submit(sp: SumbitParameters, user: str = Depends(need_authentication)):
     # TODO cmd_output:
 
 
+@router.post("/batch")
+def submit_batch(sps: List[SumbitParameters], user: str = Depends(need_authentication)):
+    """Submission of several independent jobs at once
+
+    The input is a list of job submissions with the same keys as the job
+    submission, array jobs and job keys are not supported. The admission rules
+    are applied once and the jobs are inserted in a single transaction: either
+    all the jobs are submitted or none of them.
+
+    Output json example
+    {"ids": [4, 5, 6]}
+    """
+    jobs_parameters = []
+    for idx, sp in enumerate(sps):
+        job_parameters = submit_job_parameters(sp, user)
+        error = job_parameters.check_parameters()
+        if error[0] != 0:
+            raise HTTPException(
+                status_code=400, detail="job {}: {}".format(idx, error[1])
+            )
+        jobs_parameters.append(job_parameters)
+
+    (error, job_id_lst) = add_micheline_jobs_batch(jobs_parameters)
+    if error[0] != 0:
+        raise HTTPException(status_code=400, detail=error[1])
+
+    return {"ids": job_id_lst}
+
+
 # @app.route("/<int:job_id>", methods=["DELETE"])
 # @app.route("/<any(array):array>/<int:job_id>", methods=["DELETE"])
 # @app.route("/<int:job_id>/deletions/new", methods=["POST", "DELETE"])
@@ -3,16 +3,17 @@ from typing import Optional
 
 from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import oar.lib.tools as tools
 from oar.lib import Resource, db
 from oar.lib.resource_handling import (
-    get_count_busy_resources,
+    get_count_busy_resources_query,
     remove_resource,
     set_resource_state,
 )
 
-from ..dependencies import need_authentication
+from ..dependencies import get_read_session, need_authentication
 from ..url_utils import replace_query_params
 from . import TimestampRoute
 
@@ -45,11 +46,12 @@ def get_db():
 
 @router.get("")
 @router.get("/")
-def index(
+async def index(
     offset: int = 0,
     limit: int = 25,
     detailed: bool = Query(False),
     network_address: Optional[str] = Query(None),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """Replie a comment to the post.
 
@@ -64,7 +66,7 @@ def index(
     :status 400: when form parameters are missing
     """
     query = db.queries.get_resources(network_address, detailed)
-    page = query.paginate(offset, limit)
+    page = await query.paginate_async(session, offset, limit)
 
     data = {}
     data["total"] = page.total
@@ -85,23 +87,30 @@ def index(
 
 
 @router.get("/busy")
-def busy():
-    return {"busy": get_count_busy_resources()}
+async def busy(session: AsyncSession = Depends(get_read_session)):
+    query = get_count_busy_resources_query()
+    return {"busy": await session.scalar(query.statement)}
 
 
 @router.get("/{resource_id}")
-def show(resource_id):
-    resource = Resource.query.get_or_404(resource_id)
+async def show(resource_id: int, session: AsyncSession = Depends(get_read_session)):
+    resource = await session.get(Resource, resource_id)
     if resource is None:
         raise HTTPException(status_code=404, detail="Resource not found")
     data = {}
     data.update(resource.asdict())
+    return data
 
 
 @router.get("/{resource_id}/jobs")
-def jobs(limit: int = 50, offset: int = 0, resource_id: int = None):
+async def jobs(
+    limit: int = 50,
+    offset: int = 0,
+    resource_id: int = None,
+    session: AsyncSession = Depends(get_read_session),
+):
     query = db.queries.get_jobs_resource(resource_id)
-    page = query.paginate(offset, limit)
+    page = await query.paginate_async(session, offset, limit)
     data = {}
     data["total"] = page.total
     data["offset"] = offset
@@ -24,6 +24,7 @@ from oar.lib import (  # EventLogHostname,; ResourceLog,
     GanttJobsPrediction,
     GanttJobsPredictionsVisu,
     GanttJobsResource,
+    GanttJobsResourcesInterval,
     GanttJobsResourcesVisu,
     Job,
     JobDependencie,
@@ -227,6 +228,7 @@ def delete_resources():
 def delete_gantt_tables():
     db.query(GanttJobsPrediction).delete(synchronize_session=False)
     db.query(GanttJobsResource).delete(synchronize_session=False)
+    db.query(GanttJobsResourcesInterval).delete(synchronize_session=False)
     db.query(GanttJobsPredictionsVisu).delete(synchronize_session=False)
     db.query(GanttJobsResourcesVisu).delete(synchronize_session=False)
     db.commit()
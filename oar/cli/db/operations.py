@@ -38,6 +38,7 @@ def archive_db(ctx):
         "gantt_jobs_predictions_log",
         "gantt_jobs_predictions_visu",
         "gantt_jobs_resources",
+        "gantt_jobs_resources_intervals",
         "gantt_jobs_resources_log",
         "gantt_jobs_resources_visu",
     ]
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import json
 import os
 import re
 import signal
@@ -19,7 +20,13 @@ from oar.lib.job_handling import (
     get_job_types,
     resubmit_job,
 )
-from oar.lib.submission import JobParameters, Submission, check_reservation, lstrip_none
+from oar.lib.submission import (
+    JobParameters,
+    Submission,
+    add_micheline_jobs_batch,
+    check_reservation,
+    lstrip_none,
+)
 from oar.lib.tools import get_oarexecuser_script_for_oarsub
 
 from .utils import CommandReturns
@@ -257,6 +264,64 @@ def connect_job(job_id, stop_oarexec, openssh_cmd, cmd_ret):
     cmd_ret.exit(0)
 
 
+# Keys of a job specification of a batch file and their JobParameters counterpart
+BATCH_JOB_KEYS = {
+    "command": "command",
+    "resource": "resource",
+    "queue": "queue",
+    "property": "properties",
+    "type": "types",
+    "project": "project",
+    "name": "name",
+    "directory": "directory",
+    "after": "dependencies",
+    "notify": "notify",
+    "stdout": "stdout",
+    "stderr": "stderr",
+    "hold": "hold",
+    "signal": "signal",
+    "checkpoint": "checkpoint",
+    "reservation": "reservation_date",
+}
+
+
+def read_batch_jobs(batch_file, defaults):
+    """Read a batch file, a JSON list of job specifications using the long option
+    names of oarsub as keys, and return the corresponding job parameters; the
+    options given on the command line are the default values of every job.
+    """
+    try:
+        specs = json.load(batch_file)
+    except ValueError as e:
+        return ((6, "cannot parse the batch file: " + str(e)), [])
+    if not isinstance(specs, list):
+        return ((6, "the batch file must contain a list of jobs"), [])
+
+    jobs_parameters = []
+    for idx, spec in enumerate(specs):
+        kwargs = dict(defaults)
+        for key, value in spec.items():
+            if key not in BATCH_JOB_KEYS:
+                return ((6, "job {}: unknown key {}".format(idx, key)), [])
+            if key == "resource" and isinstance(value, str):
+                value = [value]
+            elif key == "type":
+                value = [t.lstrip() for t in value]
+            elif key == "reservation":
+                (error, value) = check_reservation(value)
+                if error[0] != 0:
+                    return (error, [])
+            kwargs[BATCH_JOB_KEYS[key]] = value
+        kwargs["types"] = list(kwargs["types"])
+        job_parameters = JobParameters(**kwargs)
+        error = job_parameters.check_parameters()
+        if error[0] != 0:
+            return ((error[0], "job {}: {}".format(idx, error[1])), [])
+        jobs_parameters.append(job_parameters)
+
+    return ((0, ""), jobs_parameters)
+
+
 @click.command()
 @click.argument("command", required=False)
 @click.option(
@@ -401,6 +466,14 @@ def connect_job(job_id, stop_oarexec, openssh_cmd, cmd_ret):
               so that it is not scheduled (you must run "oarresume" to turn it into the Waiting state)',
 )
 @click.option("--resubmit", type=int, help="Resubmit the given job as a new one.")
+@click.option(
+    "--batch",
+    type=click.File("r"),
+    help="Submit at once the jobs described in the file (- for the standard input),\
+              a JSON list of jobs whose keys are the long option names (command, resource,\
+              queue, property, type, after...), options given on the command line are\
+              used as default values of every job. Array jobs and job keys are not supported.",
+)
 @click.option("-V", "--version", is_flag=True, help="Print OAR version number.")
 def cli(
     command,
@@ -429,6 +502,7 @@ def cli(
     stdout,
     stderr,
     hold,
+    batch,
     version,
 ):
     """Submit a job to OAR batch scheduler."""
@@ -532,6 +606,43 @@ def cli(
 
     user = os.environ["OARDO_USER"]
 
+    if batch:
+        (error, jobs_parameters) = read_batch_jobs(
+            batch,
+            {
+                "job_type": "PASSIVE",
+                "command": command,
+                "resource": resource,
+                "queue": queue_name,
+                "properties": properties,
+                "checkpoint": checkpoint,
+                "signal": signal,
+                "notify": notify,
+                "name": name,
+                "types": types,
+                "directory": directory,
+                "dependencies": after,
+                "stdout": stdout,
+                "stderr": stderr,
+                "hold": hold,
+                "project": project,
+                "initial_request": initial_request,
+                "user": user,
+                "reservation_date": reservation_date,
+            },
+        )
+        if error[0] == 0:
+            (error, job_id_lst) = add_micheline_jobs_batch(jobs_parameters)
+        if error[0] != 0:
+            cmd_ret.error("", 0, error)
+            cmd_ret.exit()
+
+        for job_id in job_id_lst:
+            print("OAR_JOB_ID=" + str(job_id))
+        if job_id_lst:
+            tools.notify_almighty("Qsub")
+        cmd_ret.exit()
+
     job_parameters = JobParameters(
         job_type=None,
         resource=resource,
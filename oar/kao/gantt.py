@@ -0,0 +1,271 @@
+# coding: utf-8
+"""
+Incremental gantt for a long-lived meta scheduler.
+
+Between two rounds the gantt only changes by the jobs which started, ended or were
+(re)scheduled, and by the resources whose state changed. :class:`IncrementalGantt` keeps the
+default slot set of running jobs and already scheduled advance reservations in memory and
+updates it with these differences instead of building it from scratch. It also tracks the
+assignments saved in gantt tables to only rewrite those which changed.
+"""
+from oar.kao.quotas import Quotas
+from oar.lib import get_logger
+from oar.lib.job_handling import (
+    NO_PLACEHOLDER,
+    JobPseudo,
+    gantt_flush_tables,
+    gantt_remove_jobs,
+    get_gantt_start_times,
+)
+
+logger = get_logger("oar.kao.gantt")
+
+
+def job_signature(job):
+    """Return what a job changes in slots, a job is updated in gantt when its signature changes."""
+    return (
+        job.start_time,
+        job.walltime,
+        str(job.res_set),
+        job.ts,
+        job.ph,
+        getattr(job, "ts_user", None),
+        getattr(job, "ts_name", None),
+        getattr(job, "ph_name", None),
+    )
+
+
+def resources_signature(resource_set):
+    """Return the resources and their availability, gantt is rebuilt when it changes."""
+    return (
+        str(resource_set.roid_itvs),
+        tuple(
+            sorted(
+                (t_avail_upto, str(itvs))
+                for t_avail_upto, itvs in resource_set.available_upto.items()
+            )
+        ),
+    )
+
+
+def job_end(job):
+    return job.start_time + job.walltime - 1
+
+
+class IncrementalGantt(object):
+    """
+    Gantt kept from one meta scheduler round to the next.
+
+    The default slot set is updated in place when possible: its beginning is moved to the
+    new round's time, resources of the jobs which disappeared are given back and those of
+    new jobs are removed. It is rebuilt from scratch when resources or their availability
+    changed, when timesharing or placeholder jobs are involved (their insertion depends on
+    jobs order), when a job must be removed while quotas are enabled (counters can not be
+    decreased), when a temporal quotas calendar is used, when the keys of the quotas counters
+    were reset (see :meth:`Quotas.reset_counters_keys`), or when resources of a removed job
+    are also removed from slots by another job or by their `available_upto`.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # default slot set with running jobs and scheduled advance reservations
+        self.slot_set = None
+        self.resources_sig = None
+        # the quotas counters of slot_set refer to the counters keys of this generation
+        self.counters_keys_generation = None
+        # jobs inserted in slot_set: moldable_id -> (signature, pseudo job)
+        self.jobs = {}
+        # assignments saved in gantt tables: moldable_id -> (start_time, resources)
+        self.assigns = {}
+        # moldable ids saved during the current round
+        self.saved = set()
+
+    def slot_set_at(self, now, resource_set, jobs, build):
+        """
+        Return a copy of the default slot set beginning at `now` and filled with `jobs`.
+
+        :param int now: Time of the round.
+        :param resource_set: :class:`ResourceSet` of the round.
+        :param jobs: Jobs to insert in the slot set (running jobs and scheduled reservations).
+        :param build: Function building the slot set from scratch.
+        """
+        resources_sig = resources_signature(resource_set)
+        jobs = {job.moldable_id: job for job in jobs}
+
+        if (
+            (self.slot_set is None)
+            or (resources_sig != self.resources_sig)
+            or (self.counters_keys_generation != Quotas.counters_keys_generation)
+            or not self.update(now, resource_set, jobs)
+        ):
+            logger.debug("build gantt from scratch")
+            self.slot_set = build()
+            self.resources_sig = resources_sig
+            self.counters_keys_generation = Quotas.counters_keys_generation
+
+        # Only keep what is needed to remove them from slots, jobs' attributes from
+        # database are not reliable after the end of the round
+        self.jobs = {}
+        for moldable_id, job in jobs.items():
+            self.jobs[moldable_id] = (
+                job_signature(job),
+                JobPseudo(
+                    id=job.id,
+                    moldable_id=moldable_id,
+                    start_time=job.start_time,
+                    walltime=job.walltime,
+                    res_set=job.res_set,
+                    ts=job.ts,
+                    ph=job.ph,
+                ),
+            )
+
+        return self.slot_set.copy()
+
+    def update(self, now, resource_set, jobs):
+        """
+        Update the default slot set to `now` and `jobs`, return False if it must be rebuilt.
+        """
+        if Quotas.calendar or (now < self.slot_set.begin):
+            return False
+
+        removed = []
+        unchanged = []
+        for moldable_id, (signature, job) in self.jobs.items():
+            if (moldable_id in jobs) and (
+                job_signature(jobs[moldable_id]) == signature
+            ):
+                unchanged.append(job)
+            else:
+                removed.append(job)
+
+        added = [
+            job
+            for moldable_id, job in jobs.items()
+            if (moldable_id not in self.jobs)
+            or (job_signature(job) != self.jobs[moldable_id][0])
+        ]
+
+        if any((job.ts or (job.ph != NO_PLACEHOLDER)) for job in removed + added):
+            return False
+
+        # jobs which have ended before now are already out of the slot set
+        removed = [job for job in removed if job_end(job) >= now]
+        if removed and Quotas.enabled:
+            return False
+
+        for job in removed:
+            if any(
+                (t_avail_upto <= job_end(job)) and (itvs & job.res_set)
+                for t_avail_upto, itvs in resource_set.available_upto.items()
+            ):
+                return False
+            for other in unchanged:
+                if (
+                    (other.start_time <= job_end(job))
+                    and (job_end(other) >= max(job.start_time, now))
+                    and (other.res_set & job.res_set)
+                ):
+                    return False
+
+        self.slot_set.advance_to(now)
+
+        for job in removed:
+            self.slot_set.split_slots_jobs([job], False)
+
+        added = [job for job in added if job_end(job) >= now]
+        if added:
+            added.sort(key=lambda job: job.start_time)
+            self.slot_set.split_slots_jobs(added)
+
+        logger.debug(
+            "gantt updated: {} job(s) removed, {} job(s) added".format(
+                len(removed), len(added)
+            )
+        )
+        return True
+
+    def flush(self, reservations_moldable_ids, current_jobs):
+        """
+        Flush gantt tables, as :func:`gantt_flush_tables`, but also keep the current jobs and
+        the jobs saved during the previous round whose start times in gantt are unchanged.
+        The latters are removed at the end of the round if they are not saved again
+        (see :meth:`remove_stale`).
+
+        :return: The current jobs which must be saved.
+        """
+        start_times = get_gantt_start_times()
+
+        to_keep = set(reservations_moldable_ids)
+        current_jobs_to_save = {}
+        for job_id, job in current_jobs.items():
+            if start_times.get(job.moldable_id) == job.start_time:
+                to_keep.add(job.moldable_id)
+            else:
+                current_jobs_to_save[job_id] = job
+
+        self.assigns = {
+            moldable_id: assign
+            for moldable_id, assign in self.assigns.items()
+            if (moldable_id not in to_keep)
+            and (start_times.get(moldable_id) == assign[0])
+        }
+        to_keep.update(self.assigns)
+
+        gantt_flush_tables(list(to_keep))
+        self.saved = set()
+
+        return current_jobs_to_save
+
+    def save_assigns(self, jobs, resource_set, save_assigns):
+        """Save with `save_assigns` the assignments of `jobs` which are not already in gantt."""
+        jobs_to_save = {}
+        moldable_ids_to_remove = []
+        nb_unchanged = 0
+        for job in jobs.values() if isinstance(jobs, dict) else jobs:
+            if job.start_time > -1:
+                assign = (job.start_time, str(job.res_set))
+                self.saved.add(job.moldable_id)
+                if self.assigns.get(job.moldable_id) != assign:
+                    if job.moldable_id in self.assigns:
+                        moldable_ids_to_remove.append(job.moldable_id)
+                    self.assigns[job.moldable_id] = assign
+                    jobs_to_save[job.id] = job
+                else:
+                    nb_unchanged += 1
+            elif getattr(job, "not_considered", False):
+                # only its message is saved
+                jobs_to_save[job.id] = job
+
+        logger.debug("nb job assignment(s) unchanged: {}".format(nb_unchanged))
+        gantt_remove_jobs(moldable_ids_to_remove)
+        save_assigns(jobs_to_save, resource_set)
+
+    def remove_stale(self):
+        """Remove from gantt tables the jobs of the previous round which were not saved again."""
+        stale_moldable_ids = [
+            moldable_id for moldable_id in self.assigns if moldable_id not in self.saved
+        ]
+        gantt_remove_jobs(stale_moldable_ids)
+        for moldable_id in stale_moldable_ids:
+            del self.assigns[moldable_id]
+
+    def platform(self, plt):
+        """Return a proxy of `plt` which saves assignments through this gantt."""
+        return IncrementalPlatform(plt, self)
+
+
+class IncrementalPlatform(object):
+    """Proxy of a :class:`Platform` saving only the assignments which changed."""
+
+    def __init__(self, plt, gantt):
+        self.plt = plt
+        self.gantt = gantt
+
+    def __getattr__(self, name):
+        return getattr(self.plt, name)
+
+    def save_assigns(self, jobs, resource_set):
+        return self.gantt.save_assigns(jobs, resource_set, self.plt.save_assigns)
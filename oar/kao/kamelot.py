@@ -5,8 +5,14 @@ from oar.kao.karma import karma_jobs_sorting
 from oar.kao.multifactor_priority import multifactor_jobs_sorting
 from oar.kao.platform import Platform
 from oar.kao.quotas import Quotas
-from oar.kao.scheduling import schedule_id_jobs_ct, set_slots_with_prev_scheduled_jobs
-from oar.kao.slot import MAX_TIME, SlotSet
+from oar.kao.scheduling import (
+    backfilling_horizon,
+    schedule_id_jobs_ct,
+    set_slots_with_prev_scheduled_jobs,
+    time_budget_deadline,
+)
+from oar.kao.slot import MAX_TIME, new_slot_set
+from oar.kao.timing import timings
 from oar.lib import config, get_logger
 from oar.lib.job_handling import NO_PLACEHOLDER, JobPseudo
 from oar.lib.plugins import find_plugin_function
@@ -53,13 +59,46 @@ def jobs_sorting(queues, now, waiting_jids, waiting_jobs, plt):
     return waiting_ordered_jids
 
 
-def internal_schedule_cycle(plt, now, all_slot_sets, job_security_time, queues):
+def count_scheduled_jobs(waiting_jobs, all_slot_sets, queues, not_considered_jids):
+    """
+    Count, for the timings of the round, the scheduled jobs, the jobs not considered
+    because of the time budget and the slots.
+    """
+    label = ",".join(queues)
+    timings.count(
+        "scheduled",
+        sum(1 for job in waiting_jobs.values() if job.start_time > -1),
+        queues=label,
+    )
+    timings.count("not_considered", len(not_considered_jids), queues=label)
+    for ss_name, slot_set in all_slot_sets.items():
+        timings.add(
+            "oar_scheduler_slots",
+            len(slot_set.slots),
+            queues=label,
+            slot_set=ss_name,
+        )
+
+
+def internal_schedule_cycle(
+    plt, now, all_slot_sets, job_security_time, queues, deadline=None
+):
+    """
+    Schedule the waiting jobs of `queues`, within the time budget of the round
+    (ending at `deadline`) and of a queue (SCHEDULER_QUEUE_TIME_BUDGET). Beyond the
+    first SCHEDULER_BACKFILLING_DEPTH jobs, the jobs are only placed if they can start
+    before the backfilling horizon.
+    """
+    deadline = time_budget_deadline(config["SCHEDULER_QUEUE_TIME_BUDGET"], deadline)
     resource_set = plt.resource_set()
+    label = ",".join(queues)
 
     #
     # Retrieve waiting jobs
     #
-    waiting_jobs, waiting_jids, nb_waiting_jobs = plt.get_waiting_jobs(queues)
+    with timings.phase("waiting_jobs_load", queues=label):
+        waiting_jobs, waiting_jids, nb_waiting_jobs = plt.get_waiting_jobs(queues)
+    timings.count("waiting", nb_waiting_jobs, queues=label)
 
     if nb_waiting_jobs > 0:
         logger.info("nb_waiting_jobs:" + str(nb_waiting_jobs))
@@ -69,29 +108,39 @@ def internal_schedule_cycle(plt, now, all_slot_sets, job_security_time, queues):
         #
         # Get  additional waiting jobs' data
         #
-        plt.get_data_jobs(waiting_jobs, waiting_jids, resource_set, job_security_time)
+        with timings.phase("waiting_jobs_load", queues=label):
+            plt.get_data_jobs(
+                waiting_jobs, waiting_jids, resource_set, job_security_time
+            )
 
-        waiting_ordered_jids = jobs_sorting(
-            queues, now, waiting_jids, waiting_jobs, plt
-        )
+        with timings.phase("sorting", queues=label):
+            waiting_ordered_jids = jobs_sorting(
+                queues, now, waiting_jids, waiting_jobs, plt
+            )
 
         #
         # Scheduled
         #
-        schedule_id_jobs_ct(
-            all_slot_sets,
-            waiting_jobs,
-            resource_set.hierarchy,
-            waiting_ordered_jids,
-            job_security_time,
-        )
+        with timings.phase("schedule", queues=label):
+            not_considered_jids = schedule_id_jobs_ct(
+                all_slot_sets,
+                waiting_jobs,
+                resource_set.hierarchy,
+                waiting_ordered_jids,
+                job_security_time,
+                deadline,
+                backfilling_horizon(now),
+                int(config["SCHEDULER_BACKFILLING_DEPTH"]),
+            )
+        count_scheduled_jobs(waiting_jobs, all_slot_sets, queues, not_considered_jids)
 
         #
         # Save assignement
         #
         logger.info("save assignement")
 
-        plt.save_assigns(waiting_jobs, resource_set)
+        with timings.phase("save_assigns", queues=label):
+            plt.save_assigns(waiting_jobs, resource_set)
     else:
         logger.info("no waiting jobs")
 
@@ -102,10 +151,14 @@ def schedule_cycle(plt, now, queues=["default"]):
             now, " ".join([q for q in queues])
         )
     )
+    label = ",".join(queues)
+    deadline = time_budget_deadline(config["SCHEDULER_QUEUE_TIME_BUDGET"])
     #
     # Retrieve waiting jobs
     #
-    waiting_jobs, waiting_jids, nb_waiting_jobs = plt.get_waiting_jobs(queues)
+    with timings.phase("waiting_jobs_load", queues=label):
+        waiting_jobs, waiting_jids, nb_waiting_jobs = plt.get_waiting_jobs(queues)
+    timings.count("waiting", nb_waiting_jobs, queues=label)
 
     if nb_waiting_jobs > 0:
         logger.info("nb_waiting_jobs:" + str(nb_waiting_jobs))
@@ -114,73 +167,91 @@ def schedule_cycle(plt, now, queues=["default"]):
 
         job_security_time = int(config["SCHEDULER_JOB_SECURITY_TIME"])
 
-        #
-        # Determine Global Resource Intervals and Initial Slot
-        #
-        resource_set = plt.resource_set()
-        initial_slot_set = SlotSet((resource_set.roid_itvs, now))
+        with timings.phase("gantt_init", queues=label):
+            #
+            # Determine Global Resource Intervals and Initial Slot
+            #
+            resource_set = plt.resource_set()
+            initial_slot_set = new_slot_set((resource_set.roid_itvs, now))
 
-        #
-        #  Resource availabilty (Available_upto field) is integrated through pseudo job
-        #
-        pseudo_jobs = []
-        for t_avail_upto in sorted(resource_set.available_upto.keys()):
-            itvs = resource_set.available_upto[t_avail_upto]
-            j = JobPseudo()
-            # print t_avail_upto, max_time - t_avail_upto, itvs
-            j.start_time = t_avail_upto
-            j.walltime = MAX_TIME - t_avail_upto
-            j.res_set = itvs
-            j.ts = False
-            j.ph = NO_PLACEHOLDER
-
-            pseudo_jobs.append(j)
-
-        if pseudo_jobs != []:
-            initial_slot_set.split_slots_jobs(pseudo_jobs)
+            #
+            #  Resource availabilty (Available_upto field) is integrated through pseudo job
+            #
+            pseudo_jobs = []
+            for t_avail_upto in sorted(resource_set.available_upto.keys()):
+                itvs = resource_set.available_upto[t_avail_upto]
+                j = JobPseudo()
+                # print t_avail_upto, max_time - t_avail_upto, itvs
+                j.start_time = t_avail_upto
+                j.walltime = MAX_TIME - t_avail_upto
+                j.res_set = itvs
+                j.ts = False
+                j.ph = NO_PLACEHOLDER
+
+                pseudo_jobs.append(j)
+
+            if pseudo_jobs != []:
+                initial_slot_set.split_slots_jobs(pseudo_jobs)
 
         #
         # Get  additional waiting jobs' data
         #
-        plt.get_data_jobs(waiting_jobs, waiting_jids, resource_set, job_security_time)
+        with timings.phase("waiting_jobs_load", queues=label):
+            plt.get_data_jobs(
+                waiting_jobs, waiting_jids, resource_set, job_security_time
+            )
 
         # Job sorting (karma and advanced)
-        waiting_ordered_jids = jobs_sorting(
-            queues, now, waiting_jids, waiting_jobs, plt
-        )
-
-        #
-        # Get already scheduled jobs advanced reservations and jobs from more higher priority queues
-        #
-        scheduled_jobs = plt.get_scheduled_jobs(resource_set, job_security_time, now)
-
-        all_slot_sets = {"default": initial_slot_set}
+        with timings.phase("sorting", queues=label):
+            waiting_ordered_jids = jobs_sorting(
+                queues, now, waiting_jids, waiting_jobs, plt
+            )
 
-        if scheduled_jobs != []:
-            if (len(queues) == 1) and (queues[0] == "besteffort"):
-                filter_besteffort = False
-            else:
-                filter_besteffort = True
-            set_slots_with_prev_scheduled_jobs(
-                all_slot_sets, scheduled_jobs, job_security_time, now, filter_besteffort
+        with timings.phase("gantt_init", queues=label):
+            #
+            # Get already scheduled jobs advanced reservations and jobs from more higher priority queues
+            #
+            scheduled_jobs = plt.get_scheduled_jobs(
+                resource_set, job_security_time, now
             )
+
+            all_slot_sets = {"default": initial_slot_set}
+
+            if scheduled_jobs != []:
+                if (len(queues) == 1) and (queues[0] == "besteffort"):
+                    filter_besteffort = False
+                else:
+                    filter_besteffort = True
+                set_slots_with_prev_scheduled_jobs(
+                    all_slot_sets,
+                    scheduled_jobs,
+                    job_security_time,
+                    now,
+                    filter_besteffort,
+                )
         #
         # Scheduled
         #
-        schedule_id_jobs_ct(
-            all_slot_sets,
-            waiting_jobs,
-            resource_set.hierarchy,
-            waiting_ordered_jids,
-            job_security_time,
-        )
+        with timings.phase("schedule", queues=label):
+            not_considered_jids = schedule_id_jobs_ct(
+                all_slot_sets,
+                waiting_jobs,
+                resource_set.hierarchy,
+                waiting_ordered_jids,
+                job_security_time,
+                deadline,
+                backfilling_horizon(now),
+                int(config["SCHEDULER_BACKFILLING_DEPTH"]),
+            )
+        count_scheduled_jobs(waiting_jobs, all_slot_sets, queues, not_considered_jids)
 
         #
         # Save assignement
         #
         logger.info("save assignement")
 
-        plt.save_assigns(waiting_jobs, resource_set)
+        with timings.phase("save_assigns", queues=label):
+            plt.save_assigns(waiting_jobs, resource_set)
     else:
         logger.info("no waiting jobs")
 
@@ -192,6 +263,7 @@ def main():
     logger = get_logger("oar.kamelot", forward_stderr=True)
 
     plt = Platform()
+    timings.start()
 
     if ("QUOTAS" in config) and (config["QUOTAS"] == "yes"):
         Quotas.enable(plt.resource_set())
@@ -205,6 +277,8 @@ def main():
     else:
         schedule_cycle(plt, plt.get_time())
 
+    # timings of the round are written by the meta scheduler
+    timings.stop(export=False)
     logger.info("That's all folks")
     from oar.lib import db
 
@@ -1,8 +1,21 @@
 #!/usr/bin/env python
 # coding: utf-8
+"""
+Kao, the meta scheduler of OAR. It is launched by Almighty for each scheduling
+round, or stays resident with `kao --daemon` and runs a round for each request of
+Almighty (META_SCHED_DAEMON="yes"). The resident scheduler keeps the resources, their
+hierarchy, the quotas rules and calendar between rounds, they are loaded again only
+when resources or the quotas rules file change.
+"""
+import sys
 
+import click
+import zmq
+
+import oar.kao.meta_sched as meta_sched
 from oar.kao.meta_sched import meta_schedule
-from oar.lib import config, get_logger
+from oar.kao.platform import Platform
+from oar.lib import config, db, get_logger
 
 logger = get_logger("oar.kao")
 
@@ -12,6 +25,94 @@ def main():
     return meta_schedule(config["METASCHEDULER_MODE"])
 
 
+class KaoDaemon(object):
+    """Resident meta scheduler, answering the requests of :class:`KaoDaemonClient`."""
+
+    def __init__(self):
+        self.context = zmq.Context()
+        self.socket = self.context.socket(zmq.REP)
+        self.socket.bind("tcp://*:" + str(config["KAO_DAEMON_PORT"]))
+        self.platform = Platform(keep_resource_set=True)
+
+    def schedule(self):
+        """
+        Run a scheduling round, return the answer to the client: its exit code, and
+        an error if it fails (exit code 1). A failed round, even by an exit() on a
+        bad quotas file, does not stop the daemon.
+        """
+        # as in a new process, jobs to launch are notified again
+        meta_sched.to_launch_jobs_already_treated.clear()
+        try:
+            return {
+                "exit_code": meta_schedule(config["METASCHEDULER_MODE"], self.platform)
+            }
+        except (Exception, SystemExit) as e:
+            error = "scheduling round failed: " + repr(e)
+            logger.error(error)
+            db.rollback()
+            return {"exit_code": 1, "error": error}
+        finally:
+            db.session.close()
+
+    def run(self, loop=True):
+        logger.info("Starting Kao Meta Scheduler daemon")
+        while True:
+            request = self.socket.recv_json()
+            if request.get("cmd") == "SCHEDULE":
+                self.socket.send_json(self.schedule())
+            else:
+                logger.error("Unknown request: " + str(request))
+                self.socket.send_json({"error": "unknown request"})
+            if not loop:
+                break
+
+
+class KaoDaemonClient(object):
+    """Client part of :class:`KaoDaemon` used by Almighty to request scheduling rounds."""
+
+    def __init__(self):
+        self.context = zmq.Context()
+        self.connect()
+
+    def connect(self):
+        self.socket = self.context.socket(zmq.REQ)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.connect(
+            "tcp://"
+            + config["KAO_DAEMON_SERVER"]
+            + ":"
+            + str(config["KAO_DAEMON_PORT"])
+        )
+
+    def schedule(self):
+        """Request a scheduling round, return its exit code (1 if it fails)."""
+        self.socket.send_json({"cmd": "SCHEDULE"})
+        if self.socket.poll(int(config["KAO_DAEMON_TIMEOUT"]) * 1000):
+            answer = self.socket.recv_json()
+            if "error" in answer:
+                logger.error("Kao daemon error: " + str(answer["error"]))
+            return answer.get("exit_code", 1)
+
+        logger.error("Kao daemon did not answer before KAO_DAEMON_TIMEOUT")
+        # the socket still waits for the answer, a new one is needed to send requests
+        self.socket.close()
+        self.connect()
+        return 1
+
+
+@click.command()
+@click.option(
+    "--daemon",
+    is_flag=True,
+    help="stay resident and run a scheduling round for each request of Almighty",
+)
+def cli(daemon):
+    if daemon:
+        KaoDaemon().run()
+        return
+    sys.exit(main())
+
+
 if __name__ == "__main__":  # pragma: no cover
     logger = get_logger("oar.kao", forward_stderr=True)
-    main()
+    cli()
@@ -11,6 +11,7 @@ import sys
 from procset import ProcSet
 
 import oar.lib.tools as tools
+from oar.kao.gantt import IncrementalGantt
 from oar.kao.kamelot import internal_schedule_cycle
 from oar.kao.platform import Platform
 
@@ -18,20 +19,17 @@ from oar.kao.platform import Platform
 from oar.kao.quotas import Quotas
 from oar.kao.scheduling import (
     find_resource_hierarchies_job,
-    get_encompassing_slots,
     set_slots_with_prev_scheduled_jobs,
+    time_budget_deadline,
 )
-from oar.kao.slot import (
-    MAX_TIME,
-    SlotSet,
-    intersec_itvs_slots,
-    intersec_ts_ph_itvs_slots,
-)
+from oar.kao.slot import MAX_TIME, intersec_ts_ph_itvs_slots, new_slot_set
+from oar.kao.timing import timings
 
 # for walltime change requests
 from oar.kao.walltime_change import process_walltime_change_requests
 from oar.lib import (
     GanttJobsPredictionsVisu,
+    GanttJobsResourcesInterval,
     GanttJobsResourcesVisu,
     config,
     db,
@@ -45,6 +43,7 @@ from oar.lib.job_handling import (
     add_resource_job_pairs,
     frag_job,
     gantt_flush_tables,
+    gantt_resources_model,
     get_after_sched_no_AR_jobs,
     get_cpuset_values,
     get_current_not_waiting_jobs,
@@ -102,8 +101,42 @@ to_launch_jobs_already_treated = {}
 
 batsim_sched_proxy = None
 
+# gantt kept between rounds when SCHEDULER_INCREMENTAL_GANTT is enabled
+incremental_gantt = IncrementalGantt()
+
+
+def gantt_default_slot_set(resource_set, initial_time_sec, jobs=[]):
+    """
+    Create the default slot set from `initial_time_sec` with resources' availability and
+    the given already scheduled `jobs`.
+    """
+    slot_set = new_slot_set((resource_set.roid_itvs, initial_time_sec))
+
+    #
+    #  Resource availabilty (Available_upto field) is integrated through pseudo job
+    #
+    pseudo_jobs = []
+    for t_avail_upto in sorted(resource_set.available_upto.keys()):
+        itvs = resource_set.available_upto[t_avail_upto]
+        j = JobPseudo()
+        j.start_time = t_avail_upto
+        j.walltime = MAX_TIME - t_avail_upto
+        j.res_set = itvs
+        j.ts = False
+        j.ph = NO_PLACEHOLDER
+
+        pseudo_jobs.append(j)
+
+    if pseudo_jobs != []:
+        slot_set.split_slots_jobs(pseudo_jobs)
+
+    if jobs != []:
+        slot_set.split_slots_jobs(jobs)
 
-def gantt_init_with_running_jobs(plt, initial_time_sec, job_security_time):
+    return slot_set
+
+
+def gantt_init_with_running_jobs(plt, initial_time_sec, job_security_time, gantt=None):
     """
     Initialize gantt tables with scheduled reservation jobs, Running jobs,
     toLaunch jobs and Launching jobs.
@@ -114,16 +147,16 @@ def gantt_init_with_running_jobs(plt, initial_time_sec, job_security_time):
         Time from which to schedule.
     :param int job_security_time: \
         Job security time.
+    :param oar.kao.gantt.IncrementalGantt gantt: \
+        Gantt kept from the previous round, if any (defaults to `None`).
     """
     #
     # Determine Global Resource Intervals and Initial Slot
     #
     resource_set = plt.resource_set()
-    initial_slot_set = SlotSet((resource_set.roid_itvs, initial_time_sec))
 
     logger.debug("Processing of processing of already handled reservations")
     moldable_ids = get_waiting_moldable_of_reservations_already_scheduled()
-    gantt_flush_tables(moldable_ids)
 
     # TODO Can we remove this step, below ???
     #  why don't use: assigned_resources and job start_time ??? in get_scheduled_jobs ???
@@ -132,25 +165,11 @@ def gantt_init_with_running_jobs(plt, initial_time_sec, job_security_time):
         ["Running", "toLaunch", "Launching", "Finishing", "Suspended", "Resuming"],
         resource_set,
     )
-    plt.save_assigns(current_jobs, resource_set)  # TODO to verify
-
-    #
-    #  Resource availabilty (Available_upto field) is integrated through pseudo job
-    #
-    pseudo_jobs = []
-    for t_avail_upto in sorted(resource_set.available_upto.keys()):
-        itvs = resource_set.available_upto[t_avail_upto]
-        j = JobPseudo()
-        j.start_time = t_avail_upto
-        j.walltime = MAX_TIME - t_avail_upto
-        j.res_set = itvs
-        j.ts = False
-        j.ph = NO_PLACEHOLDER
-
-        pseudo_jobs.append(j)
-
-    if pseudo_jobs != []:
-        initial_slot_set.split_slots_jobs(pseudo_jobs)
+    if gantt is None:
+        gantt_flush_tables(moldable_ids)
+        plt.save_assigns(current_jobs, resource_set)  # TODO to verify
+    else:
+        plt.save_assigns(gantt.flush(moldable_ids, current_jobs), resource_set)
 
     #
     # Get already scheduled jobs advanced reservations and jobs from more higher priority queues
@@ -161,6 +180,14 @@ def gantt_init_with_running_jobs(plt, initial_time_sec, job_security_time):
         resource_set, job_security_time, initial_time_sec
     )
 
+    if gantt is not None:
+        # gantt tables also keep the jobs saved during the previous round
+        moldable_ids = set(moldable_ids)
+        moldable_ids.update(job.moldable_id for job in current_jobs.values())
+        scheduled_jobs = [
+            job for job in scheduled_jobs if job.moldable_id in moldable_ids
+        ]
+
     # retrieve resources used by besteffort jobs
     besteffort_rid2job = {}
 
@@ -171,15 +198,44 @@ def gantt_init_with_running_jobs(plt, initial_time_sec, job_security_time):
                 besteffort_rid2job[r_id] = job
 
     # Create and fill gantt
-    all_slot_sets = {"default": initial_slot_set}
-    if scheduled_jobs != []:
-        filter_besteffort = True
+    if gantt is None:
+        all_slot_sets = {
+            "default": gantt_default_slot_set(resource_set, initial_time_sec)
+        }
+        if scheduled_jobs != []:
+            filter_besteffort = True
+            set_slots_with_prev_scheduled_jobs(
+                all_slot_sets,
+                scheduled_jobs,
+                job_security_time,
+                initial_time_sec,
+                filter_besteffort,
+            )
+    else:
+        # Only the default slot set is kept, containers' ones are quickly rebuilt
+        all_slot_sets = {}
         set_slots_with_prev_scheduled_jobs(
             all_slot_sets,
-            scheduled_jobs,
+            [
+                job
+                for job in scheduled_jobs
+                if ("container" in job.types) or ("inner" in job.types)
+            ],
             job_security_time,
             initial_time_sec,
-            filter_besteffort,
+        )
+        default_jobs = [
+            job
+            for job in scheduled_jobs
+            if ("besteffort" not in job.types) and ("inner" not in job.types)
+        ]
+        all_slot_sets["default"] = gantt.slot_set_at(
+            initial_time_sec,
+            resource_set,
+            default_jobs,
+            lambda: gantt_default_slot_set(
+                resource_set, initial_time_sec, default_jobs
+            ),
         )
 
     return (all_slot_sets, scheduled_jobs, besteffort_rid2job)
@@ -383,15 +439,18 @@ def check_reservation_jobs(
 
             # TODO: test if container is an AR job
 
-            slots = all_slot_sets[ss_name].slots
+            slots_set = all_slot_sets[ss_name]
+            slots = slots_set.slots
 
             t_e = job.start_time + walltime - job_security_time
-            sid_left, sid_right = get_encompassing_slots(slots, job.start_time, t_e)
+            if Quotas.calendar:
+                slots_set.temporal_quotas_slots(job.start_time, t_e)
+            sid_left, sid_right = slots_set.encompassing_slots(job.start_time, t_e)
 
             if job.ts or (job.ph == ALLOW):
                 itvs_avail = intersec_ts_ph_itvs_slots(slots, sid_left, sid_right, job)
             else:
-                itvs_avail = intersec_itvs_slots(slots, sid_left, sid_right)
+                itvs_avail = slots_set.intersec_itvs(sid_left, sid_right)
 
             itvs = find_resource_hierarchies_job(
                 itvs_avail, hy_res_rqts, resource_set.hierarchy
@@ -586,15 +645,28 @@ def handle_jobs_to_launch(jobs_to_launch_lst, current_time_sec, current_time_sql
 def update_gantt_visualization():
     """
     Update the database with the new scheduling decisions for visualizations.
+
+    The visu tables are emptied and filled in the same transaction, readers see
+    either the previous or the new gantt, never an empty or partial one.
     """
     db.query(GanttJobsPredictionsVisu).delete()
     db.query(GanttJobsResourcesVisu).delete()
-    db.commit()
 
     sql_queries = [
         "INSERT INTO gantt_jobs_predictions_visu SELECT * FROM gantt_jobs_predictions",
-        "INSERT INTO gantt_jobs_resources_visu SELECT * FROM gantt_jobs_resources",
     ]
+    if gantt_resources_model() is GanttJobsResourcesInterval:
+        # visu table keeps one row by resource for visualization tools
+        sql_queries.append(
+            "INSERT INTO gantt_jobs_resources_visu "
+            "SELECT gr.moldable_job_id, r.resource_id "
+            "FROM gantt_jobs_resources_intervals gr, resources r "
+            "WHERE r.resource_id BETWEEN gr.resource_id_first AND gr.resource_id_last"
+        )
+    else:
+        sql_queries.append(
+            "INSERT INTO gantt_jobs_resources_visu SELECT * FROM gantt_jobs_resources"
+        )
     for query in sql_queries:
         db.session.execute(query)
     db.commit()
@@ -727,11 +799,13 @@ def call_batsim_sched_proxy(
 
 
 def call_internal_scheduler(
-    plt, scheduled_jobs, all_slot_sets, job_security_time, queues, now
+    plt, scheduled_jobs, all_slot_sets, job_security_time, queues, now, deadline=None
 ):
     """
     Internal scheduling phase. The scheduler is not loaded from an external command,
     so it can shares states with the metascheduler and between scheduling phases (on each queues).
+    The jobs not scheduled at `deadline` (end of the time budget of the round) are
+    not considered in this round.
     """
 
     # Place running besteffort jobs if their queue is considered
@@ -741,7 +815,7 @@ def call_internal_scheduler(
         )
 
     internal_schedule_cycle(
-        plt, now, all_slot_sets, job_security_time, [q.name for q in queues]
+        plt, now, all_slot_sets, job_security_time, [q.name for q in queues], deadline
     )
 
 
@@ -807,8 +881,22 @@ def meta_schedule(mode="internal", plt=Platform()):
     #. Loops through queues order by priority and call the scheduler
     #. It is also responsible to detect best effort jobs that need to be killed
     #. If the energy saving mode is enabled, it calls :class:`Hulot`.
+
+    The timings of the round are exported even if it fails.
     """
+    timings.start()
+    failed = True
+    try:
+        exit_code = meta_schedule_round(mode, plt)
+        failed = False
+    finally:
+        timings.stop(failed=failed)
+    return exit_code
+
+
+def meta_schedule_round(mode, plt):
     exit_code = 0
+    round_deadline = time_budget_deadline(config["SCHEDULER_ROUND_TIME_BUDGET"])
 
     job_security_time = int(config["SCHEDULER_JOB_SECURITY_TIME"])
 
@@ -823,12 +911,14 @@ def meta_schedule(mode="internal", plt=Platform()):
         kill_duration_before_reservation = 0
 
     if ("QUOTAS" in config) and (config["QUOTAS"] == "yes"):
-        Quotas.enable(plt.resource_set())
+        with timings.phase("quotas_load"):
+            Quotas.enable(plt.resource_set())
 
     if ("WALLTIME_CHANGE_ENABLED" in config) and (
         config["WALLTIME_CHANGE_ENABLED"] == "yes"
     ):
-        process_walltime_change_requests(plt)
+        with timings.phase("walltime_change"):
+            process_walltime_change_requests(plt)
 
     tools.create_almighty_socket()
 
@@ -845,10 +935,25 @@ def meta_schedule(mode="internal", plt=Platform()):
     current_time_sec = initial_time_sec
     current_time_sql = initial_time_sql
 
-    gantt_init_results = gantt_init_with_running_jobs(
-        plt, initial_time_sec, job_security_time
-    )
+    # The gantt can be kept from the previous round by a long-lived meta scheduler,
+    # only the internal scheduler saves its assignments through it.
+    gantt = None
+    sched_plt = plt
+    if config["SCHEDULER_INCREMENTAL_GANTT"] == "yes":
+        if mode == "internal":
+            gantt = incremental_gantt
+            sched_plt = gantt.platform(plt)
+        else:
+            logger.warning(
+                "SCHEDULER_INCREMENTAL_GANTT is only supported by internal scheduler"
+            )
+
+    with timings.phase("gantt_init"):
+        gantt_init_results = gantt_init_with_running_jobs(
+            plt, initial_time_sec, job_security_time, gantt
+        )
     all_slot_sets, scheduled_jobs, besteffort_rid2jid = gantt_init_results
+    timings.count("running_and_reservations", len(scheduled_jobs))
     resource_set = plt.resource_set()
 
     # Path for user of external schedulers
@@ -903,157 +1008,175 @@ def meta_schedule(mode="internal", plt=Platform()):
         # Only internal scheduler support non-strict priorities between queues
         if mode == "internal":
             call_internal_scheduler(
-                plt,
+                sched_plt,
                 scheduled_jobs,
                 all_slot_sets,
                 job_security_time,
                 active_queues,
                 initial_time_sec,
+                round_deadline,
             )
             for queue in active_queues:
-                handle_waiting_reservation_jobs(
-                    queue.name, resource_set, job_security_time, current_time_sec
-                )
-                # handle_new_AR_jobs
-                check_reservation_jobs(
-                    plt, resource_set, queue.name, all_slot_sets, current_time_sec
-                )
+                with timings.phase("reservations", queues=queue.name):
+                    handle_waiting_reservation_jobs(
+                        queue.name, resource_set, job_security_time, current_time_sec
+                    )
+                    # handle_new_AR_jobs
+                    check_reservation_jobs(
+                        plt, resource_set, queue.name, all_slot_sets, current_time_sec
+                    )
         else:
             for queue in active_queues:
-                if mode == "external":  # pragma: no cover
-                    call_external_scheduler(
-                        binpath,
-                        scheduled_jobs,
-                        all_slot_sets,
-                        resource_set,
-                        job_security_time,
-                        queue,
-                        initial_time_sec,
-                        initial_time_sql,
-                    )
-                elif mode == "batsim_sched_proxy":
-                    call_batsim_sched_proxy(
-                        plt,
-                        scheduled_jobs,
-                        all_slot_sets,
-                        job_security_time,
-                        queue,
-                        initial_time_sec,
+                with timings.phase("schedule", queues=queue.name):
+                    if mode == "external":  # pragma: no cover
+                        call_external_scheduler(
+                            binpath,
+                            scheduled_jobs,
+                            all_slot_sets,
+                            resource_set,
+                            job_security_time,
+                            queue,
+                            initial_time_sec,
+                            initial_time_sql,
+                        )
+                    elif mode == "batsim_sched_proxy":
+                        call_batsim_sched_proxy(
+                            plt,
+                            scheduled_jobs,
+                            all_slot_sets,
+                            job_security_time,
+                            queue,
+                            initial_time_sec,
+                        )
+                    else:
+                        logger.error("Specified mode is unknown: " + mode)
+
+                with timings.phase("reservations", queues=queue.name):
+                    handle_waiting_reservation_jobs(
+                        queue.name, resource_set, job_security_time, current_time_sec
                     )
-                else:
-                    logger.error("Specified mode is unknown: " + mode)
 
-                handle_waiting_reservation_jobs(
-                    queue.name, resource_set, job_security_time, current_time_sec
-                )
+    if gantt is not None:
+        gantt.remove_stale()
 
-    (
-        jobs_to_launch_with_security_time,
-        jobs_to_launch_with_security_time_lst,
-        rid2jid_to_launch,
-    ) = get_gantt_jobs_to_launch(
-        resource_set,
-        job_security_time,
-        current_time_sec,
-        kill_duration_before_reservation=kill_duration_before_reservation,
-    )
+    with timings.phase("jobs_to_launch_load"):
+        (
+            jobs_to_launch_with_security_time,
+            jobs_to_launch_with_security_time_lst,
+            rid2jid_to_launch,
+        ) = get_gantt_jobs_to_launch(
+            resource_set,
+            job_security_time,
+            current_time_sec,
+            kill_duration_before_reservation=kill_duration_before_reservation,
+        )
 
     # Filter jobs that are not yet ready to be scheduled, but present because of the
     # kill_duration_before_reservation=kill_duration_before_reservation parameter
-    jobs_to_launch_lst = filter(
-        lambda j: j.start_time <= current_time_sec,
-        jobs_to_launch_with_security_time_lst,
-    )
+    jobs_to_launch_lst = [
+        j
+        for j in jobs_to_launch_with_security_time_lst
+        if j.start_time <= current_time_sec
+    ]
+    timings.count("to_launch", len(jobs_to_launch_lst))
 
-    if (
-        check_besteffort_jobs_to_kill(
+    with timings.phase("besteffort_kill_check"):
+        besteffort_to_kill = check_besteffort_jobs_to_kill(
             jobs_to_launch_with_security_time,  # Jobs to launch or about to be launched
             rid2jid_to_launch,
             current_time_sec,
             besteffort_rid2jid,
             resource_set,
         )
-        == 1
-    ):
+
+    if besteffort_to_kill == 1:
         # We must kill some besteffort jobs
         tools.notify_almighty("ChState")
         exit_code = 2
-    elif (
-        handle_jobs_to_launch(jobs_to_launch_lst, current_time_sec, current_time_sql)
-        == 1
-    ):
-        exit_code = 0
+    else:
+        with timings.phase("launch"):
+            if (
+                handle_jobs_to_launch(
+                    jobs_to_launch_lst, current_time_sec, current_time_sql
+                )
+                == 1
+            ):
+                exit_code = 0
 
     # Update visu gantt tables
-    update_gantt_visualization()
+    with timings.phase("visu_update"):
+        update_gantt_visualization()
 
     #
     # Manage dynamic node feature for energy saving:
     #
     if ("ENERGY_SAVING_MODE" in config) and config["ENERGY_SAVING_MODE"] != "":
-        if config["ENERGY_SAVING_MODE"] == "metascheduler_decision_making":
-            nodes_2_change = nodes_energy_saving(current_time_sec)
-        elif config["ENERGY_SAVING_MODE"] == "batsim_scheduler_proxy_decision_making":
-            nodes_2_change = batsim_sched_proxy.retrieve_pstate_changes_to_apply()
-        else:
-            logger.error(
-                "Error ENERGY_SAVING_MODE unknown: " + config["ENERGY_SAVING_MODE"]
-            )
+        with timings.phase("energy_saving"):
+            if config["ENERGY_SAVING_MODE"] == "metascheduler_decision_making":
+                nodes_2_change = nodes_energy_saving(current_time_sec)
+            elif (
+                config["ENERGY_SAVING_MODE"] == "batsim_scheduler_proxy_decision_making"
+            ):
+                nodes_2_change = batsim_sched_proxy.retrieve_pstate_changes_to_apply()
+            else:
+                logger.error(
+                    "Error ENERGY_SAVING_MODE unknown: " + config["ENERGY_SAVING_MODE"]
+                )
 
-        hulot = HulotClient()
+            hulot = HulotClient()
 
-        flag_hulot = False
-        timeout_cmd = int(config["SCHEDULER_TIMEOUT"])
+            flag_hulot = False
+            timeout_cmd = int(config["SCHEDULER_TIMEOUT"])
 
-        # Command Hulot to halt selected nodes
-        nodes_2_halt = nodes_2_change["halt"]
-        if nodes_2_halt != []:
-            logger.debug(
-                "Powering off some nodes (energy saving): " + str(nodes_2_halt)
-            )
-            # Using the built-in energy saving module to shut down nodes
-            if config["ENERGY_SAVING_INTERNAL"] == "yes":
-                hulot.halt_nodes(nodes_2_halt)
-                # logger.error("Communication problem with the energy saving module (Hulot)\n")
-                flag_hulot = True
-            else:
-                # Not using the built-in energy saving module to shut down nodes
-                cmd = config["SCHEDULER_NODE_MANAGER_SLEEP_CMD"]
-                if tools.fork_and_feed_stdin(cmd, timeout_cmd, nodes_2_halt):
-                    logger.error(
-                        "Command "
-                        + cmd
-                        + "timeouted ("
-                        + str(timeout_cmd)
-                        + "s) while trying to  poweroff some nodes"
-                    )
+            # Command Hulot to halt selected nodes
+            nodes_2_halt = nodes_2_change["halt"]
+            if nodes_2_halt != []:
+                logger.debug(
+                    "Powering off some nodes (energy saving): " + str(nodes_2_halt)
+                )
+                # Using the built-in energy saving module to shut down nodes
+                if config["ENERGY_SAVING_INTERNAL"] == "yes":
+                    hulot.halt_nodes(nodes_2_halt)
+                    # logger.error("Communication problem with the energy saving module (Hulot)\n")
+                    flag_hulot = True
+                else:
+                    # Not using the built-in energy saving module to shut down nodes
+                    cmd = config["SCHEDULER_NODE_MANAGER_SLEEP_CMD"]
+                    if tools.fork_and_feed_stdin(cmd, timeout_cmd, nodes_2_halt):
+                        logger.error(
+                            "Command "
+                            + cmd
+                            + "timeouted ("
+                            + str(timeout_cmd)
+                            + "s) while trying to  poweroff some nodes"
+                        )
 
-        # Command Hulot to wake up selected nodes
-        nodes_2_wakeup = nodes_2_change["wakeup"]
+            # Command Hulot to wake up selected nodes
+            nodes_2_wakeup = nodes_2_change["wakeup"]
 
-        if nodes_2_wakeup != []:
-            logger.debug("Awaking some nodes: " + str(nodes_2_change))
-            # Using the built-in energy saving module to wake up nodes
-            if config["ENERGY_SAVING_INTERNAL"] == "yes":
-                hulot.wake_up_nodes(nodes_2_wakeup)
-                # logger.error("Communication problem with the energy saving module (Hulot)")
-                flag_hulot = True
-            else:
-                # Not using the built-in energy saving module to wake up nodes
-                cmd = config["SCHEDULER_NODE_MANAGER_WAKE_UP_CMD"]
-                if tools.fork_and_feed_stdin(cmd, timeout_cmd, nodes_2_wakeup):
-                    logger.error(
-                        "Command "
-                        + cmd
-                        + "timeouted ("
-                        + str(timeout_cmd)
-                        + "s) while trying to wake-up some nodes "
-                    )
+            if nodes_2_wakeup != []:
+                logger.debug("Awaking some nodes: " + str(nodes_2_change))
+                # Using the built-in energy saving module to wake up nodes
+                if config["ENERGY_SAVING_INTERNAL"] == "yes":
+                    hulot.wake_up_nodes(nodes_2_wakeup)
+                    # logger.error("Communication problem with the energy saving module (Hulot)")
+                    flag_hulot = True
+                else:
+                    # Not using the built-in energy saving module to wake up nodes
+                    cmd = config["SCHEDULER_NODE_MANAGER_WAKE_UP_CMD"]
+                    if tools.fork_and_feed_stdin(cmd, timeout_cmd, nodes_2_wakeup):
+                        logger.error(
+                            "Command "
+                            + cmd
+                            + "timeouted ("
+                            + str(timeout_cmd)
+                            + "s) while trying to wake-up some nodes "
+                        )
 
-        # Send CHECK signal to Hulot if needed
-        if not flag_hulot and (config["ENERGY_SAVING_INTERNAL"] == "yes"):
-            hulot.check_nodes()
-            #    logger.error("Communication problem with the energy saving module (Hulot)")
+            # Send CHECK signal to Hulot if needed
+            if not flag_hulot and (config["ENERGY_SAVING_INTERNAL"] == "yes"):
+                hulot.check_nodes()
+                #    logger.error("Communication problem with the energy saving module (Hulot)")
 
     # Retrieve jobs according to their state and excluding job in 'Waiting' state.
     jobs_by_state = get_current_not_waiting_jobs()
@@ -1236,8 +1359,9 @@ def meta_schedule(mode="internal", plt=Platform()):
 
     # Process toLaunch jobs
     if "toLaunch" in jobs_by_state:
-        for job in jobs_by_state["toLaunch"]:
-            notify_to_run_job(job.id)
+        with timings.phase("launch"):
+            for job in jobs_by_state["toLaunch"]:
+                notify_to_run_job(job.id)
 
     logger.debug("End of Meta Scheduler")
 
@@ -8,13 +8,15 @@ from oar.kao.karma import (
     get_sum_accounting_by_user,
     get_sum_accounting_window,
 )
+from oar.lib import config, db
 from oar.lib.job_handling import (
     get_data_jobs,
     get_scheduled_jobs,
     get_waiting_jobs,
     save_assigns,
 )
-from oar.lib.resource import ResourceSet
+from oar.lib.resource import RESOURCE_SET_CONFIG, ResourceSet
+from oar.lib.resource_handling import get_resources_change_counter
 
 
 class Platform(object):
@@ -23,13 +25,43 @@ class Platform(object):
     information (jobs and resources) of the current platform.
 
     This class can be overridden (e.g. :class:`BatsimPlatform`) to switch in simulation mode.
+
+    With `keep_resource_set`, the :class:`ResourceSet` (and its hierarchy) is kept
+    between calls and scheduling rounds of a long-lived scheduler, it is built again
+    when resources change (see :func:`get_resources_change_counter`).
     """
 
-    def __init__(self):
-        pass
+    # ResourceSet kept by platforms with keep_resource_set, and its key
+    kept_resource_set = None
+    kept_resource_set_key = None
+
+    def __init__(self, keep_resource_set=False):
+        self.keep_resource_set = keep_resource_set
 
     def resource_set(self):
-        return ResourceSet()
+        if not self.keep_resource_set:
+            return ResourceSet()
+
+        key = (get_resources_change_counter(),) + tuple(
+            config.get(k) for k in RESOURCE_SET_CONFIG
+        )
+        if key != Platform.kept_resource_set_key:
+            resource_set = ResourceSet()
+            # resources are read after the end of the session (properties constraints)
+            for resource in resource_set.resources_db:
+                db.session.expunge(resource)
+            Platform.kept_resource_set = resource_set
+            Platform.kept_resource_set_key = key
+
+        resource_set = Platform.kept_resource_set
+        ResourceSet.default_itvs = resource_set.default_itvs  # for Quotas
+        return resource_set
+
+    @classmethod
+    def clear_resource_set(cls):
+        """Forget the kept ResourceSet."""
+        cls.kept_resource_set = None
+        cls.kept_resource_set_key = None
 
     def get_time(self):
         return int(time.time())
@@ -1,6 +1,5 @@
 # coding: utf-8
-from collections import defaultdict
-from copy import deepcopy
+from bisect import bisect_right
 from datetime import datetime, timedelta
 
 import simplejson as json
@@ -44,6 +43,13 @@ class Calendar(object):
         self.quotas_id2rules = {}
         self.nb_quotas_rules = 0
 
+        # transitions table: rules_id applying from each time of table_times, until
+        # the next one or table_end (see transitions)
+        self.table_begin = None
+        self.table_end = None
+        self.table_times = []
+        self.table_rules_ids = []
+
         # load of quotas rules sets
         for type_temporal_quotas_i in [("periodical", 1), ("oneshot", 2)]:
             type_temporal_quotas, i = type_temporal_quotas_i
@@ -261,14 +267,18 @@ class Calendar(object):
                 + self.periodicals[self.ordered_periodical_ids[i]][1]
                 - 1
             )
-            if (t_periodicals_begin >= t) and (t <= t_periodicals_end):
+            if (t_periodicals_begin <= t) and (t <= t_periodicals_end):
                 break
 
         # get rules_id and compute remaining_duration
         self.op_index = i
         index = self.ordered_periodical_ids[self.op_index]
         rules_id = self.periodicals[index][2]
-        remaining_duration = self.periodicals[index][1] - (t_epoch - period_origin)
+        remaining_duration = (
+            self.periodicals[index][0]
+            + self.periodicals[index][1]
+            - (t_epoch - period_origin)
+        )
 
         return (rules_id, remaining_duration)
 
@@ -306,6 +316,65 @@ class Calendar(object):
                 rules_id = o_rules_id
         return (rules_id, remaining_duration)
 
+    def transitions(self, t_begin):
+        """
+        Precompute the table of quotas rules changes over the QUOTAS_WINDOW_TIME_LIMIT
+        from `t_begin` and return the end of the quotas period of `t_begin`. Rules
+        applying at a given time are then looked up by :meth:`table_rules_at` with a
+        binary search. The table does not follow the beginning of slot sets: it is only
+        built again from `t_begin` when it ends before, it is extended when a later time
+        is looked up, and times before its beginning (e.g. container slot sets begin at
+        1) are looked up without it.
+        """
+        if (self.table_begin is None) or (t_begin >= self.table_end):
+            self.table_begin = t_begin
+            self.table_end = t_begin
+            self.table_times = []
+            self.table_rules_ids = []
+        if t_begin >= self.table_begin:
+            self.extend_table(t_begin + config["QUOTAS_WINDOW_TIME_LIMIT"])
+        self.periodical_rules_at(t_begin)
+        return self.period_end
+
+    def extend_table(self, t_end):
+        """Add the rules changes to the transitions table until `t_end` is reached."""
+        t = self.table_end
+        while t <= t_end:
+            # rules changes are given by next_rules until the end of quotas period
+            rules_id, remaining_duration = self.rules_at(t)
+            if remaining_duration <= 0:
+                logger.error("no periodical quotas rules at: {}".format(t))
+                break
+            while remaining_duration:
+                self.table_times.append(t)
+                self.table_rules_ids.append(rules_id)
+                t += remaining_duration
+                rules_id, remaining_duration = self.next_rules(t)
+        self.table_end = t
+
+    def table_rules_at(self, t_epoch):
+        """
+        Return rules_id and remaining duration at `t_epoch` from the transitions table,
+        remaining duration is 0 if no rules are found. Before the table, the remaining
+        duration stops at its beginning.
+        """
+        if self.table_begin is None:
+            self.transitions(t_epoch)
+        if t_epoch < self.table_begin:
+            rules_id, remaining_duration = self.rules_at(t_epoch)
+            return (rules_id, min(remaining_duration, self.table_begin - t_epoch))
+        if t_epoch >= self.table_end:
+            self.extend_table(t_epoch)
+        if t_epoch >= self.table_end:
+            return (None, 0)
+
+        i = bisect_right(self.table_times, t_epoch) - 1
+        if (i + 1) < len(self.table_times):
+            t_next = self.table_times[i + 1]
+        else:
+            t_next = self.table_end
+        return (self.table_rules_ids[i], t_next - t_epoch)
+
     def show(self, t=None, begin=None, end=None, check=True, json=False):
         t_epoch = None
         if t:
@@ -402,6 +471,104 @@ class Calendar(object):
             print("remaining_duration {}".format(remaining_duration))
 
 
+class QuotasRulesIndex(object):
+    """
+    Quotas rules compiled to check a job against the counters of the rules matching it
+    only, instead of matching each rule against each counter.
+
+    Rules are indexed by the fields they require the job to have (a queue, project,
+    type or user other than "*" or "/"), and each rule keeps the ids of the counters it
+    limits: the counters with the same fields, any value being matched by "/".
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules.items())
+        # (queue, project, job_type, user) required from jobs -> rules positions,
+        # None when the rule does not require the field
+        self.index = {}
+        self.job_types = set()
+        for i, (rl_fields, _) in enumerate(self.rules):
+            gate = tuple(None if f in ("*", "/") else f for f in rl_fields)
+            self.index.setdefault(gate, []).append(i)
+            if gate[2] is not None:
+                self.job_types.add(gate[2])
+        # positions of the rules matching jobs, by (queue, project, user, job types)
+        self.jobs_rules = {}
+        # ids of the counters limited by each rule
+        self.rules_counters_ids = [[] for _ in self.rules]
+        self.nb_counters_keys = 0
+
+    def job_rules(self, job):
+        """Return the positions of the rules matching `job`, in rules order."""
+        job_types = tuple(sorted(t for t in self.job_types if t in job.types))
+        job_key = (job.queue_name, job.project, job.user, job_types)
+        positions = self.jobs_rules.get(job_key)
+        if positions is None:
+            positions = []
+            for queue in {None, job.queue_name}:
+                for project in {None, job.project}:
+                    for job_type in (None,) + job_types:
+                        for user in {None, job.user}:
+                            positions.extend(
+                                self.index.get((queue, project, job_type, user), [])
+                            )
+            positions = sorted(set(positions))
+            self.jobs_rules[job_key] = positions
+        return positions
+
+    def rule_counters_ids(self, i):
+        """Return the ids of the counters limited by the `i`-th rule."""
+        counters_keys = Quotas.counters_keys
+        if self.nb_counters_keys < len(counters_keys):
+            # match counters created since the last call
+            for counters_id in range(self.nb_counters_keys, len(counters_keys)):
+                key = counters_keys[counters_id]
+                for (rl_fields, _), counters_ids in zip(
+                    self.rules, self.rules_counters_ids
+                ):
+                    if all(
+                        (rl_f == "/") or (rl_f == f) for rl_f, f in zip(rl_fields, key)
+                    ):
+                        counters_ids.append(counters_id)
+            self.nb_counters_keys = len(counters_keys)
+        return self.rules_counters_ids[i]
+
+    def check(self, job, counters):
+        """
+        Check the counters of the rules matching `job`.
+
+        :param counters: Function returning the counters of an id, or None
+        """
+        for i in self.job_rules(job):
+            rl_fields, rl_quotas = self.rules[i]
+            rl_nb_resources, rl_nb_jobs, rl_resources_time = rl_quotas
+            for counters_id in self.rule_counters_ids(i):
+                c = counters(counters_id)
+                if c is None:
+                    continue
+                nb_resources, nb_jobs, resources_time = c
+                # 1) test nb_resources
+                if (rl_nb_resources > -1) and (rl_nb_resources < nb_resources):
+                    return (
+                        False,
+                        "nb resources quotas failed",
+                        rl_fields,
+                        rl_nb_resources,
+                    )
+                # 2) test nb_jobs
+                if (rl_nb_jobs > -1) and (rl_nb_jobs < nb_jobs):
+                    return (False, "nb jobs quotas failed", rl_fields, rl_nb_jobs)
+                # 3) test resources_time (work)
+                if (rl_resources_time > -1) and (rl_resources_time < resources_time):
+                    return (
+                        False,
+                        "resources hours quotas failed",
+                        rl_fields,
+                        rl_resources_time,
+                    )
+        return (True, "quotas ok", "", 0)
+
+
 class Quotas(object):
     """
 
@@ -525,30 +692,117 @@ class Quotas(object):
                 all_value = resource_set.nb_resources_default_not_dead
         else:
             all_value = None
+        # counters of the previous round are gone (see IncrementalGantt), keys of the
+        # queues, projects, users and types not seen anymore are forgotten
+        cls.reset_counters_keys()
         cls.load_quotas_rules(all_value)
 
+    __slots__ = ("counters", "rules", "shared")
+
+    # Keys of counters (queue, project, job_type, user) are interned to integer ids,
+    # until the next reset_counters_keys (counters_keys_generation is then incremented)
+    counters_keys_generation = 0
+    counters_keys = []
+    counters_ids = {}
+    # ids of the counters updated by a job, by (queue, project, user, job types)
+    jobs_counters_ids = {}
+    # compiled rules (see QuotasRulesIndex), by id of rules
+    rules_indexes = {}
+    # Rules loaded from QUOTAS_CONF_FILE (calendar, default rules and job types), kept
+    # while the file content and the parameters of the loading are unchanged
+    rules_cache_key = None
+    rules_cache = None
+
     def __init__(self):
-        self.counters = defaultdict(lambda: [0, 0, 0])
+        # counters id -> (nb_resources, nb_jobs, resources_time)
+        self.counters = {}
         self.rules = Quotas.default_rules
+        # counters are shared with other Quotas and must be copied before update
+        self.shared = False
 
-    def deepcopy_from(self, quotas):
-        self.counters = deepcopy(quotas.counters)
+    def copy_from(self, quotas):
+        """Copy counters of `quotas`, they are actually copied when one of both is updated."""
+        self.counters = quotas.counters
+        self.shared = quotas.shared = True
+
+    def own_counters(self):
+        if self.shared:
+            self.counters = dict(self.counters)
+            self.shared = False
+
+    @classmethod
+    def reset_counters_keys(cls):
+        """
+        Forget the interned counters keys and what refers to their ids. Counters of
+        the existing Quotas must not be used anymore.
+        """
+        cls.counters_keys_generation += 1
+        cls.counters_keys = []
+        cls.counters_ids = {}
+        cls.jobs_counters_ids = {}
+        cls.rules_indexes = {}
+
+    @classmethod
+    def counters_id(cls, key):
+        """Return the id of counters `key`, it is created if needed."""
+        counters_id = cls.counters_ids.get(key)
+        if counters_id is None:
+            counters_id = len(cls.counters_keys)
+            cls.counters_keys.append(key)
+            cls.counters_ids[key] = counters_id
+        return counters_id
+
+    @classmethod
+    def job_counters_ids(cls, job):
+        """Return the ids of the counters updated by `job`."""
+        job_types = tuple(t for t in cls.job_types if (t == "*") or (t in job.types))
+        job_key = (job.queue_name, job.project, job.user, job_types)
+        ids = cls.jobs_counters_ids.get(job_key)
+        if ids is None:
+            queue, project, user, _ = job_key
+            ids = [
+                cls.counters_id((q, p, t, u))
+                for t in job_types
+                for (q, p, u) in [
+                    ("*", "*", "*"),
+                    ("*", "*", user),
+                    ("*", project, "*"),
+                    (queue, "*", "*"),
+                    (queue, project, user),
+                    (queue, project, "*"),
+                    (queue, "*", user),
+                    ("*", project, user),
+                ]
+            ]
+            cls.jobs_counters_ids[job_key] = ids
+        return ids
+
+    @classmethod
+    def rules_index(cls, rules):
+        """Return the :class:`QuotasRulesIndex` of `rules`, compiled once."""
+        entry = cls.rules_indexes.get(id(rules))
+        if (entry is None) or (entry[0] is not rules):
+            entry = (rules, QuotasRulesIndex(rules))
+            cls.rules_indexes[id(rules)] = entry
+        return entry[1]
+
+    def counter(self, key):
+        """Return the counters of `key` (queue, project, job_type, user)."""
+        counters_id = Quotas.counters_ids.get(key)
+        return list(self.counters.get(counters_id, (0, 0, 0)))
 
     def show_counters(self, msg=""):  # pragma: no cover
         print("show_counters:", msg)
         for k, v in self.counters.items():
-            print(k, " = ", v)
-
-    def update(self, job, prev_nb_res=0, prev_duration=0):
-        queue = job.queue_name
-        project = job.project
-        user = job.user
+            print(Quotas.counters_keys[k], " = ", v)
 
+    @staticmethod
+    def job_usage(job, prev_nb_res=0, prev_duration=0):
+        """Return the number of resources and the duration counted for `job`."""
         # TOREMOVE ?
         if hasattr(job, "res_set"):
-            if not hasattr(self, "nb_res"):
-                job.nb_res = len(job.res_set & ResourceSet.default_itvs)
-                nb_resources = job.nb_res
+            job.nb_res = len(job.res_set & ResourceSet.default_itvs)
+            nb_resources = job.nb_res
         else:
             nb_resources = prev_nb_res
 
@@ -557,116 +811,43 @@ class Quotas(object):
         else:
             duration = prev_duration
 
-        for t in Quotas.job_types:
-            if (t == "*") or (t in job.types):
-                # Update the number of used resources
-                self.counters["*", "*", t, "*"][0] += nb_resources
-                self.counters["*", "*", t, user][0] += nb_resources
-                self.counters["*", project, t, "*"][0] += nb_resources
-                self.counters[queue, "*", t, "*"][0] += nb_resources
-                self.counters[queue, project, t, user][0] += nb_resources
-                self.counters[queue, project, t, "*"][0] += nb_resources
-                self.counters[queue, "*", t, user][0] += nb_resources
-                self.counters["*", project, t, user][0] += nb_resources
-                # Update the number of running jobs
-                self.counters["*", "*", t, "*"][1] += 1
-                self.counters["*", "*", t, user][1] += 1
-                self.counters["*", project, t, "*"][1] += 1
-                self.counters[queue, "*", t, "*"][1] += 1
-                self.counters[queue, project, t, user][1] += 1
-                self.counters[queue, project, t, "*"][1] += 1
-                self.counters[queue, "*", t, user][1] += 1
-                self.counters["*", project, t, user][1] += 1
-                # Update the resource * second
-                self.counters["*", "*", t, "*"][2] += nb_resources * duration
-                self.counters["*", "*", t, user][2] += nb_resources * duration
-                self.counters["*", project, t, "*"][2] += nb_resources * duration
-                self.counters[queue, "*", t, "*"][2] += nb_resources * duration
-                self.counters[queue, project, t, user][2] += nb_resources * duration
-                self.counters[queue, project, t, "*"][2] += nb_resources * duration
-                self.counters[queue, "*", t, user][2] += nb_resources * duration
-                self.counters["*", project, t, user][2] += nb_resources * duration
+        return nb_resources, duration
+
+    def update(self, job, prev_nb_res=0, prev_duration=0):
+        self.own_counters()
+        nb_resources, duration = Quotas.job_usage(job, prev_nb_res, prev_duration)
+        resources_time = nb_resources * duration
+        counters = self.counters
+        for counters_id in Quotas.job_counters_ids(job):
+            c = counters.get(counters_id, (0, 0, 0))
+            counters[counters_id] = (
+                c[0] + nb_resources,
+                c[1] + 1,
+                c[2] + resources_time,
+            )
 
     def combine(self, quotas):
-        # self.show_counters('combine before')
-        for key, value in quotas.counters.items():
-            self.counters[key][0] = max(self.counters[key][0], value[0])
-            self.counters[key][1] = max(self.counters[key][1], value[1])
-            self.counters[key][2] += value[2]
-        # self.show_counters('combine after')
+        self.own_counters()
+        counters = self.counters
+        for counters_id, value in quotas.counters.items():
+            c = counters.get(counters_id, (0, 0, 0))
+            counters[counters_id] = (
+                max(c[0], value[0]),
+                max(c[1], value[1]),
+                c[2] + value[2],
+            )
 
     def check(self, job):
-        # self.show_counters('before check, job id: ' + str(job.id))
-        for rl_fields, rl_quotas in self.rules.items():
-            # pdb.set_trace()
-            rl_queue, rl_project, rl_job_type, rl_user = rl_fields
-            rl_nb_resources, rl_nb_jobs, rl_resources_time = rl_quotas
-            for fields, counters in self.counters.items():
-                queue, project, job_type, user = fields
-                nb_resources, nb_jobs, resources_time = counters
-                # match queue
-                if (
-                    ((rl_queue == "*") and (queue == "*"))
-                    or ((rl_queue == queue) and (job.queue_name == queue))
-                    or (rl_queue == "/")
-                ):
-                    # match project
-                    if (
-                        ((rl_project == "*") and (project == "*"))
-                        or ((rl_project == project) and (job.project == project))
-                        or (rl_project == "/")
-                    ):
-                        # match job_typ
-                        if ((rl_job_type == "*") and (job_type == "*")) or (
-                            (rl_job_type == job_type) and (job_type in job.types)
-                        ):
-                            # match user
-                            if (
-                                ((rl_user == "*") and (user == "*"))
-                                or ((rl_user == user) and (job.user == user))
-                                or (rl_user == "/")
-                            ):
-                                # test quotas values plus job's ones
-                                # 1) test nb_resources
-                                if (rl_nb_resources > -1) and (
-                                    rl_nb_resources < nb_resources
-                                ):
-                                    return (
-                                        False,
-                                        "nb resources quotas failed",
-                                        rl_fields,
-                                        rl_nb_resources,
-                                    )
-                                # 2) test nb_jobs
-                                if (rl_nb_jobs > -1) and (rl_nb_jobs < nb_jobs):
-                                    return (
-                                        False,
-                                        "nb jobs quotas failed",
-                                        rl_fields,
-                                        rl_nb_jobs,
-                                    )
-                                # 3) test resources_time (work)
-                                if (rl_resources_time > -1) and (
-                                    rl_resources_time < resources_time
-                                ):
-                                    return (
-                                        False,
-                                        "resources hours quotas failed",
-                                        rl_fields,
-                                        rl_resources_time,
-                                    )
-        return (True, "quotas ok", "", 0)
+        return Quotas.rules_index(self.rules).check(job, self.counters.get)
 
     @staticmethod
     def check_slots_quotas(slots, sid_left, sid_right, job, job_nb_resources, duration):
         # loop over slot_set
-        slots_quotas = Quotas()
-        slots_quotas.rules = slots[sid_left].quotas.rules
+        slots_quotas = []
         sid = sid_left
         while True:
             slot = slots[sid]
-            # slot.quotas.show_counters('check_slots_quotas, b e: ' + str(slot.b) + ' ' + str(slot.e))
-            slots_quotas.combine(slot.quotas)
+            slots_quotas.append(slot.quotas.counters)
 
             if sid == sid_right:
                 break
@@ -676,9 +857,42 @@ class Quotas(object):
                     slot.quotas_rules_id != slots[slot.next].quotas_rules_id
                 ):
                     return (False, "different quotas rules over job's time", "", 0)
-        # print('slots b e :' + str(slots[sid_left].b) + " " + str(slots[sid_right].e))
-        slots_quotas.update(job, job_nb_resources, duration)
-        return slots_quotas.check(job)
+
+        nb_resources, duration = Quotas.job_usage(job, job_nb_resources, duration)
+        job_counters = (nb_resources, 1, nb_resources * duration)
+        # a same counter is updated several times if queue, project or user is "*"
+        job_ids = {}
+        for counters_id in Quotas.job_counters_ids(job):
+            job_ids[counters_id] = job_ids.get(counters_id, 0) + 1
+
+        # Only the counters of the rules matching the job are combined over slots
+        # and updated with the job
+        combined = {}
+
+        def counters(counters_id):
+            if counters_id not in combined:
+                found = False
+                nb_res, nb_jobs, res_time = (0, 0, 0)
+                for slot_counters in slots_quotas:
+                    c = slot_counters.get(counters_id)
+                    if c is not None:
+                        found = True
+                        nb_res = max(nb_res, c[0])
+                        nb_jobs = max(nb_jobs, c[1])
+                        res_time += c[2]
+                n = job_ids.get(counters_id, 0)
+                if not (found or n):
+                    # counters absent over the window and not updated by the job
+                    combined[counters_id] = None
+                    return None
+                nb_res += n * job_counters[0]
+                nb_jobs += n * job_counters[1]
+                res_time += n * job_counters[2]
+                combined[counters_id] = (nb_res, nb_jobs, res_time)
+            return combined[counters_id]
+
+        rules = slots[sid_left].quotas.rules
+        return Quotas.rules_index(rules).check(job, counters)
 
     def set_rules(self, rules_id):
         """Use for temporal calendar, when rules must be change from default"""
@@ -764,13 +978,26 @@ class Quotas(object):
 
         """
         quotas_rules_filename = config["QUOTAS_CONF_FILE"]
-        with open(quotas_rules_filename) as json_file:
-            json_quotas = json.load(json_file)
+        with open(quotas_rules_filename, "rb") as json_file:
+            content = json_file.read()
+
+        key = (quotas_rules_filename, content, all_value, config.get("QUOTAS_PERIOD"))
+        if key != cls.rules_cache_key:
+            json_quotas = json.loads(content)
+            # entries missing from the file get their default values, they may have
+            # been removed since a previous loading (e.g. by a daemon)
+            calendar = None
+            default_rules = {}
+            job_types = ["*"]
             if ("periodical" in json_quotas) or ("oneshot" in json_quotas):
-                cls.calendar = Calendar(json_quotas)
+                calendar = Calendar(json_quotas)
             if "quotas" in json_quotas:
-                cls.default_rules = cls.quotas_rules_fromJson(
+                default_rules = cls.quotas_rules_fromJson(
                     json_quotas["quotas"], all_value
                 )
             if "job_types" in json_quotas:
-                cls.job_types.extend(json_quotas["job_types"])
+                job_types = ["*"] + json_quotas["job_types"]
+            cls.rules_cache = (calendar, default_rules, job_types)
+            cls.rules_cache_key = key
+
+        cls.calendar, cls.default_rules, cls.job_types = cls.rules_cache
@@ -3,11 +3,20 @@
 Scheduling functions used by :py:mod:`oar.kao.kamelot`.
 """
 import copy
+import multiprocessing
+import os
+import signal
+import time
 
 from procset import ProcSet
 
 from oar.kao.quotas import Quotas
-from oar.kao.slot import Slot, SlotSet, intersec_itvs_slots, intersec_ts_ph_itvs_slots
+from oar.kao.slot import (
+    ItvsSlidingWindow,
+    Slot,
+    intersec_ts_ph_itvs_slots,
+    new_slot_set,
+)
 from oar.lib import config, get_logger
 from oar.lib.hierarchy import find_resource_hierarchies_scattered
 from oar.lib.job_handling import ALLOW, JobPseudo
@@ -46,7 +55,7 @@ def set_slots_with_prev_scheduled_jobs(
                 logger.debug("container:" + ss_name)
 
                 if ss_name not in slots_sets:
-                    slots_sets[ss_name] = SlotSet((ProcSet(), 1))
+                    slots_sets[ss_name] = new_slot_set((ProcSet(), 1))
 
                 if job.start_time < now:
                     start_time = now
@@ -127,7 +136,9 @@ def get_encompassing_slots(slots, t_begin, t_end):
     return (sid_left, sid_right)
 
 
-def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_time):
+def find_first_suitable_contiguous_slots(
+    slots_set, job, res_rqt, hy, min_start_time, max_start_time=None
+):
     """
     Loop through time slices from a :py:class:`oar.kao.slot.SlotSet` that are long enough for the job's walltime.
     For each compatible time slice, call the function :py:func:`find_resource_hierarchies_job`
@@ -138,6 +149,8 @@ def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_
     :param res_rqt: The job resource request
     :param hy: The definition of the resources hierarchy
     :param min_start_time: The earliest date at which the job can start
+    :param max_start_time: The latest date at which the job can start (backfilling \
+        horizon), the search stops after it (defaults to `None`, no limit)
     """
 
     (mld_id, walltime, hy_res_rqts) = res_rqt
@@ -146,25 +159,35 @@ def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_
 
     slots = slots_set.slots
     cache = slots_set.cache
+    window = ItvsSlidingWindow(slots)
     # flag to control cache update for considered entry
     no_cache = False
-    # updated_cache = False
-    sid_left = 1
-    if min_start_time < 0:
-        # to not always begin by the first slots ( O(n^2) )
-        # TODO cache_by_container/inner + moldable + time_sharing(?)
-        if job.key_cache and (job.key_cache[mld_id] in cache):
-            sid_left = cache[job.key_cache[mld_id]]
-            # print("cache hit...... ", sid_left)
-            # else:
-            # print("cache miss :(")
 
+    # Slots before the cached one are not suitable for the request (resources of
+    # slots only decrease while scheduling, see SlotSet.invalidate_cache)
+    cached_sid = 1
+    if job.key_cache:
+        cached_sid = cache.get(job.key_cache[mld_id], 1)
+
+    if min_start_time < 0:
+        sid_left = cached_sid
     else:
-        while slots[sid_left].b < min_start_time:
-            sid_left = slots[sid_left].next
         # satisfy job dependencies converted in min start_time
+        sid_left = slots_set.first_slot_from(min_start_time)
+        if sid_left == 0:
+            logger.info(
+                "can't schedule job with id: {}, no slot after its dependencies".format(
+                    job.id
+                )
+            )
+            return (ProcSet(), -1, -1)
+        if slots[cached_sid].b > slots[sid_left].b:
+            sid_left = cached_sid
 
-    # sid_left = 1 # TODO no cache
+    # The cache entry can only be updated if all slots before the search's
+    # beginning are known to be unsuitable
+    if sid_left != cached_sid:
+        no_cache = True
 
     sid_right = sid_left
     slot_e = slots[sid_right].e
@@ -185,8 +208,21 @@ def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_
                 "can't schedule job with id: {}, no suitable resources".format(job.id)
             )
             return (ProcSet(), -1, -1)
+        if (max_start_time is not None) and (slot_b > max_start_time):
+            logger.info(
+                "can't schedule job with id: {}, backfilling horizon reached".format(
+                    job.id
+                )
+            )
+            return (ProcSet(), -1, -1)
         # import pdb; pdb.set_trace()
         if Quotas.calendar and (not job.no_quotas):
+            # rules of slots are set when they are reached (lazy calendar split mode or
+            # after the quotas period)
+            if slots[sid_left].quotas_rules_id == -1:
+                slots_set.temporal_quotas_slot(slots[sid_left])
+                if sid_right == sid_left:
+                    slot_e = slots[sid_right].e
             time_limit = slot_b + config["QUOTAS_WINDOW_TIME_LIMIT"]
             while (slot_e - slot_b + 1) < walltime:
                 if slot_e > time_limit:
@@ -196,20 +232,11 @@ def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_
                         )
                     )
                     return (ProcSet(), -1, -1)
-                # test next slot need to be temporal_quotas sliced
-                if slots[sid_right].quotas_rules_id == -1:
-                    # assumption is done that this part is rarely executed (either it's abnormal)
-                    t_begin = slots[sid_right].b
-                    quotas_rules_id, remaining_duration = Quotas.calendar.rules_at(
-                        t_begin
-                    )
-                    slots_set.temporal_quotas_split_slot(
-                        slots[sid_right], quotas_rules_id, remaining_duration
-                    )
-                    # TODO to long extenion extension here also
-
                 sid_right = slots[sid_right].next
                 if sid_right != 0:
+                    # test next slot need to be temporal_quotas sliced
+                    if slots[sid_right].quotas_rules_id == -1:
+                        slots_set.temporal_quotas_slot(slots[sid_right])
                     slot_e = slots[sid_right].e
                 else:
                     logger.info(
@@ -228,18 +255,17 @@ def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_
                             )
                         )
                         return (ProcSet(), -1, -1)
-        else:
-            while (slot_e - slot_b + 1) < walltime:
-                sid_right = slots[sid_right].next
-                if sid_right != 0:
-                    slot_e = slots[sid_right].e
-                else:
-                    logger.info(
-                        "can't schedule job with id: {}, walltime not satisfied: {}".format(
-                            job.id, walltime
-                        )
+        elif (slot_e - slot_b + 1) < walltime:
+            sid_right = slots_set.slot_reaching_walltime(sid_left, sid_right, walltime)
+            if sid_right != 0:
+                slot_e = slots[sid_right].e
+            else:
+                logger.info(
+                    "can't schedule job with id: {}, walltime not satisfied: {}".format(
+                        job.id, walltime
                     )
-                    return (ProcSet(), -1, -1)
+                )
+                return (ProcSet(), -1, -1)
 
         #        if not updated_cache and (slots[sid_left].itvs != []):
         #            cache[walltime] = sid_left
@@ -248,7 +274,7 @@ def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_
         if job.ts or (job.ph == ALLOW):
             itvs_avail = intersec_ts_ph_itvs_slots(slots, sid_left, sid_right, job)
         else:
-            itvs_avail = intersec_itvs_slots(slots, sid_left, sid_right)
+            itvs_avail = window.intersec_itvs(sid_left, sid_right)
         # print("itvs_avail", itvs_avail, "h_res_req", hy_res_rqts, "hy", hy)
         if job.find:
             beginning_slotset = (
@@ -293,16 +319,76 @@ def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_
 
         sid_left = slots[sid_left].next
 
-    if job.key_cache and (min_start_time < 0) and (not no_cache):  # and (not job.deps):
+    if job.key_cache and (not no_cache):
         cache[job.key_cache[mld_id]] = sid_left
-        #        print("cache: update entry ",  job.key_cache[mld_id], " with ", sid_left)
-        # else:
-        # print("cache: not updated ", job.key_cache, min_start_time, job.deps)
 
     return (itvs, sid_left, sid_right)
 
 
-def assign_resources_mld_job_split_slots(slots_set, job, hy, min_start_time):
+# Arguments of find_mld_alternatives, inherited by the forked processes
+_mld_snapshot = None
+
+
+def reset_mld_worker_signals():
+    """
+    Restore the default handler of SIGTERM in a forked worker: a handler inherited from
+    the parent process (e.g. Almighty's) would prevent the pool from terminating it.
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def find_mld_alternative(i):
+    """
+    Search the slots of the `i`-th moldable alternative of the job of `_mld_snapshot`, in a
+    forked process. The cache entry of the alternative is returned with the result to be
+    updated by the parent process.
+    """
+    slots_set, job, hy, min_start_time, max_start_time = _mld_snapshot
+    res_rqt = job.mld_res_rqts[i]
+    res_set, sid_left, sid_right = find_first_suitable_contiguous_slots(
+        slots_set, job, res_rqt, hy, min_start_time, max_start_time
+    )
+    cache_sid = None
+    if job.key_cache:
+        cache_sid = slots_set.cache.get(job.key_cache[res_rqt[0]])
+    return res_set, sid_left, sid_right, cache_sid
+
+
+def find_mld_alternatives(
+    slots_set, job, hy, min_start_time, nb_workers, max_start_time=None
+):
+    """
+    Evaluate the moldable alternatives of `job` concurrently by `nb_workers` forked
+    processes, which share a copy-on-write snapshot of `slots_set`.
+
+    The pool is forked for each job: a pool kept for the round would not see the
+    slots split by the previous jobs, the slot set would have to be pickled to its
+    workers, which costs much more than the fork (see bench/moldable_workers.py).
+
+    :return: The results of :func:`find_first_suitable_contiguous_slots` for each \
+        alternative, in the order of `job.mld_res_rqts`
+    """
+    global _mld_snapshot
+    _mld_snapshot = (slots_set, job, hy, min_start_time, max_start_time)
+    try:
+        ctx = multiprocessing.get_context("fork")
+        with ctx.Pool(
+            min(nb_workers, len(job.mld_res_rqts)), reset_mld_worker_signals
+        ) as pool:
+            results = pool.map(find_mld_alternative, range(len(job.mld_res_rqts)))
+    finally:
+        _mld_snapshot = None
+
+    for res_rqt, (_, _, _, cache_sid) in zip(job.mld_res_rqts, results):
+        if cache_sid is not None:
+            slots_set.cache[job.key_cache[res_rqt[0]]] = cache_sid
+
+    return [result[:3] for result in results]
+
+
+def assign_resources_mld_job_split_slots(
+    slots_set, job, hy, min_start_time, max_start_time=None
+):
     """
     According to a resources a :class:`SlotSet` find the time and the resources to launch a job.
     This function supports the moldable jobs. In case of multiple moldable job corresponding to the request
@@ -319,6 +405,13 @@ def assign_resources_mld_job_split_slots(slots_set, job, hy, min_start_time):
     :param Job job: The job to schedule
     :param hy: \
         The description of the resources hierarchy
+    :param min_start_time: The earliest date at which the job can start
+    :param max_start_time: The latest date at which the job can start (defaults to `None`)
+
+    With ``KAMELOT_MOLDABLE_WORKERS`` greater than 1, alternatives of a moldable job are
+    evaluated concurrently (see :func:`find_mld_alternatives`), the selected one is the
+    same as the sequential evaluation's. Temporal quotas split slots during the search,
+    alternatives are always evaluated sequentially with them.
     """
     prev_t_finish = 2**32 - 1  # large enough
     prev_res_set = ProcSet()
@@ -329,11 +422,27 @@ def assign_resources_mld_job_split_slots(slots_set, job, hy, min_start_time):
 
     res_set_nfound = 0
 
-    for res_rqt in job.mld_res_rqts:
-        mld_id, walltime, hy_res_rqts = res_rqt
-        res_set, sid_left, sid_right = find_first_suitable_contiguous_slots(
-            slots_set, job, res_rqt, hy, min_start_time
+    # more workers than processors only add forks
+    nb_workers = min(int(config["KAMELOT_MOLDABLE_WORKERS"]), os.cpu_count() or 1)
+    if (
+        (nb_workers > 1)
+        and (len(job.mld_res_rqts) > 1)
+        and (not Quotas.calendar)
+        and ("fork" in multiprocessing.get_all_start_methods())
+    ):
+        results = find_mld_alternatives(
+            slots_set, job, hy, min_start_time, nb_workers, max_start_time
         )
+    else:
+        results = (
+            find_first_suitable_contiguous_slots(
+                slots_set, job, res_rqt, hy, min_start_time, max_start_time
+            )
+            for res_rqt in job.mld_res_rqts
+        )
+
+    for res_rqt, (res_set, sid_left, sid_right) in zip(job.mld_res_rqts, results):
+        mld_id, walltime, hy_res_rqts = res_rqt
         if len(res_set) == 0:  # no suitable time*resources found
             res_set_nfound += 1
             continue
@@ -371,7 +480,41 @@ def assign_resources_mld_job_split_slots(slots_set, job, hy, min_start_time):
     return prev_sid_left, prev_sid_right, job
 
 
-def schedule_id_jobs_ct(slots_sets, jobs, hy, id_jobs, job_security_time):
+def time_budget_deadline(budget, deadline=None):
+    """
+    Return the earliest of `deadline` and the end of a time `budget` (in seconds, 0
+    meaning no budget) starting now, as a :func:`time.monotonic` value, or None.
+    """
+    budget = float(budget)
+    if budget > 0:
+        budget_end = time.monotonic() + budget
+        if (deadline is None) or (budget_end < deadline):
+            return budget_end
+    return deadline
+
+
+def backfilling_horizon(now):
+    """
+    Return the latest start time of the jobs placed beyond the first
+    SCHEDULER_BACKFILLING_DEPTH ones, `now` plus SCHEDULER_BACKFILLING_HORIZON, or
+    None if there is no horizon.
+    """
+    horizon = int(config["SCHEDULER_BACKFILLING_HORIZON"])
+    if horizon > 0:
+        return now + horizon
+    return None
+
+
+def schedule_id_jobs_ct(
+    slots_sets,
+    jobs,
+    hy,
+    id_jobs,
+    job_security_time,
+    deadline=None,
+    horizon=None,
+    depth=0,
+):
     """
     Main scheduling loop with support for jobs container - can be recursive (recursion has not been tested)
     Find an allocation for each waiting jobs.
@@ -382,12 +525,31 @@ def schedule_id_jobs_ct(slots_sets, jobs, hy, id_jobs, job_security_time):
         The description of the resources hierarchy
     :param list jobs: the list of job ids
     :param Int job_security_time: The job security time (see `oar.conf <../admin/configuration.html>`_ ``SCHEDULER_JOB_SECURITY_TIME`` variable)
+    :param float deadline: \
+        End of the time budget (see :func:`time_budget_deadline`), the jobs not yet \
+        scheduled when it is reached are not considered in this round
+    :param int horizon: \
+        Latest start time of the jobs after the first `depth` ones (see \
+        :func:`backfilling_horizon`), they are only backfilled if they can start \
+        before it. The first `depth` jobs are placed wherever they fit.
+    :return list: The ids of the jobs not considered because of the deadline
     """
 
     #    for k,job in jobs.items():
     # print("*********j_id:", k, job.mld_res_rqts[0])
 
-    for jid in id_jobs:
+    for i, jid in enumerate(id_jobs):
+        if (deadline is not None) and (time.monotonic() > deadline):
+            not_considered_jids = list(id_jobs[i:])
+            for not_considered_jid in not_considered_jids:
+                jobs[not_considered_jid].start_time = -1
+                jobs[not_considered_jid].not_considered = True
+            logger.warning(
+                "Time budget exhausted, job(s) not considered in this round: "
+                + " ".join(str(j) for j in not_considered_jids)
+            )
+            return not_considered_jids
+
         logger.debug("Schedule job:" + str(jid))
         job = jobs[jid]
 
@@ -444,6 +606,7 @@ def schedule_id_jobs_ct(slots_sets, jobs, hy, id_jobs, job_security_time):
                 next
 
             slots_set = slots_sets[ss_name]
+            max_start_time = horizon if i >= depth else None
 
             if job.assign:
                 # Use specialized assign function
@@ -456,7 +619,9 @@ def schedule_id_jobs_ct(slots_sets, jobs, hy, id_jobs, job_security_time):
                     **job.assign_kwargs
                 )
             else:
-                assign_resources_mld_job_split_slots(slots_set, job, hy, min_start_time)
+                assign_resources_mld_job_split_slots(
+                    slots_set, job, hy, min_start_time, max_start_time
+                )
 
             if "container" in job.types:
                 if job.types["container"] == "":
@@ -485,4 +650,6 @@ def schedule_id_jobs_ct(slots_sets, jobs, hy, id_jobs, job_security_time):
                         job.start_time + job.walltime - job_security_time,
                     )
                     # slot.show()
-                    slots_sets[ss_name] = SlotSet(slot)
+                    slots_sets[ss_name] = new_slot_set(slot)
+
+    return []
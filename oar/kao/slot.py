@@ -4,22 +4,53 @@ This module contains the base scheduling structures :class:`SlotSet` and :class:
 """
 
 import copy
+from bisect import bisect_left
+from types import MappingProxyType
 
 from procset import ProcSet
 
 from oar.kao.quotas import Quotas
+from oar.lib import config
 from oar.lib.job_handling import ALLOW, NO_PLACEHOLDER, PLACEHOLDER
-from oar.lib.utils import dict_ps_copy
 
 MAX_TIME = 2147483648  # (* 2**31 *)
 
+# Shared by slots without timesharing or placeholder resources
+EMPTY_ITVS_DICT = MappingProxyType({})
+
+
+def dict_set(d, key, value):
+    """
+    Return a copy of `d` where `key` is set to `value`. Dicts of slots are shared between slots and must not be
+    modified in place.
+    """
+    d = dict(d)
+    d[key] = value
+    return d
+
 
 class Slot(object):
     """
     Base scheduling class that holds information about available resources `itvs` for a time interval (between `b`  and `e`).
     The Slots is a linked structure as it also holds references on its previous and next :class:`Slot`.
+
+    Resources (`itvs`, `ts_itvs` and `ph_itvs`) are shared between the slots created by splitting a slot, they are
+    replaced, never modified in place, when they change. Quotas counters are copied on write.
     """
 
+    __slots__ = (
+        "id",
+        "prev",
+        "next",
+        "itvs",
+        "b",
+        "e",
+        "ts_itvs",
+        "ph_itvs",
+        "quotas",
+        "quotas_rules_id",
+    )
+
     def __init__(self, id, prev, next, itvs, b, e, ts_itvs=None, ph_itvs=None):
         """
         A :class:`Slot` is initialized with the ids of its previous and next Slots,
@@ -59,11 +90,11 @@ class Slot(object):
         self.e = e
         # timesharing ts_itvs: [user] * [job_name] * itvs
         if ts_itvs is None:
-            self.ts_itvs = {}
+            self.ts_itvs = EMPTY_ITVS_DICT
         else:
             self.ts_itvs = ts_itvs
         if ph_itvs is None:
-            self.ph_itvs = {}
+            self.ph_itvs = EMPTY_ITVS_DICT
         else:
             self.ph_itvs = ph_itvs  # placeholder ph_itvs: [ph_name] * itvs
 
@@ -71,6 +102,18 @@ class Slot(object):
             self.quotas = Quotas()
             self.quotas_rules_id = -1
 
+    def copy(self, id, prev, next, b, e):
+        """
+        Return a copy of the :class:`Slot` with other identifiers and time interval, sharing its resources and
+        (copied on write) its quotas counters.
+        """
+        c_slot = Slot(id, prev, next, self.itvs, b, e, self.ts_itvs, self.ph_itvs)
+        if hasattr(self, "quotas"):
+            c_slot.quotas.copy_from(self.quotas)
+            c_slot.quotas_rules_id = self.quotas_rules_id
+            c_slot.quotas.rules = self.quotas.rules
+        return c_slot
+
     def show(self):
         """
         Print a :class:`Slot` using the internal :func:`__str__` function.
@@ -95,7 +138,10 @@ class Slot(object):
             if hasattr(self, "quotas_rules_id")
             else ""
         )
-        return "Slot(%s)" % (repr_string % vars(self))
+        attrs = {name: getattr(self, name, None) for name in self.__slots__}
+        attrs["ts_itvs"] = dict(self.ts_itvs)
+        attrs["ph_itvs"] = dict(self.ph_itvs)
+        return "Slot(%s)" % (repr_string % attrs)
 
     def __repr__(self):
         return "<%s>" % self
@@ -171,6 +217,90 @@ def intersec_ts_ph_itvs_slots(slots, sid_left, sid_right, job):
     return itvs_acc
 
 
+class ItvsSlidingWindow(object):
+    """
+    Intersection of the resources of contiguous slots, maintained incrementally while the window of slots slides
+    forward in time, as done by :func:`oar.kao.scheduling.find_first_suitable_contiguous_slots`.
+
+    The window is stored as two stacks: slots are pushed on the `back` stack, whose intersection is kept up to date,
+    and popped from the `front` stack, which stores for each slot the intersection of it and of all the slots pushed
+    after it (the `front` stack is refilled from the `back` one when empty). Each slot is then pushed, moved and popped
+    once, so moving the window costs an amortized constant number of intersections whatever its length, instead of
+    recomputing the intersection of all the slots of each window with :func:`intersec_itvs_slots`.
+    """
+
+    def __init__(self, slots):
+        """
+        :param dict slots: \
+            Dict containing the :class:`Slot` indexed by id.
+        """
+        self.slots = slots
+        self.front = []  # (sid, itvs), the first slot of the window at the end
+        self.back = []  # sid, the last slot of the window at the end
+        self.back_itvs = None
+
+    def clear(self):
+        self.front = []
+        self.back = []
+        self.back_itvs = None
+
+    def push(self, sid):
+        itvs = self.slots[sid].itvs
+        self.back.append(sid)
+        if self.back_itvs is None:
+            self.back_itvs = itvs
+        else:
+            self.back_itvs = self.back_itvs & itvs
+
+    def pop(self):
+        if not self.front:
+            itvs_acc = None
+            for sid in reversed(self.back):
+                itvs = self.slots[sid].itvs
+                itvs_acc = itvs if itvs_acc is None else itvs & itvs_acc
+                self.front.append((sid, itvs_acc))
+            self.back = []
+            self.back_itvs = None
+        self.front.pop()
+
+    def first_sid(self):
+        return self.front[-1][0] if self.front else self.back[0]
+
+    def last_sid(self):
+        return self.back[-1] if self.back else self.front[0][0]
+
+    def intersec_itvs(self, sid_left, sid_right):
+        """
+        Return the :class:`ProcSet` which is the intersection of all slots from `sid_left` to `sid_right`.
+        Successive calls are expected with non decreasing `sid_left` and `sid_right` (in time order), otherwise the
+        window is rebuilt.
+        """
+        slots = self.slots
+        if (
+            (not self.front and not self.back)
+            or (slots[sid_left].b > slots[self.last_sid()].b)
+            or (slots[sid_left].b < slots[self.first_sid()].b)
+            or (slots[sid_right].b < slots[self.last_sid()].b)
+        ):
+            self.clear()
+            self.push(sid_left)
+        else:
+            b_left = slots[sid_left].b
+            while slots[self.first_sid()].b < b_left:
+                self.pop()
+
+        sid = self.last_sid()
+        while sid != sid_right:
+            sid = slots[sid].next
+            self.push(sid)
+
+        if not self.front:
+            return self.back_itvs
+        if self.back_itvs is None:
+            return self.front[-1][1]
+        return self.front[-1][1] & self.back_itvs
+
+
 class SlotSet:
     """
     :class:`SlotSet` holds a linked list of slots and provides utilities for their manipulation.
@@ -225,20 +355,21 @@ class SlotSet:
         #  (same requested resources w/ constraintes)
         self.cache = {}
 
+        self.index_slots()
+
         # Slots must be splitted according to Quotas' calendar if applied and the first has not
         # rules affected
-        # import pdb; pdb.set_trace()
         if Quotas.calendar and (self.slots[1].quotas_rules_id == -1):
-            i = 1
-            quotas_rules_id, remaining_duration = Quotas.calendar.rules_at(self.begin)
-            while (
-                i and remaining_duration
-            ):  # no more slots or quotas_period_end reached
-                slot = self.slots[i]
-                i = slot.next
-                quotas_rules_id, remaining_duration = self.temporal_quotas_split_slot(
-                    slot, quotas_rules_id, remaining_duration
-                )
+            period_end = Quotas.calendar.transitions(self.begin)
+            # in lazy mode, slots are split when reached by a search (see temporal_quotas_slot)
+            if config["QUOTAS_CALENDAR_SPLIT"] != "lazy":
+                slot = self.slots[1]
+                # no more slots or quotas_period_end reached
+                while slot.b < period_end:
+                    self.temporal_quotas_slot(slot)
+                    if not slot.next:
+                        break
+                    slot = self.slots[slot.next]
 
     def __str__(self):
         lines = []
@@ -255,21 +386,64 @@ class SlotSet:
     def show_slots(self):
         print("%s" % self)
 
+    def index_slots(self):
+        """
+        Hook called once the slots are set, to build any additional structure used to speed up their traversal.
+        The linked list of slots does not need any.
+        """
+        pass
+
+    def first_slot_from(self, t):
+        """
+        Return the id of the first :class:`Slot` beginning at or after `t`, or 0 if there is none.
+        """
+        sid = 1
+        while sid and (self.slots[sid].b < t):
+            sid = self.slots[sid].next
+        return sid
+
+    def encompassing_slots(self, t_begin, t_end):
+        """
+        Return the ids of the first and the last slots encompassing the time interval [`t_begin`, `t_end`].
+        """
+        slots = self.slots
+        sid_left = 1
+
+        while slots[sid_left].e < t_begin:
+            sid_left = slots[sid_left].next
+
+        sid_right = sid_left
+
+        while slots[sid_right].e < t_end:
+            sid_right = slots[sid_right].next
+
+        return (sid_left, sid_right)
+
+    def slot_reaching_walltime(self, sid_left, sid_right, walltime):
+        """
+        Starting from `sid_right`, return the id of the first :class:`Slot` such that the contiguous slots from `sid_left`
+        last at least `walltime`, or 0 if the end of the slot set is reached before.
+        """
+        slots = self.slots
+        slot_b = slots[sid_left].b
+        while (slots[sid_right].e - slot_b + 1) < walltime:
+            sid_right = slots[sid_right].next
+            if sid_right == 0:
+                break
+        return sid_right
+
+    def intersec_itvs(self, sid_left, sid_right):
+        """
+        Return the :class:`ProcSet` which is the intersection of all slots from `sid_left` to `sid_right`
+        (see :func:`intersec_itvs_slots`).
+        """
+        return intersec_itvs_slots(self.slots, sid_left, sid_right)
+
     def slot_before_job(self, slot, job):
         s_id = slot.id
         self.last_id += 1
         next_id = self.last_id
-        print("next id:", next_id)
-        a_slot = Slot(
-            s_id,
-            slot.prev,
-            next_id,
-            copy.copy(slot.itvs),
-            slot.b,
-            job.start_time - 1,
-            dict_ps_copy(slot.ts_itvs),
-            dict_ps_copy(slot.ph_itvs),
-        )
+        a_slot = slot.copy(s_id, slot.prev, next_id, slot.b, job.start_time - 1)
         slot.prev = s_id
         self.slots[s_id] = a_slot
         # slot_id is changed so we have always the rightmost slot (min slot.b)
@@ -277,29 +451,28 @@ class SlotSet:
         slot.id = next_id
         self.slots[next_id] = slot
 
-        if hasattr(a_slot, "quotas"):
-            a_slot.quotas.deepcopy_from(slot.quotas)
-            a_slot.quotas_rules_id = slot.quotas_rules_id
-            a_slot.quotas.set_rules(slot.quotas_rules_id)
-
     # Transform given slot to B slot (substract job resources)
     def sub_slot_during_job(self, slot, job):
         slot.b = max(slot.b, job.start_time)
         slot.e = min(slot.e, job.start_time + job.walltime - 1)
         slot.itvs = slot.itvs - job.res_set
         if job.ts:
-            if job.ts_user not in slot.ts_itvs:
-                slot.ts_itvs[job.ts_user] = {}
-
-            if job.ts_name not in slot.ts_itvs[job.ts_user]:
-                slot.ts_itvs[job.ts_user][job.ts_name] = copy.copy(job.res_set)
+            user_ts_itvs = slot.ts_itvs.get(job.ts_user, EMPTY_ITVS_DICT)
+            if job.ts_name not in user_ts_itvs:
+                slot.ts_itvs = dict_set(
+                    slot.ts_itvs,
+                    job.ts_user,
+                    dict_set(user_ts_itvs, job.ts_name, copy.copy(job.res_set)),
+                )
 
         if job.ph == ALLOW:
             if job.ph_name in slot.ph_itvs:
-                slot.ph_itvs[job.ph_name] = slot.ph_itvs[job.ph_name] - job.res_set
+                slot.ph_itvs = dict_set(
+                    slot.ph_itvs, job.ph_name, slot.ph_itvs[job.ph_name] - job.res_set
+                )
 
         if job.ph == PLACEHOLDER:
-            slot.ph_itvs[job.ph_name] = copy.copy(job.res_set)
+            slot.ph_itvs = dict_set(slot.ph_itvs, job.ph_name, copy.copy(job.res_set))
 
         if hasattr(slot, "quotas") and not ("container" in job.types):
             slot.quotas.update(job)
@@ -312,19 +485,21 @@ class SlotSet:
         if (not job.ts) and (job.ph == NO_PLACEHOLDER):
             slot.itvs = slot.itvs | job.res_set
         if job.ts:
-            if job.ts_user not in slot.ts_itvs:
-                slot.ts_itvs[job.ts_user] = {}
-            if job.ts_name not in slot.ts_itvs[job.ts_user]:
-                slot.ts_itvs[job.ts_user][job.ts_name] = copy.copy(job.res_set)
+            user_ts_itvs = slot.ts_itvs.get(job.ts_user, EMPTY_ITVS_DICT)
+            if job.ts_name not in user_ts_itvs:
+                itvs = copy.copy(job.res_set)
             else:
-                itvs = slot.ts_itvs[job.ts_user][job.ts_name]
-                slot.ts_itvs[job.ts_user][job.ts_name] = itvs | job.res_set
+                itvs = user_ts_itvs[job.ts_name] | job.res_set
+            slot.ts_itvs = dict_set(
+                slot.ts_itvs, job.ts_user, dict_set(user_ts_itvs, job.ts_name, itvs)
+            )
 
         if job.ph == PLACEHOLDER:
             if job.ph_name in slot.ph_itvs:
-                slot.ph_itvs[job.ph_name] = slot.ph_itvs[job.ph_name] | job.res_set
+                itvs = slot.ph_itvs[job.ph_name] | job.res_set
             else:
-                slot.ph_itvs[job.ph_name] = copy.copy(job.res_set)
+                itvs = copy.copy(job.res_set)
+            slot.ph_itvs = dict_set(slot.ph_itvs, job.ph_name, itvs)
 
         # PLACEHOLDER / ALLOWED need not to considered in this case
 
@@ -332,24 +507,12 @@ class SlotSet:
     def slot_after_job(self, slot, job):
         self.last_id += 1
         s_id = self.last_id
-        c_slot = Slot(
-            s_id,
-            slot.id,
-            slot.next,
-            copy.copy(slot.itvs),
-            job.start_time + job.walltime,
-            slot.e,
-            dict_ps_copy(slot.ts_itvs),
-            dict_ps_copy(slot.ph_itvs),
+        c_slot = slot.copy(
+            s_id, slot.id, slot.next, job.start_time + job.walltime, slot.e
         )
         slot.next = s_id
         self.slots[s_id] = c_slot
 
-        if hasattr(c_slot, "quotas"):
-            c_slot.quotas.deepcopy_from(slot.quotas)
-            c_slot.quotas_rules_id = slot.quotas_rules_id
-            c_slot.quotas.set_rules(slot.quotas_rules_id)
-
     def split_slots(self, sid_left, sid_right, job, sub=True):
         """
         Split slot accordingly to a job resource assignment.
@@ -365,6 +528,9 @@ class SlotSet:
 
         Generate A slot - slot before job's begin
         """
+        if (not sub) and self.cache:
+            self.invalidate_cache(job.start_time)
+
         sid = sid_left
         we_will_break = False
         while True:
@@ -425,6 +591,19 @@ class SlotSet:
             if we_will_break:
                 break
 
+    def invalidate_cache(self, t):
+        """
+        Remove the cache entries which are not valid anymore when resources are added from time `t`. An entry tells
+        that no job of its signature can begin before its slot, it stays valid only if a job of its walltime
+        (the first item of the signature) beginning before the slot ends before `t`, i.e. its slot begins at or
+        before `t - walltime + 1`.
+        """
+        self.cache = {
+            key: sid
+            for key, sid in self.cache.items()
+            if self.slots[sid].b + key[0] - 1 <= t
+        }
+
     def split_slots_jobs(self, ordered_jobs, sub=True):
         """
         Split slots according to jobs by substracting or adding jobs' assigned resources in slots.
@@ -440,7 +619,9 @@ class SlotSet:
             ordered_jobs.reverse()
 
         for job in ordered_jobs:
-            # Find first slot
+            # Find first slot, from the first one of the previous job as ids may have
+            # been swapped by its split (see slot_before_job)
+            slot = self.slots[left_sid_2_split]
             while not (
                 (slot.b > job.start_time)
                 or ((slot.b <= job.start_time) and (job.start_time <= slot.e))
@@ -449,52 +630,225 @@ class SlotSet:
                 slot = self.slots[slot.next]
 
             right_sid_2_split = left_sid_2_split
-            # Find slots encompass
-            while not (slot.e >= (job.start_time + job.walltime)):
+            # Find slots encompass, the job ends at start_time + walltime - 1
+            while not (slot.e >= (job.start_time + job.walltime - 1)):
                 right_sid_2_split = slot.next
                 slot = self.slots[slot.next]
 
             self.split_slots(left_sid_2_split, right_sid_2_split, job, sub)
 
-    def temporal_quotas_split_slot(self, slot, quotas_rules_id, remaining_duration):
-        while True:
-            # import pdb; pdb.set_trace()
-            # slot is included in actual quotas_rules
-            slot_duration = (slot.e - slot.b) + 1
-            if slot_duration <= remaining_duration:
-                slot.quotas_rules_id = quotas_rules_id
-                slot.quotas.set_rules(quotas_rules_id)
-                return (quotas_rules_id, remaining_duration - slot_duration)
-            else:
-                # created B slot, modify current A slot according to remaining_duration
-                # -----
-                # |A|B|
-                # -----
-                self.last_id += 1
-                b_id = self.last_id
-                b_slot = Slot(
-                    b_id,
-                    slot.id,
-                    slot.next,
-                    copy.copy(slot.itvs),
-                    slot.b + remaining_duration,
-                    slot.e,
-                    dict_ps_copy(slot.ts_itvs),
-                    dict_ps_copy(slot.ph_itvs),
-                )
-                self.slots[b_id] = b_slot
-                # modify current A
-                slot.next = b_id
-                slot.e = slot.b + remaining_duration - 1
-                slot.quotas_rules_id = quotas_rules_id
-                slot.quotas.set_rules(quotas_rules_id)
-
-                # What is next new rules_id / duration or quatos_period_reached
-                quotas_rules_id, remaining_duration = Quotas.calendar.next_rules(
-                    b_slot.b
-                )
-                if not remaining_duration:
-                    return (quotas_rules_id, remaining_duration)
+    def split_slot_at(self, slot, t):
+        """
+        Cut `slot` at time `t`: `slot` is shortened to end at `t - 1` and a new :class:`Slot`, beginning at `t` with the
+        same resources, is linked after it and returned.
+        """
+        self.last_id += 1
+        b_id = self.last_id
+        b_slot = Slot(
+            b_id, slot.id, slot.next, slot.itvs, t, slot.e, slot.ts_itvs, slot.ph_itvs
+        )
+        if hasattr(slot, "quotas"):
+            # quotas rules of the new slot are left to be set
+            b_slot.quotas.copy_from(slot.quotas)
+        self.slots[b_id] = b_slot
+        if slot.next:
+            self.slots[slot.next].prev = b_id
+        slot.next = b_id
+        slot.e = t - 1
+        return b_slot
+
+    def copy(self):
+        """
+        Return a copy of the slot set. Slots are copied (see :meth:`Slot.copy`), so the copy can be modified by a
+        scheduling round without altering the original one.
+        """
+        slots = {
+            sid: slot.copy(sid, slot.prev, slot.next, slot.b, slot.e)
+            for sid, slot in self.slots.items()
+        }
+
+        slot_set = type(self)(slots)
+        slot_set.last_id = self.last_id
+        return slot_set
+
+    def advance_to(self, t):
+        """
+        Move the beginning of the slot set to time `t`: slots ending before `t` are dropped and the first
+        remaining one, which takes the identifier 1, is shortened to begin at `t`.
+        """
+        slot = self.slots[1]
+        while slot.e < t and slot.next:
+            del self.slots[slot.id]
+            slot = self.slots[slot.next]
+
+        if slot.id != 1:
+            del self.slots[slot.id]
+            slot.id = 1
+            self.slots[1] = slot
+            if slot.next:
+                self.slots[slot.next].prev = 1
+        slot.prev = 0
+        slot.b = max(slot.b, t)
+
+        self.begin = slot.b
+        self.cache = {}
+        self.index_slots()
+
+    def temporal_quotas_slot(self, slot):
+        """
+        Set the quotas rules of `slot` from the transitions table of Quotas' calendar. If rules change before the end
+        of `slot`, it is cut at the change and the created slot, which has no rules affected yet, is returned.
+        """
+        quotas_rules_id, remaining_duration = Quotas.calendar.table_rules_at(slot.b)
+        if not remaining_duration:
+            return None
+
+        b_slot = None
+        if ((slot.e - slot.b) + 1) > remaining_duration:
+            # created B slot, modify current A slot according to remaining_duration
+            # -----
+            # |A|B|
+            # -----
+            b_slot = self.split_slot_at(slot, slot.b + remaining_duration)
+        slot.quotas_rules_id = quotas_rules_id
+        slot.quotas.set_rules(quotas_rules_id)
+        return b_slot
+
+    def temporal_quotas_slots(self, t_begin, t_end):
+        """
+        Set the quotas rules of the slots encompassing the time interval [`t_begin`, `t_end`] which have none (see
+        :meth:`temporal_quotas_slot`).
+        """
+        sid, _ = self.encompassing_slots(t_begin, t_begin)
+        while sid:
+            slot = self.slots[sid]
+            if slot.quotas_rules_id == -1:
+                self.temporal_quotas_slot(slot)
+            if slot.e >= t_end:
+                break
+            sid = slot.next
+
+
+class ArraySlotSet(SlotSet):
+    """
+    :class:`SlotSet` which, besides the linked list of slots, keeps the begin times, end times, ids and resources of
+    the slots in arrays sorted by time (the `i` th element of each array describes the same slot).
 
-                # for next iteration
-                slot = b_slot
+    Time lookups are done by binary search on these arrays and intersections of contiguous slots are computed on
+    array slices, instead of following the `next` ids of the linked list. As slots are contiguous and do not overlap,
+    the position of a slot in the arrays is found by a binary search of its begin time.
+
+    The linked list of slots is kept up to date, so code walking :attr:`slots` works unchanged on both implementations.
+    """
+
+    def index_slots(self):
+        self.begins = []
+        self.ends = []
+        self.sids = []
+        self.itvss = []
+        sid = 1
+        while sid:
+            slot = self.slots[sid]
+            self.begins.append(slot.b)
+            self.ends.append(slot.e)
+            self.sids.append(sid)
+            self.itvss.append(slot.itvs)
+            sid = slot.next
+
+    def position(self, slot):
+        """Return the index of `slot` in the arrays."""
+        return bisect_left(self.begins, slot.b)
+
+    def insert_index(self, slot):
+        """Insert in the arrays a `slot` newly linked in the slot set."""
+        i = bisect_left(self.begins, slot.b)
+        self.begins.insert(i, slot.b)
+        self.ends.insert(i, slot.e)
+        self.sids.insert(i, slot.id)
+        self.itvss.insert(i, slot.itvs)
+
+    def update_index(self, slot, i=None):
+        """Update the end time and the resources of `slot` (at the index `i` if already known) in the arrays."""
+        if i is None:
+            i = self.position(slot)
+        self.ends[i] = slot.e
+        self.itvss[i] = slot.itvs
+
+    def first_slot_from(self, t):
+        i = bisect_left(self.begins, t)
+        if i == len(self.sids):
+            return 0
+        return self.sids[i]
+
+    def encompassing_slots(self, t_begin, t_end):
+        i = bisect_left(self.ends, t_begin)
+        j = bisect_left(self.ends, t_end, i)
+        return (self.sids[i], self.sids[j])
+
+    def slot_reaching_walltime(self, sid_left, sid_right, walltime):
+        slot_b = self.slots[sid_left].b
+        j = bisect_left(
+            self.ends, slot_b + walltime - 1, self.position(self.slots[sid_right])
+        )
+        if j == len(self.sids):
+            return 0
+        return self.sids[j]
+
+    def intersec_itvs(self, sid_left, sid_right):
+        i = self.position(self.slots[sid_left])
+        j = self.position(self.slots[sid_right])
+        itvs_acc = self.itvss[i]
+        for itvs in self.itvss[i + 1 : j + 1]:
+            if not itvs_acc:
+                break
+            itvs_acc = itvs_acc & itvs
+        return itvs_acc
+
+    def slot_before_job(self, slot, job):
+        i = self.position(slot)
+        super().slot_before_job(slot, job)
+        a_slot = self.slots[slot.prev]
+        self.update_index(a_slot, i)
+        self.begins.insert(i + 1, job.start_time)
+        self.ends.insert(i + 1, slot.e)
+        self.sids.insert(i + 1, slot.id)
+        self.itvss.insert(i + 1, slot.itvs)
+
+    def slot_after_job(self, slot, job):
+        super().slot_after_job(slot, job)
+        self.insert_index(self.slots[slot.next])
+
+    def sub_slot_during_job(self, slot, job):
+        super().sub_slot_during_job(slot, job)
+        self.update_index(slot)
+
+    def add_slot_during_job(self, slot, job):
+        super().add_slot_during_job(slot, job)
+        self.update_index(slot)
+
+    def split_slots_jobs(self, ordered_jobs, sub=True):
+        if not sub:
+            # for adding resources we need to inverse the chronological order
+            ordered_jobs.reverse()
+
+        for job in ordered_jobs:
+            i = bisect_left(self.ends, job.start_time)
+            j = bisect_left(self.ends, job.start_time + job.walltime - 1, i)
+            self.split_slots(self.sids[i], self.sids[j], job, sub)
+
+    def split_slot_at(self, slot, t):
+        i = self.position(slot)
+        b_slot = super().split_slot_at(slot, t)
+        self.update_index(slot, i)
+        self.insert_index(b_slot)
+        return b_slot
+
+
+def new_slot_set(slots):
+    """
+    Create a slot set with the implementation selected by ``KAMELOT_SLOTSET_MODE``:
+    either ``default`` for :class:`SlotSet` or ``array`` for :class:`ArraySlotSet`.
+    """
+    if config.get("KAMELOT_SLOTSET_MODE", "default") == "array":
+        return ArraySlotSet(slots)
+    return SlotSet(slots)
@@ -0,0 +1,134 @@
+# coding: utf-8
+"""
+Per phase timing of scheduling rounds.
+
+The phases of a round (gantt initialization, waiting jobs loading, sorting,
+scheduling and saving of each group of queues, visualization update...) are timed
+with :meth:`RoundTimings.phase`, along with counts of jobs and slots. When
+SCHEDULER_TIMINGS_FILE is set, the timings of the last round are written to this
+file in the Prometheus text format (e.g. for the textfile collector of the node
+exporter)::
+
+    oar_scheduler_phase_seconds{phase="schedule",queues="default"} 0.0421
+    oar_scheduler_jobs{kind="waiting",queues="default"} 12
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from oar.lib import config, get_logger
+
+logger = get_logger("oar.kao.timing")
+
+METRICS_HELP = {
+    "oar_scheduler_round_seconds": "Duration of the last scheduling round",
+    "oar_scheduler_round_timestamp_seconds": "Time of the end of the last scheduling round",
+    "oar_scheduler_round_failed": "1 if the last scheduling round failed, 0 otherwise",
+    "oar_scheduler_phase_seconds": "Duration of the phases of the last scheduling round",
+    "oar_scheduler_jobs": "Number of jobs handled by the last scheduling round",
+    "oar_scheduler_slots": "Number of slots of the gantt after the last scheduling round",
+}
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return (
+        "{"
+        + ",".join(
+            '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+            for k, v in labels
+        )
+        + "}"
+    )
+
+
+class RoundTimings(object):
+    """Durations of phases and counts of a scheduling round, by metric labels."""
+
+    def __init__(self):
+        self.start()
+
+    def start(self):
+        """Start a new round, timings of the previous one are forgotten."""
+        self.begin = time.perf_counter()
+        self.duration = None
+        self.failed = False
+        # (name, labels) -> value, in insertion order
+        self.values = {}
+
+    def add(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.values[key] = self.values.get(key, 0) + value
+
+    @contextmanager
+    def phase(self, phase, **labels):
+        """Time the enclosed block, the durations of a same phase are summed."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(
+                "oar_scheduler_phase_seconds",
+                time.perf_counter() - t0,
+                phase=phase,
+                **labels
+            )
+
+    def count(self, kind, value, **labels):
+        """Add `value` to the number of jobs of `kind`."""
+        self.add("oar_scheduler_jobs", value, kind=kind, **labels)
+
+    def stop(self, export=True, failed=False):
+        """
+        End the round, its timings are logged and, if `export`, written to
+        SCHEDULER_TIMINGS_FILE. A `failed` round keeps the timings of the phases
+        run before the failure.
+        """
+        self.duration = time.perf_counter() - self.begin
+        self.failed = failed
+        logger.info(
+            ("Failed scheduling round" if failed else "Scheduling round")
+            + " timings: "
+            + ", ".join(
+                ["oar_scheduler_round_seconds={}".format(round(self.duration, 6))]
+                + [
+                    "{}{}={}".format(name, format_labels(labels), round(value, 6))
+                    for (name, labels), value in self.values.items()
+                ]
+            )
+        )
+        filename = config.get("SCHEDULER_TIMINGS_FILE", "")
+        if export and filename:
+            try:
+                self.write(filename)
+            except OSError as e:
+                logger.error("Cannot write scheduling round timings: " + str(e))
+
+    def metrics(self):
+        """Return the lines of the timings in the Prometheus text format."""
+        values = [
+            (("oar_scheduler_round_seconds", ()), self.duration),
+            (("oar_scheduler_round_timestamp_seconds", ()), time.time()),
+            (("oar_scheduler_round_failed", ()), int(self.failed)),
+        ] + list(self.values.items())
+        lines = []
+        for metric in METRICS_HELP:
+            samples = [(labels, v) for (name, labels), v in values if name == metric]
+            if samples:
+                lines.append("# HELP {} {}".format(metric, METRICS_HELP[metric]))
+                lines.append("# TYPE {} gauge".format(metric))
+                for labels, value in samples:
+                    lines.append("{}{} {}".format(metric, format_labels(labels), value))
+        return lines
+
+    def write(self, filename):
+        """Write the timings to `filename`, replaced at once for the readers."""
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, "w") as metrics_file:
+            metrics_file.write("\n".join(self.metrics()) + "\n")
+        os.replace(tmp_filename, filename)
+
+
+# timings of the current round
+timings = RoundTimings()
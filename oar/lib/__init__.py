@@ -29,6 +29,7 @@ all_by_module = {
         "GanttJobsPredictionsLog",
         "GanttJobsPredictionsVisu",
         "GanttJobsResource",
+        "GanttJobsResourcesInterval",
         "GanttJobsResourcesLog",
         "GanttJobsResourcesVisu",
         "Job",
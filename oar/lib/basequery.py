@@ -173,6 +173,12 @@ class BaseQueryCollection(object):
     def get_assigned_jobs_resources(self, jobs):
         """Returns the list of assigned resources associated to the job passed
         in parameter."""
+        query = self.get_assigned_jobs_resources_query(jobs)
+        return self.groupby_jobs_resources(jobs, query)
+
+    def get_assigned_jobs_resources_query(self, jobs):
+        """Returns the query of the assigned resources associated to the jobs
+        passed in parameter, with the id of their job."""
         columns = (
             "id",
             "network_address",
@@ -185,7 +191,7 @@ class BaseQueryCollection(object):
             .filter(job_id_column.in_([job.id for job in jobs]))
             .order_by(job_id_column.asc())
         )
-        return self.groupby_jobs_resources(jobs, query)
+        return query
 
     def get_assigned_one_job_resources(self, job):
         """Returns the list of assigned resources associated to the job passed
@@ -66,11 +66,26 @@ class Configuration(dict):
         "HULOT_PORT": 6672,
         # kao
         "METASCHEDULER_MODE": "internal",
+        "KAO_DAEMON_SERVER": "localhost",
+        "KAO_DAEMON_PORT": 6673,
+        "KAO_DAEMON_TIMEOUT": 600,
         # Tell the metascheduler that it runs into an oar2 installation.
         "METASCHEDULER_OAR3_WITH_OAR2": "no",
         "HIERARCHY_LABELS": "resource_id,network_address",
+        "HIERARCHY_BACKEND": "default",
+        "RESOURCES_PROPERTIES_EVALUATION": "sql",
+        "KAMELOT_SLOTSET_MODE": "default",
+        "KAMELOT_MOLDABLE_WORKERS": "0",
         "SCHEDULER_RESOURCE_ORDER": "resource_id ASC",
         "SCHEDULER_JOB_SECURITY_TIME": "60",  # TODO should be int
+        "SCHEDULER_INCREMENTAL_GANTT": "no",
+        "SCHEDULER_SAVE_ASSIGNS_MODE": "default",
+        "SCHEDULER_TIMINGS_FILE": "",
+        "SCHEDULER_ROUND_TIME_BUDGET": 0,
+        "SCHEDULER_QUEUE_TIME_BUDGET": 0,
+        "SCHEDULER_BACKFILLING_HORIZON": 0,
+        "SCHEDULER_BACKFILLING_DEPTH": 0,
+        "GANTT_RESOURCES_STORAGE": "default",
         "SCHEDULER_AVAILABLE_SUSPENDED_RESOURCE_TYPE": "default",
         "FAIRSHARING_ENABLED": "no",
         "SCHEDULER_FAIRSHARING_MAX_JOB_PER_USER": "30",
@@ -100,6 +115,7 @@ class Configuration(dict):
         "QUOTAS_ALL_NB_RESOURCES_MODE": "default_not_dead",  # ALL w/ correspond to all default source
         "QUOTAS_WINDOW_TIME_LIMIT": 4
         * 1296000,  # 2 months, window time limit for a scheduling round where to place a job
+        "QUOTAS_CALENDAR_SPLIT": "eager",  # or lazy, split slots at rules changes when reached
         "PROXY": "no",  # or treafik this only one supported proxy
         "PROXY_TRAEFIK_ENTRYPOINT": "http://localhost:5000",
         "PROXY_TRAEFIK_RULES_FILE": "/etc/oar/rules_oar_traefik_proxy.toml",
@@ -111,6 +127,7 @@ class Configuration(dict):
         "DEFAULT_JOB_WALLTIME": 3600,
         "OARSUB_DEFAULT_RESOURCES": "/resource_id=1",
         "OARSUB_NODES_RESOURCES": "resource_id",
+        "ADMISSION_RULES_SLOW_THRESHOLD": 0.5,
         "QUEUE": "default",
         "PROJECT": "default",
         "SIGNAL": 12,
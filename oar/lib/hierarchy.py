@@ -6,21 +6,106 @@ In oar, resources are organized as a `nested sets`_.
 .. _nested sets: https://en.wikipedia.org/wiki/Nested_set_model
 """
 
+from collections import OrderedDict
+from copy import copy
+
 from procset import ProcSet
 
+from oar.lib.hierarchy_bitmap import (
+    BitmapLevel,
+    bitmap_available,
+    find_resource_hierarchies_bitmap,
+)
+
+# Maximum number of searches cached by hierarchy level
+HIERARCHY_SEARCH_CACHE_SIZE = 1024
+
+
+def ids_procset(ids):
+    """
+    Return the :class:`ProcSet` of the integers `ids`, built from their intervals:
+    much faster than ``ProcSet(*ids)`` which merges the ids one by one.
+
+    Examples:
+        >>> ids_procset([5, 1, 2, 3, 7, 8])
+        ProcSet((1, 3), 5, (7, 8))
+    """
+    itvs = []
+    for i in sorted(ids):
+        if itvs and (itvs[-1][1] >= i - 1):
+            itvs[-1][1] = i
+        else:
+            itvs.append([i, i])
+    return ProcSet(*[(a, b) for a, b in itvs])
+
+
+class HierarchyLevel(list):
+    """
+    A level of hierarchy, i.e. a list of blocks of resources (:class:`ProcSet`).
+
+    It indexes the blocks' children in lower levels and caches the searches of resources
+    beginning at this level (see :func:`find_resource_hierarchies_scattered`), so blocks
+    must not be modified once the level is created. With `bitmap`, the level is also
+    stored as a :class:`BitmapLevel` to use the NumPy backend.
+    """
+
+    def __init__(self, blocks=(), bitmap=False):
+        super().__init__(blocks)
+        self.children_index = {}
+        self.sub_blocks_index = {}
+        self.search_cache = OrderedDict()
+        self.bitmap = BitmapLevel(self) if bitmap else None
+
+    def children(self, block, sub_level):
+        """
+        Return the blocks of `sub_level` included in `block`, a block of this level.
+
+        Examples:
+            >>> h0 = HierarchyLevel([ProcSet((1, 16)), ProcSet((17, 32))])
+            >>> h1 = HierarchyLevel([ProcSet((1, 8)), ProcSet((9, 16)), ProcSet((17, 32))])
+            >>> h0.children(h0[0], h1)
+            [ProcSet((1, 8)), ProcSet((9, 16))]
+        """
+        key = (id(block), id(sub_level))
+        entry = self.children_index.get(key)
+        if (entry is None) or (entry[0] is not sub_level):
+            entry = (
+                sub_level,
+                HierarchyLevel(sub for sub in sub_level if sub.issubset(block)),
+            )
+            self.children_index[key] = entry
+        return entry[1]
+
+    def sub_blocks(self, block, sub_level):
+        """
+        Return the non-empty intersections of `block`, a block of this level, with the
+        blocks of `sub_level`.
+        """
+        key = (id(block), id(sub_level))
+        entry = self.sub_blocks_index.get(key)
+        if (entry is None) or (entry[0] is not sub_level):
+            entry = (
+                sub_level,
+                [(block & x) for x in sub_level if len(block & x) != 0],
+            )
+            self.sub_blocks_index[key] = entry
+        return entry[1]
+
 
 class Hierarchy(object):
     # TODO extract hierarchy from ressources table
 
-    def __init__(
-        self,
-        hy=None,
-        hy_rid=None,
-    ):
+    def __init__(self, hy=None, hy_rid=None, backend="default"):
         if hy_rid:
+            if (backend == "numpy") and not bitmap_available():
+                raise ImportError("NumPy is required by numpy hierarchy backend")
+
             self.hy = {}
             for hy_label, hy_level_roids in hy_rid.items():
-                self.hy[hy_label] = [ProcSet(*ids) for k, ids in hy_level_roids.items()]
+                self.hy[hy_label] = HierarchyLevel(
+                    (ids_procset(ids) for k, ids in hy_level_roids.items()),
+                    bitmap=(backend == "numpy"),
+                )
         else:
             if hy:
                 self.hy = hy
@@ -118,6 +203,9 @@ def find_resource_hierarchies_scattered(itvs, hy, rqts):
     :return:
         A :class:`ProcSet` containing resources compatible with the request, or empty if the request could not be satisfied.
 
+    When the levels are :class:`HierarchyLevel` (e.g. from :class:`Hierarchy`), results are cached
+    by the first level.
+
     Examples:
         >>> # Create two levels of hierarchy
         >>> h0 = [ProcSet(*y) for y in [[(1, 16)], [(17, 32)]]]
@@ -140,6 +228,36 @@ def find_resource_hierarchies_scattered(itvs, hy, rqts):
             ProcSet()
     """
 
+    top = hy[0]
+    if not isinstance(top, HierarchyLevel):
+        return search_resource_hierarchies_scattered(itvs, hy, rqts)
+
+    # Searches are cached by the top level, the same request on the same available
+    # resources is frequent (identical jobs, slots with the same resources)
+    key = (tuple(id(level) for level in hy), tuple(rqts), tuple(itvs.intervals()))
+    entry = top.search_cache.get(key)
+    if (entry is not None) and all(a is b for a, b in zip(entry[0], hy)):
+        top.search_cache.move_to_end(key)
+    else:
+        entry = (tuple(hy), search_resource_hierarchies_scattered(itvs, hy, rqts))
+        top.search_cache[key] = entry
+        if len(top.search_cache) > HIERARCHY_SEARCH_CACHE_SIZE:
+            top.search_cache.popitem(last=False)
+
+    return copy(entry[1])
+
+
+def search_resource_hierarchies_scattered(itvs, hy, rqts):
+    """
+    Search of :func:`find_resource_hierarchies_scattered`, without cache.
+    """
+    if all(getattr(level, "bitmap", None) is not None for level in hy):
+        res = find_resource_hierarchies_bitmap(
+            itvs, [level.bitmap for level in hy], rqts
+        )
+        if res is not None:
+            return res
+
     l_hy = len(hy)
     #    print "find itvs: ", itvs, rqts[0]
     if l_hy == 1:
@@ -185,9 +303,14 @@ def find_resource_n_h(itvs, hy, rqts, top, h, h_bottom):
             while (i < l_avail_bks) and (nb_r != rqts[h]):  # need
                 # print avail_bks[i], "*", hy[h+1]
                 # TODO test cost of [] filtering .....
-                avail_sub_bks = [
-                    (avail_bks[i] & x) for x in hy[h + 1] if len(avail_bks[i] & x) != 0
-                ]
+                if isinstance(top, HierarchyLevel):
+                    avail_sub_bks = top.sub_blocks(avail_bks[i], hy[h + 1])
+                else:
+                    avail_sub_bks = [
+                        (avail_bks[i] & x)
+                        for x in hy[h + 1]
+                        if len(avail_bks[i] & x) != 0
+                    ]
                 # print avail_sub_bks
                 # print "--------------------------------------"
                 r = extract_n_scattered_block_itv(itvs, avail_sub_bks, rqts[h + 1])
@@ -212,7 +335,10 @@ def find_resource_n_h(itvs, hy, rqts, top, h, h_bottom):
                 # Current picked level
                 level = avail_bks[i]
                 # Select children of this level to propagate it into the recursive call
-                children = [sub for sub in hy[h + 1] if sub.issubset(level)]
+                if isinstance(top, HierarchyLevel):
+                    children = top.children(level, hy[h + 1])
+                else:
+                    children = [sub for sub in hy[h + 1] if sub.issubset(level)]
                 r = find_resource_n_h(itvs, hy, rqts, children, h + 1, h_bottom)
                 # print("R: {}".format(r))
                 if len(r) != 0:
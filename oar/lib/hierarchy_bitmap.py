@@ -0,0 +1,160 @@
+# coding: utf-8
+"""
+NumPy backend for resources hierarchy (see :class:`oar.lib.hierarchy.Hierarchy`).
+
+Blocks of a hierarchy level are stored as one array of resource ids, and available
+resources as a bitmap, so the blocks whose resources are all available are found by a
+single vectorized reduction instead of one :class:`ProcSet` intersection per block.
+
+NumPy is an optional dependency, this backend is only usable when it is installed.
+"""
+from itertools import chain
+
+from procset import ProcSet
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+def bitmap_available():
+    """Return True if NumPy is installed."""
+    return np is not None
+
+
+def procset_to_bitmap(itvs, size):
+    """
+    Return a boolean array of length `size` which is True for resources in `itvs`,
+    resources beyond `size` are ignored.
+    """
+    bounds = np.array([(itv.inf, itv.sup) for itv in itvs.intervals()], dtype=np.int64)
+    diff = np.zeros(size + 1, dtype=np.int64)
+    if len(bounds):
+        bounds = bounds[bounds[:, 0] < size]
+        np.add.at(diff, bounds[:, 0], 1)
+        np.add.at(diff, np.minimum(bounds[:, 1] + 1, size), -1)
+    return np.cumsum(diff[:size]) > 0
+
+
+def procset_from_ids(ids):
+    """Return the :class:`ProcSet` of an array of resource ids."""
+    if not len(ids):
+        return ProcSet()
+    ids = np.unique(ids)
+    breaks = np.flatnonzero(np.diff(ids) != 1)
+    infs = ids[np.concatenate(([0], breaks + 1))]
+    sups = ids[np.concatenate((breaks, [len(ids) - 1]))]
+    return ProcSet(*zip(infs.tolist(), sups.tolist()))
+
+
+def first_by_group(indices, groups, n):
+    """Keep the `n` first `indices` of each group, `indices` being sorted."""
+    if not len(indices):
+        return indices
+    order = np.argsort(groups, kind="stable")
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(
+        np.concatenate(([True], sorted_groups[1:] != sorted_groups[:-1]))
+    )
+    ranks = np.arange(len(indices)) - np.repeat(
+        starts, np.diff(np.concatenate((starts, [len(indices)])))
+    )
+    return np.sort(indices[order][ranks < n])
+
+
+class BitmapLevel(object):
+    """
+    Arrays of a hierarchy level: the resource ids of its blocks one after the other
+    (`members`), and the position (`offsets`) and the number of resources (`sizes`) of
+    each block in `members`.
+    """
+
+    def __init__(self, blocks):
+        sizes = [len(block) for block in blocks]
+        self.sizes = np.array(sizes, dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(self.sizes)[:-1])).astype(
+            np.int64
+        )
+        self.members = np.fromiter(
+            chain.from_iterable(blocks), dtype=np.int64, count=sum(sizes)
+        )
+        self.size = int(self.members.max()) + 1 if len(self.members) else 0
+        self.parents_index = {}
+
+    def fully_available(self, bitmap):
+        """Return for each block if all its resources are available in `bitmap`."""
+        return (
+            np.add.reduceat(bitmap[self.members], self.offsets).astype(np.int64)
+            == self.sizes
+        )
+
+    def parents(self, sub_level):
+        """
+        Return for each block of `sub_level` the index of the block of this level which
+        contains it, or None if `sub_level` is not nested in this level.
+        """
+        key = id(sub_level)
+        entry = self.parents_index.get(key)
+        if (entry is None) or (entry[0] is not sub_level):
+            entry = (sub_level, self.compute_parents(sub_level))
+            self.parents_index[key] = entry
+        return entry[1]
+
+    def compute_parents(self, sub_level):
+        if len(np.unique(self.members)) != len(self.members):
+            # blocks overlap
+            return None
+
+        size = max(self.size, sub_level.size)
+        owners = np.full(size, -1, dtype=np.int64)
+        owners[self.members] = np.repeat(np.arange(len(self.sizes)), self.sizes)
+
+        sub_owners = owners[sub_level.members]
+        first = np.minimum.reduceat(sub_owners, sub_level.offsets)
+        last = np.maximum.reduceat(sub_owners, sub_level.offsets)
+        if np.any(first != last) or np.any(first < 0):
+            return None
+        return first
+
+
+def find_resource_hierarchies_bitmap(itvs, levels, rqts):
+    """
+    Vectorized version of :func:`oar.lib.hierarchy.find_resource_hierarchies_scattered`.
+
+    :param ProcSet itvs: A :class:`ProcSet` of available resources
+    :param [BitmapLevel] levels: The specified hierarchy levels
+    :param [Integer] rqts: \
+        Array containing the number of resources needed by level of hierarchy
+    :return:
+        A :class:`ProcSet` containing resources compatible with the request, or empty if the
+        request could not be satisfied, or None if levels are not nested and the search
+        must be done by :func:`oar.lib.hierarchy.find_resource_hierarchies_scattered`.
+    """
+    parents = [levels[h].parents(levels[h + 1]) for h in range(len(levels) - 1)]
+    if any(p is None for p in parents):
+        return None
+
+    bitmap = procset_to_bitmap(itvs, max(level.size for level in levels))
+
+    # ok[h][i]: block i of level h can provide the resources requested below it
+    ok = [None] * len(levels)
+    ok[-1] = levels[-1].fully_available(bitmap)
+    for h in reversed(range(len(levels) - 1)):
+        nb_ok_children = np.bincount(
+            parents[h][ok[h + 1]], minlength=len(levels[h].sizes)
+        )
+        ok[h] = nb_ok_children >= rqts[h + 1]
+
+    chosen = np.flatnonzero(ok[0])[: rqts[0]]
+    if len(chosen) < rqts[0]:
+        return ProcSet()
+
+    for h in range(1, len(levels)):
+        candidates = np.flatnonzero(ok[h] & np.isin(parents[h - 1], chosen))
+        chosen = first_by_group(candidates, parents[h - 1][candidates], rqts[h])
+
+    level = levels[-1]
+    is_chosen = np.zeros(len(level.sizes), dtype=bool)
+    is_chosen[chosen] = True
+    return procset_from_ids(level.members[np.repeat(is_chosen, level.sizes)])
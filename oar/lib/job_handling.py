@@ -6,7 +6,7 @@ import random
 import re
 
 from procset import ProcSet
-from sqlalchemy import distinct, func, text
+from sqlalchemy import and_, distinct, func, text
 from sqlalchemy.orm import aliased
 from sqlalchemy.orm.session import make_transient
 from sqlalchemy.sql import case
@@ -20,6 +20,7 @@ from oar.lib import (
     FragJob,
     GanttJobsPrediction,
     GanttJobsResource,
+    GanttJobsResourcesInterval,
     Job,
     JobDependencie,
     JobResourceDescription,
@@ -38,6 +39,7 @@ from oar.lib.plugins import find_plugin_function
 from oar.lib.psycopg2 import pg_bulk_insert
 from oar.lib.resource_handling import (
     get_current_resources_with_suspended_job,
+    get_resources_constraints,
     update_current_scheduler_priority,
 )
 from oar.lib.tools import (
@@ -78,6 +80,10 @@ NO_PLACEHOLDER = 0
 PLACEHOLDER = 1
 ALLOW = 2
 
+# Message of the jobs not considered by a scheduling round, its time budget being
+# exhausted (see SCHEDULER_ROUND_TIME_BUDGET and SCHEDULER_QUEUE_TIME_BUDGET)
+NOT_CONSIDERED_MESSAGE = "not considered in the last scheduling round (time budget)"
+
 
 class JobPseudo(object):
     """Define a simple job class without database counter part"""
@@ -141,10 +147,11 @@ def get_waiting_jobs(queues, reservation="None"):
 
 def get_jobs_types(jids, jobs):
     jobs_types = {}
-    for j_type in db.query(JobType).filter(JobType.job_id.in_(tuple(jids))):
-        jid = j_type.job_id
+    for jid, j_type in db.query(JobType.job_id, JobType.type).filter(
+        JobType.job_id.in_(tuple(jids))
+    ):
         job = jobs[jid]
-        t_v = j_type.type.split("=")
+        t_v = j_type.split("=")
         t = t_v[0]
         if t == "timesharing":
             job.ts = True
@@ -188,23 +195,84 @@ def get_jobs_types(jids, jobs):
             job.types = {}
 
 
+class RequestSignature(tuple):
+    """
+    Hashable signature of a moldable resource request, used as key of slot_set cache:
+    jobs with the same signature find their slots in the same way.
+
+    It is made of the walltime, the hierarchy levels and the intervals of the
+    constraints of each resource group, and the find function of the job if any. Its
+    hash is computed once.
+    """
+
+    def __new__(cls, walltime, hy_res_rqts, job=None):
+        signature = (
+            walltime,
+            tuple(
+                (
+                    tuple((l_name, n) for (l_name, n) in hy_level_nbs),
+                    tuple(constraints.intervals()),
+                )
+                for (hy_level_nbs, constraints) in hy_res_rqts
+            ),
+        )
+        if (job is not None) and job.find:
+            signature += (
+                job.find_func,
+                repr(job.find_args),
+                repr(sorted(job.find_kwargs.items())),
+            )
+        self = super().__new__(cls, signature)
+        self.hash = tuple.__hash__(self)
+        return self
+
+    def __hash__(self):
+        return self.hash
+
+
 def set_jobs_cache_keys(jobs):
     """
     Set keys for job use by slot_set cache to speed up the search of suitable
-    slots.
+    slots (see :class:`RequestSignature`).
 
-    Jobs with timesharing, placeholder or dependencies requirements are not
-    suitable for this cache feature. Jobs in container might leverage of cache
-    because container is link to a particular slot_set.
+    Jobs with timesharing or allowed to use placeholders are not suitable for
+    this cache feature, resources available for them are not only those of
+    slots. Jobs in container might leverage of cache because container is link
+    to a particular slot_set.
 
-    For jobs with dependencies, they do not update the cache entries.
+    Jobs with dependencies use and update the cache entries when their search
+    begins at the cached slot (see
+    :func:`oar.kao.scheduling.find_first_suitable_contiguous_slots`).
 
     """
     for job_id, job in jobs.items():
-        if (not job.ts) and (job.ph == NO_PLACEHOLDER):
+        if (not job.ts) and (job.ph != ALLOW):
             for res_rqt in job.mld_res_rqts:
                 (moldable_id, walltime, hy_res_rqts) = res_rqt
-                job.key_cache[int(moldable_id)] = str(walltime) + str(hy_res_rqts)
+                job.key_cache[int(moldable_id)] = RequestSignature(
+                    walltime, hy_res_rqts, job
+                )
+
+
+def job_sql_constraints(j_properties, jrg_grp_property):
+    """
+    Return the SQL constraints on resources of a job's resources group, or None if
+    default resources are requested.
+    """
+    if j_properties == "" and (
+        jrg_grp_property == "" or jrg_grp_property == "type = 'default'"
+    ):
+        return None
+
+    and_sql = ""
+    if j_properties and jrg_grp_property:
+        and_sql = " AND "
+    if j_properties is None:
+        j_properties = ""
+    if jrg_grp_property is None:
+        jrg_grp_property = ""
+
+    return j_properties + and_sql + jrg_grp_property
 
 
 def get_data_jobs(jobs, jids, resource_set, job_security_time, besteffort_duration=0):
@@ -256,7 +324,13 @@ def get_data_jobs(jobs, jids, resource_set, job_security_time, besteffort_durati
     #            .join(JobResourceGroup)\
     #            .join(JobResourceDescription)\
 
-    cache_constraints = {}
+    # resources of all constraints of the jobs are retrieved at once
+    sql_constraints = set()
+    for x in result:
+        sql_constraint = job_sql_constraints(x[1], x[5])
+        if sql_constraint is not None:
+            sql_constraints.add(sql_constraint)
+    cache_constraints = get_resources_constraints(sql_constraints, resource_set)
 
     first_job = True
     prev_j_id = 0
@@ -340,31 +414,11 @@ def get_data_jobs(jobs, jids, resource_set, job_security_time, besteffort_durati
             #
             # determine resource constraints
             #
-            if j_properties == "" and (
-                jrg_grp_property == "" or jrg_grp_property == "type = 'default'"
-            ):
+            sql_constraint = job_sql_constraints(j_properties, jrg_grp_property)
+            if sql_constraint is None:
                 res_constraints = copy.copy(resource_set.default_itvs)
             else:
-                and_sql = ""
-                if j_properties and jrg_grp_property:
-                    and_sql = " AND "
-                if j_properties is None:
-                    j_properties = ""
-                if jrg_grp_property is None:
-                    jrg_grp_property = ""
-
-                sql_constraints = j_properties + and_sql + jrg_grp_property
-                if sql_constraints in cache_constraints:
-                    res_constraints = cache_constraints[sql_constraints]
-                else:
-                    request_constraints = (
-                        db.query(Resource.id).filter(text(sql_constraints)).all()
-                    )
-                    roids = [
-                        resource_set.rid_i2o[int(y[0])] for y in request_constraints
-                    ]
-                    res_constraints = ProcSet(*roids)
-                    cache_constraints[sql_constraints] = res_constraints
+                res_constraints = cache_constraints[sql_constraint]
         else:
             # add next res_type , res_value
             jr_descriptions.append((res_type, res_value))
@@ -418,45 +472,106 @@ def get_job_suspended_sum_duration(jid, now):
     return suspended_duration
 
 
+# TODO MOVE TO GANTT_HANDLING ???
+def gantt_resources_model():
+    """
+    Return the model storing the resources of the jobs in gantt, one row by resource
+    (GANTT_RESOURCES_STORAGE="default") or one row by interval of resource ids
+    ("intervals").
+    """
+    if config["GANTT_RESOURCES_STORAGE"] == "intervals":
+        return GanttJobsResourcesInterval
+    return GanttJobsResource
+
+
+def gantt_resources_filter(moldable_id, resource_id=None):
+    """
+    Return the SQL clause joining the resources of the jobs in gantt to the
+    `moldable_id` column and, if given, to the `resource_id` column.
+    """
+    model = gantt_resources_model()
+    clause = model.moldable_id == moldable_id
+    if resource_id is None:
+        return clause
+    if model is GanttJobsResourcesInterval:
+        return and_(
+            clause,
+            resource_id.between(model.resource_id_first, model.resource_id_last),
+        )
+    return and_(clause, model.resource_id == resource_id)
+
+
+def gantt_resources_columns():
+    """Return the columns of the rows of :func:`gantt_resources_rows`."""
+    if gantt_resources_model() is GanttJobsResourcesInterval:
+        return ("moldable_job_id", "resource_id_first", "resource_id_last")
+    return ("moldable_job_id", "resource_id")
+
+
+def gantt_resources_rows(moldable_id, resource_ids):
+    """
+    Return the rows of the resources table of gantt (see :func:`gantt_resources_model`)
+    for the `resource_ids` (ProcSet) of `moldable_id`.
+    """
+    if gantt_resources_model() is GanttJobsResourcesInterval:
+        return [(moldable_id, itv.inf, itv.sup) for itv in resource_ids.intervals()]
+    return [(moldable_id, rid) for rid in resource_ids]
+
+
+def get_gantt_resources(moldable_ids=None):
+    """
+    Return the resource ids (ProcSet) of the moldable jobs in gantt indexed by moldable
+    id, only of `moldable_ids` if given.
+    """
+    model = gantt_resources_model()
+    if model is GanttJobsResourcesInterval:
+        query = db.query(
+            model.moldable_id, model.resource_id_first, model.resource_id_last
+        )
+    else:
+        query = db.query(model.moldable_id, model.resource_id, model.resource_id)
+    if moldable_ids is not None:
+        if not moldable_ids:
+            return {}
+        query = query.filter(model.moldable_id.in_(tuple(moldable_ids)))
+
+    moldable_itvs = {}
+    for moldable_id, first, last in query:
+        moldable_itvs.setdefault(moldable_id, []).append((first, last))
+    return {moldable_id: ProcSet(*itvs) for moldable_id, itvs in moldable_itvs.items()}
+
+
 # TODO available_suspended_res_itvs, now
-def extract_scheduled_jobs(result, resource_set, job_security_time, now):
+def extract_scheduled_jobs(result, resources, resource_set, job_security_time, now):
+    """
+    Return the scheduled jobs of `result` rows (job, moldable id, start time, walltime)
+    with their resources `resources` (see :func:`get_gantt_resources`), moldable jobs
+    without resources are ignored.
+    """
     jids = []
     jobs_lst = []
     jobs = {}
-    prev_jid = 0
-    roids = []
     rid2jid = {}
-
-    job = None  # global job
-
-    # (job, a, b, c) = req[0]
-    if result:
-        for x in result:
-            j, moldable_id, start_time, walltime, r_id = x
-            if j.id != prev_jid:
-                if prev_jid != 0:
-                    job.res_set = ProcSet(*roids)
-                    jobs_lst.append(job)
-                    jids.append(job.id)
-                    jobs[job.id] = job
-                    roids = []
-
-                prev_jid = j.id
-                job = j
-                job.start_time = start_time
-                job.walltime = walltime + job_security_time
-                job.moldable_id = moldable_id
-                job.ts = False
-                job.ph = NO_PLACEHOLDER
-                job.assign = False
-                job.find = False
-                job.no_quotas = False
-                if job.suspended == "YES":
-                    job.walltime += get_job_suspended_sum_duration(job.id, now)
-
-            roid = resource_set.rid_i2o[r_id]
-            roids.append(roid)
-            rid2jid[roid] = j.id
+    rid_i2o = resource_set.rid_i2o
+
+    for job, moldable_id, start_time, walltime in result:
+        if moldable_id not in resources:
+            continue
+
+        job.start_time = start_time
+        job.walltime = walltime + job_security_time
+        job.moldable_id = moldable_id
+        job.ts = False
+        job.ph = NO_PLACEHOLDER
+        job.assign = False
+        job.find = False
+        job.no_quotas = False
+        if job.suspended == "YES":
+            job.walltime += get_job_suspended_sum_duration(job.id, now)
+
+        roids = [rid_i2o[rid] for rid in resources[moldable_id]]
+        for roid in roids:
+            rid2jid[roid] = job.id
 
         job.res_set = ProcSet(*roids)
         if job.state == "Suspended":
@@ -465,6 +580,8 @@ def extract_scheduled_jobs(result, resource_set, job_security_time, now):
         jobs_lst.append(job)
         jids.append(job.id)
         jobs[job.id] = job
+
+    if jids:
         get_jobs_types(jids, jobs)
 
     return (jobs, jobs_lst, jids, rid2jid)
@@ -478,10 +595,8 @@ def get_scheduled_jobs(resource_set, job_security_time, now):
             GanttJobsPrediction.moldable_id,
             GanttJobsPrediction.start_time,
             MoldableJobDescription.walltime,
-            GanttJobsResource.resource_id,
         )
         .filter(MoldableJobDescription.index == "CURRENT")
-        .filter(GanttJobsResource.moldable_id == GanttJobsPrediction.moldable_id)
         .filter(MoldableJobDescription.id == GanttJobsPrediction.moldable_id)
         .filter(Job.id == MoldableJobDescription.job_id)
         .order_by(Job.start_time, Job.id)
@@ -489,7 +604,7 @@ def get_scheduled_jobs(resource_set, job_security_time, now):
     )
 
     jobs, jobs_lst, jids, rid2jid = extract_scheduled_jobs(
-        result, resource_set, job_security_time, now
+        result, get_gantt_resources(), resource_set, job_security_time, now
     )
 
     return jobs_lst
@@ -503,21 +618,20 @@ def get_after_sched_no_AR_jobs(queue_name, resource_set, job_security_time, now)
             GanttJobsPrediction.moldable_id,
             GanttJobsPrediction.start_time,
             MoldableJobDescription.walltime,
-            GanttJobsResource.resource_id,
         )
         .filter(MoldableJobDescription.index == "CURRENT")
         .filter(Job.queue_name == queue_name)
         .filter(Job.state == "Waiting")
         .filter(Job.reservation == "None")
-        .filter(GanttJobsResource.moldable_id == GanttJobsPrediction.moldable_id)
         .filter(MoldableJobDescription.id == GanttJobsPrediction.moldable_id)
         .filter(Job.id == MoldableJobDescription.job_id)
         .order_by(Job.start_time, Job.id)
         .all()
     )
 
+    resources = get_gantt_resources([x[1] for x in result])
     _, jobs_lst, _, _ = extract_scheduled_jobs(
-        result, resource_set, job_security_time, now
+        result, resources, resource_set, job_security_time, now
     )
 
     return jobs_lst
@@ -530,21 +644,20 @@ def get_waiting_scheduled_AR_jobs(queue_name, resource_set, job_security_time, n
             GanttJobsPrediction.moldable_id,
             GanttJobsPrediction.start_time,
             MoldableJobDescription.walltime,
-            GanttJobsResource.resource_id,
         )
         .filter(MoldableJobDescription.index == "CURRENT")
         .filter(Job.queue_name == queue_name)
         .filter(Job.reservation == "Scheduled")
         .filter(Job.state == "Waiting")
-        .filter(GanttJobsResource.moldable_id == GanttJobsPrediction.moldable_id)
         .filter(MoldableJobDescription.id == GanttJobsPrediction.moldable_id)
         .filter(Job.id == MoldableJobDescription.job_id)
         .order_by(Job.start_time, Job.id)
         .all()
     )
 
+    resources = get_gantt_resources([x[1] for x in result])
     _, jobs_lst, _, _ = extract_scheduled_jobs(
-        result, resource_set, job_security_time, now
+        result, resources, resource_set, job_security_time, now
     )
 
     return jobs_lst
@@ -575,20 +688,27 @@ def get_gantt_jobs_to_launch(
             GanttJobsPrediction.moldable_id,
             GanttJobsPrediction.start_time,
             MoldableJobDescription.walltime,
-            GanttJobsResource.resource_id,
         )
         .filter(GanttJobsPrediction.start_time <= date)
         .filter(Job.state == "Waiting")
         .filter(Job.id == MoldableJobDescription.job_id)
         .filter(MoldableJobDescription.id == GanttJobsPrediction.moldable_id)
-        .filter(GanttJobsResource.moldable_id == GanttJobsPrediction.moldable_id)
-        .filter(Resource.id == GanttJobsResource.resource_id)
-        .filter(Resource.state == "Alive")
         .all()
     )
 
+    resources = {}
+    if result:
+        # only Alive resources are considered
+        alive_rids = ProcSet(
+            *[r[0] for r in db.query(Resource.id).filter(Resource.state == "Alive")]
+        )
+        for moldable_id, rids in get_gantt_resources([x[1] for x in result]).items():
+            rids = rids & alive_rids
+            if rids:
+                resources[moldable_id] = rids
+
     jobs, jobs_lst, _, rid2jid = extract_scheduled_jobs(
-        result, resource_set, job_security_time, now
+        result, resources, resource_set, job_security_time, now
     )
 
     return (jobs, jobs_lst, rid2jid)
@@ -629,83 +749,125 @@ def job_message(job, nb_resources=None):
     return message
 
 
-def save_assigns(jobs, resource_set):
-    # http://docs.sqlalchemy.org/en/rel_0_9/core/dml.html#sqlalchemy.sql.expression.Insert.values
-    if len(jobs) > 0:
-        logger.debug("nb job to save: " + str(len(jobs)))
-        mld_id_start_time_s = []
-        mld_id_rid_s = []
-        message_updates = {}
-
-        for j in jobs.values() if isinstance(jobs, dict) else jobs:
-            if j.start_time > -1:
-                logger.debug("job_id to save: " + str(j.id))
-                mld_id_start_time_s.append(
-                    {"moldable_job_id": j.moldable_id, "start_time": j.start_time}
-                )
-                riods = list(j.res_set)
+def assigns_rows(jobs, resource_set):
+    """
+    Return the rows of the assignments of the scheduled `jobs` (start time > -1) as
+    `(moldable_job_id, start_time)` tuples and rows of the resources table of gantt
+    (see :func:`gantt_resources_rows`), the names of the columns of the latter and
+    the new messages of these jobs, and of the jobs not considered in the round
+    because of its time budget, by job id.
+    """
+    mld_id_start_time_s = []
+    mld_id_rid_s = []
+    message_updates = {}
+    rid_o2i = resource_set.rid_o2i
+    intervals = gantt_resources_model() is GanttJobsResourcesInterval
+
+    for j in jobs.values() if isinstance(jobs, dict) else jobs:
+        if j.start_time > -1:
+            logger.debug("job_id to save: " + str(j.id))
+            mld_id_start_time_s.append((j.moldable_id, j.start_time))
+            riods = list(j.res_set)
+            mld_id = j.moldable_id
+            if intervals:
                 mld_id_rid_s.extend(
-                    [
-                        {
-                            "moldable_job_id": j.moldable_id,
-                            "resource_id": resource_set.rid_o2i[rid],
-                        }
-                        for rid in riods
-                    ]
+                    gantt_resources_rows(
+                        mld_id, ProcSet(*[rid_o2i[rid] for rid in riods])
+                    )
                 )
-                msg = job_message(j, nb_resources=len(riods))
-                message_updates[j.id] = msg
+            else:
+                mld_id_rid_s.extend([(mld_id, rid_o2i[rid]) for rid in riods])
+            message_updates[j.id] = job_message(j, nb_resources=len(riods))
+        elif getattr(j, "not_considered", False):
+            message_updates[j.id] = NOT_CONSIDERED_MESSAGE
+
+    return (
+        mld_id_start_time_s,
+        mld_id_rid_s,
+        gantt_resources_columns(),
+        message_updates,
+    )
 
-        if message_updates:
-            logger.info("save job messages")
-            db.session.query(Job).filter(Job.id.in_(message_updates)).update(
-                {
-                    Job.message: case(
-                        message_updates,
-                        value=Job.id,
-                    )
-                },
-                synchronize_session=False,
-            )
 
-        logger.info("save assignements")
-        db.session.execute(GanttJobsPrediction.__table__.insert(), mld_id_start_time_s)
-        db.session.execute(GanttJobsResource.__table__.insert(), mld_id_rid_s)
-        db.commit()
+def save_jobs_messages(message_updates):
+    """Update the messages of jobs, `message_updates` being a dict job id -> message."""
+    if message_updates:
+        logger.info("save job messages")
+        db.session.query(Job).filter(Job.id.in_(message_updates)).update(
+            {
+                Job.message: case(
+                    message_updates,
+                    value=Job.id,
+                )
+            },
+            synchronize_session=False,
+        )
 
 
-def save_assigns_bulk(jobs, resource_set):
+def is_copy_available():
+    """Return True if bulk copy (COPY FROM STDIN of psycopg2) can be used."""
+    return hasattr(db.engine.dialect, "psycopg2_version")
+
+
+def save_assigns(jobs, resource_set):
+    # http://docs.sqlalchemy.org/en/rel_0_9/core/dml.html#sqlalchemy.sql.expression.Insert.values
     if len(jobs) > 0:
+        if (config["SCHEDULER_SAVE_ASSIGNS_MODE"] == "copy") and is_copy_available():
+            return save_assigns_bulk(jobs, resource_set)
+
         logger.debug("nb job to save: " + str(len(jobs)))
-        mld_id_start_time_s = []
-        mld_id_rid_s = []
-        for j in jobs.values():
-            if j.start_time > -1:
-                logger.debug("job_id  to save: " + str(j.id))
-                mld_id_start_time_s.append((j.moldable_id, j.start_time))
-                riods = list(j.res_set)
-                mld_id_rid_s.extend(
-                    [(j.moldable_id, resource_set.rid_o2i[rid]) for rid in riods]
-                )
+        mld_id_start_time_s, mld_id_rid_s, columns, message_updates = assigns_rows(
+            jobs, resource_set
+        )
+        save_jobs_messages(message_updates)
 
         logger.info("save assignements")
-
-        with db.engine.connect() as to_conn:
-            cursor = to_conn.connection.cursor()
-            pg_bulk_insert(
-                cursor,
-                db["gantt_jobs_predictions"],
-                mld_id_start_time_s,
-                ("moldable_job_id", "start_time"),
-                binary=True,
+        # an insert without rows would insert a row of default values
+        if mld_id_start_time_s:
+            db.session.execute(
+                GanttJobsPrediction.__table__.insert(),
+                [
+                    {"moldable_job_id": mld_id, "start_time": start_time}
+                    for mld_id, start_time in mld_id_start_time_s
+                ],
             )
-            pg_bulk_insert(
-                cursor,
-                db["queues"],
-                mld_id_rid_s,
-                ("moldable_job_id", "resource_id"),
-                binary=True,
+        if mld_id_rid_s:
+            db.session.execute(
+                gantt_resources_model().__table__.insert(),
+                [dict(zip(columns, row)) for row in mld_id_rid_s],
             )
+        db.commit()
+
+
+def save_assigns_bulk(jobs, resource_set):
+    """
+    Same as :func:`save_assigns` but the assignments are written with COPY (binary
+    format) in the transaction of the session, PostgreSQL (psycopg2) only.
+    """
+    if len(jobs) > 0:
+        logger.debug("nb job to save: " + str(len(jobs)))
+        mld_id_start_time_s, mld_id_rid_s, columns, message_updates = assigns_rows(
+            jobs, resource_set
+        )
+        save_jobs_messages(message_updates)
+
+        logger.info("save assignements (copy)")
+        cursor = db.session.connection().connection.cursor()
+        pg_bulk_insert(
+            cursor,
+            GanttJobsPrediction.__table__,
+            mld_id_start_time_s,
+            ("moldable_job_id", "start_time"),
+            binary=True,
+        )
+        pg_bulk_insert(
+            cursor,
+            gantt_resources_model().__table__,
+            mld_id_rid_s,
+            columns,
+            binary=True,
+        )
+        db.commit()
 
 
 def get_current_jobs_dependencies(jobs):
@@ -713,22 +875,20 @@ def get_current_jobs_dependencies(jobs):
     # return an hashtable, key = job_id, value = list of required jobs *)
 
     req = (
-        db.query(JobDependencie, Job.state, Job.exit_code)
+        db.query(
+            JobDependencie.job_id,
+            JobDependencie.job_id_required,
+            Job.state,
+            Job.exit_code,
+        )
         .filter(JobDependencie.index == "CURRENT")
+        .filter(JobDependencie.job_id.in_(tuple(jobs)))
         .filter(Job.id == JobDependencie.job_id_required)
         .all()
     )
 
-    for x in req:
-        j_dep, state, exit_code = x
-        if j_dep.job_id not in jobs:
-            # This fact have no particular impact
-            logger.warning(
-                " during get dependencies for current job %s is not in waiting state"
-                % str(j_dep.job_id)
-            )
-        else:
-            jobs[j_dep.job_id].deps.append((j_dep.job_id_required, state, exit_code))
+    for jid, jid_required, state, exit_code in req:
+        jobs[jid].deps.append((jid_required, state, exit_code))
 
 
 def get_current_not_waiting_jobs():
@@ -780,18 +940,14 @@ def add_resource_jobs_pairs(tuple_mld_ids):  # pragma: no cover
 
 
 def add_resource_job_pairs(moldable_id):
-    resources_mld_ids = (
-        db.query(GanttJobsResource)
-        .filter(GanttJobsResource.moldable_id == moldable_id)
-        .all()
-    )
+    resource_ids = get_gantt_resources([moldable_id]).get(moldable_id, ProcSet())
 
     assigned_resources = [
         {
-            "moldable_job_id": res_mld_id.moldable_id,
-            "resource_id": res_mld_id.resource_id,
+            "moldable_job_id": moldable_id,
+            "resource_id": resource_id,
         }
-        for res_mld_id in resources_mld_ids
+        for resource_id in resource_ids
     ]
 
     db.session.execute(AssignedResource.__table__.insert(), assigned_resources)
@@ -1161,7 +1317,7 @@ def get_waiting_moldable_of_reservations_already_scheduled():
         .filter(Job.reservation == "Scheduled")
         .filter(Job.id == MoldableJobDescription.job_id)
         .filter(GanttJobsPrediction.moldable_id == MoldableJobDescription.id)
-        .filter(GanttJobsResource.moldable_id == MoldableJobDescription.id)
+        .filter(gantt_resources_filter(MoldableJobDescription.id))
         .order_by(Job.id)
         .distinct()
         .all()
@@ -1181,16 +1337,38 @@ def gantt_flush_tables(reservations_to_keep_mld_ids=[]):
         db.query(GanttJobsPrediction).filter(
             ~GanttJobsPrediction.moldable_id.in_(tuple(reservations_to_keep_mld_ids))
         ).delete(synchronize_session=False)
-        db.query(GanttJobsResource).filter(
-            ~GanttJobsResource.moldable_id.in_(tuple(reservations_to_keep_mld_ids))
+        gantt_resources = gantt_resources_model()
+        db.query(gantt_resources).filter(
+            ~gantt_resources.moldable_id.in_(tuple(reservations_to_keep_mld_ids))
         ).delete(synchronize_session=False)
     else:
         db.query(GanttJobsPrediction).delete(synchronize_session=False)
-        db.query(GanttJobsResource).delete(synchronize_session=False)
+        db.query(gantt_resources_model()).delete(synchronize_session=False)
 
     db.commit()
 
 
+def gantt_remove_jobs(moldable_ids):
+    """Remove the given moldable jobs from gantt tables"""
+    if moldable_ids:
+        db.query(GanttJobsPrediction).filter(
+            GanttJobsPrediction.moldable_id.in_(tuple(moldable_ids))
+        ).delete(synchronize_session=False)
+        gantt_resources = gantt_resources_model()
+        db.query(gantt_resources).filter(
+            gantt_resources.moldable_id.in_(tuple(moldable_ids))
+        ).delete(synchronize_session=False)
+        db.commit()
+
+
+def get_gantt_start_times():
+    """Return a dict of the start times of the moldable jobs in gantt, indexed by moldable id"""
+    result = db.query(
+        GanttJobsPrediction.moldable_id, GanttJobsPrediction.start_time
+    ).all()
+    return {moldable_id: start_time for moldable_id, start_time in result}
+
+
 def get_jobs_in_multiple_states(states, resource_set):
     result = (
         db.query(Job, AssignedResource.moldable_id, AssignedResource.resource_id)
@@ -1275,11 +1453,28 @@ def remove_gantt_resource_job(moldable_id, job_res_set, resource_set):
     if len(job_res_set) != 0:
         resource_ids = [resource_set.rid_o2i[rid] for rid in job_res_set]
 
-        db.query(GanttJobsResource).filter(
-            GanttJobsResource.moldable_id == moldable_id
-        ).filter(~GanttJobsResource.resource_id.in_(tuple(resource_ids))).delete(
-            synchronize_session=False
-        )
+        if gantt_resources_model() is GanttJobsResourcesInterval:
+            # intervals are rewritten with the remaining resources
+            remaining_ids = get_gantt_resources([moldable_id]).get(
+                moldable_id, ProcSet()
+            ) & ProcSet(*resource_ids)
+            db.query(GanttJobsResourcesInterval).filter(
+                GanttJobsResourcesInterval.moldable_id == moldable_id
+            ).delete(synchronize_session=False)
+            if remaining_ids:
+                db.session.execute(
+                    GanttJobsResourcesInterval.__table__.insert(),
+                    [
+                        dict(zip(gantt_resources_columns(), row))
+                        for row in gantt_resources_rows(moldable_id, remaining_ids)
+                    ],
+                )
+        else:
+            db.query(GanttJobsResource).filter(
+                GanttJobsResource.moldable_id == moldable_id
+            ).filter(~GanttJobsResource.resource_id.in_(tuple(resource_ids))).delete(
+                synchronize_session=False
+            )
 
         db.commit()
 
@@ -2651,7 +2846,21 @@ def get_possible_job_end_time_in_interval(
     only_adv_reservations = ""
     if delay_next_jobs == "YES":
         only_adv_reservations = "j.reservation != 'None' AND"
-    resources_str = ",".join([str(i) for i in resources])
+    if gantt_resources_model() is GanttJobsResourcesInterval:
+        gantt_resources_table = "gantt_jobs_resources_intervals"
+        resources_str = " OR ".join(
+            [
+                "(gr.resource_id_first <= {} AND gr.resource_id_last >= {})".format(
+                    itv.sup, itv.inf
+                )
+                for itv in ProcSet(*resources).intervals()
+            ]
+        )
+    else:
+        gantt_resources_table = "gantt_jobs_resources"
+        resources_str = "gr.resource_id IN ( {} )".format(
+            ",".join([str(i) for i in resources])
+        )
 
     # NB: we do not remove jobs from the same user, because other jobs can be behind and this may change
     # the scheduling for other users. The user can always delete his job if needed for extratime.
@@ -2686,7 +2895,7 @@ def get_possible_job_end_time_in_interval(
 SELECT
   DISTINCT gp.start_time
 FROM
-  jobs j, moldable_job_descriptions m, gantt_jobs_predictions gp, gantt_jobs_resources gr
+  jobs j, moldable_job_descriptions m, gantt_jobs_predictions gp, {} gr
 WHERE
   j.job_id = m.moldable_job_id AND
   {}
@@ -2704,9 +2913,9 @@ WHERE
       {}
       t.type = 'besteffort' )
   ) AND
-  gr.resource_id IN ( {} )
+  ( {} )
     """.format(
-        only_adv_reservations, from_, to, exclude, resources_str
+        gantt_resources_table, only_adv_reservations, from_, to, exclude, resources_str
     )
     raw_start_times = db.engine.execute(text(req))
 
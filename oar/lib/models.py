@@ -227,6 +227,20 @@ class GanttJobsResource(db.Model):
     resource_id = db.Column(db.Integer, primary_key=True, server_default="0")
 
 
+class GanttJobsResourcesInterval(db.Model):
+    __tablename__ = "gantt_jobs_resources_intervals"
+
+    moldable_id = db.Column(
+        "moldable_job_id",
+        db.Integer,
+        primary_key=True,
+        autoincrement=False,
+        server_default="0",
+    )
+    resource_id_first = db.Column(db.Integer, primary_key=True, server_default="0")
+    resource_id_last = db.Column(db.Integer, server_default="0")
+
+
 class GanttJobsResourcesLog(db.Model):
     __tablename__ = "gantt_jobs_resources_log"
 
@@ -417,6 +431,85 @@ class Resource(db.DeferredReflectionModel):
     drain = db.Column(db.String(3), server_default="NO")
 
 
+# Version of the resources, bumped by triggers of the resources table (see
+# RESOURCES_VERSION_TRIGGERS) whenever resources are added, removed or changed,
+# whatever the column and the way they are written
+resources_version = db.Table(
+    "resources_version",
+    db.Column("version", db.BigInteger, nullable=False, server_default="0"),
+)
+
+RESOURCES_VERSION_TRIGGERS = {
+    # The version is bumped once per transaction when it commits, so that it changes
+    # with the resources seen by other transactions. Changes not yet committed are
+    # counted in the oar.resources_changes setting, local to the transaction.
+    "postgresql": [
+        """
+CREATE OR REPLACE FUNCTION resources_changed() RETURNS trigger AS $$
+DECLARE
+  txid text := txid_current()::text;
+  changes text := current_setting('oar.resources_changes', true);
+BEGIN
+  IF split_part(coalesce(changes, ''), ':', 1) = txid THEN
+    changes := txid || ':' || (split_part(changes, ':', 2)::bigint + 1)::text;
+  ELSE
+    changes := txid || ':1';
+  END IF;
+  PERFORM set_config('oar.resources_changes', changes, true);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+        """
+CREATE OR REPLACE FUNCTION resources_version_bump() RETURNS trigger AS $$
+BEGIN
+  IF current_setting('oar.resources_version_txid', true)
+     IS DISTINCT FROM txid_current()::text THEN
+    PERFORM set_config('oar.resources_version_txid', txid_current()::text, true);
+    UPDATE resources_version SET version = version + 1;
+    IF NOT FOUND THEN
+      INSERT INTO resources_version (version) VALUES (1);
+    END IF;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+        """
+CREATE TRIGGER resources_changed AFTER INSERT OR UPDATE OR DELETE ON resources
+  FOR EACH STATEMENT EXECUTE PROCEDURE resources_changed()
+""",
+        """
+CREATE CONSTRAINT TRIGGER resources_version_bump
+  AFTER INSERT OR UPDATE OR DELETE ON resources
+  DEFERRABLE INITIALLY DEFERRED
+  FOR EACH ROW EXECUTE PROCEDURE resources_version_bump()
+""",
+    ],
+    # Writes are serialized by SQLite, the version is bumped at once
+    "sqlite": [
+        """
+CREATE TRIGGER resources_version_%s AFTER %s ON resources
+BEGIN
+  UPDATE resources_version SET version = version + 1;
+  INSERT INTO resources_version (version)
+    SELECT 1 WHERE NOT EXISTS (SELECT * FROM resources_version);
+END
+"""
+        % (event.lower(), event)
+        for event in ("INSERT", "UPDATE", "DELETE")
+    ],
+}
+
+for dialect, statements in RESOURCES_VERSION_TRIGGERS.items():
+    for statement in statements:
+        db.event.listen(
+            Resource.__table__,
+            "after_create",
+            db.DDL(statement).execute_if(dialect=dialect),
+        )
+
+
 class Scheduler(db.Model):
     __tablename__ = "scheduler"
 
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import random
+from io import BytesIO
 from struct import pack
 from tempfile import NamedTemporaryFile
 
@@ -77,12 +78,13 @@ def serialize_rows_to_binary(rows, columns_obj, output):
 
 
 def pg_bulk_insert_binary(cursor, table, rows, columns):
-    with NamedTemporaryFile() as tmp:
-        columns_obj = [table.columns[key] for key in columns]
-        serialize_rows_to_binary(rows, columns_obj, tmp)
-        tmp.seek(0)
-        query = "COPY %s(%s) FROM STDIN WITH BINARY" % (table.name, ", ".join(columns))
-        cursor.copy_expert(query, tmp)
+    # rows are serialized in memory, a binary row of integers is only a few bytes
+    buf = BytesIO()
+    columns_obj = [table.columns[key] for key in columns]
+    serialize_rows_to_binary(rows, columns_obj, buf)
+    buf.seek(0)
+    query = "COPY %s(%s) FROM STDIN WITH BINARY" % (table.name, ", ".join(columns))
+    cursor.copy_expert(query, buf)
 
 
 def pg_bulk_insert_csv(cursor, table, rows, columns):
@@ -5,16 +5,35 @@ from collections import OrderedDict
 from procset import ProcSet
 from sqlalchemy import text
 
-from oar.lib import Resource, config, db
-from oar.lib.hierarchy import Hierarchy
+from oar.lib import Resource, config, db, get_logger
+from oar.lib.hierarchy import Hierarchy, ids_procset
+from oar.lib.hierarchy_bitmap import bitmap_available
+from oar.lib.resource_properties import ResourcesProperties
+
+logger = get_logger("oar.lib.resource")
 
 MAX_NB_RESOURCES = 100000
 
+# Configuration used to build a ResourceSet
+RESOURCE_SET_CONFIG = (
+    "SCHEDULER_RESOURCE_ORDER",
+    "SCHEDULER_AVAILABLE_SUSPENDED_RESOURCE_TYPE",
+    "HIERARCHY_LABELS",
+    "HIERARCHY_BACKEND",
+)
+
 
 class ResourceSet(object):
+    """
+    Resources (Alive or Absent) in SCHEDULER_RESOURCE_ORDER, with their hierarchy.
+
+    With `columns_only`, only the columns needed by the resource set are queried
+    instead of loading `Resource` objects, `resources_db` is then None.
+    """
+
     default_itvs = ProcSet()
 
-    def __init__(self):
+    def __init__(self, columns_only=False):
         self.nb_resources_all = 0
         self.nb_resources_not_dead = 0
         self.nb_resources_default_not_dead = 0
@@ -61,10 +80,22 @@ class ResourceSet(object):
         self.roid_2_network_address = {}
 
         # retrieve resource in order from DB
-        self.resources_db = db.query(Resource).order_by(text(order_by_clause)).all()
+        if columns_only:
+            names = ["id", "type", "state", "network_address", "available_upto"]
+            names += [label for label in hy_labels_w_id if label not in names]
+            resources = (
+                db.query(*[getattr(Resource, name) for name in names])
+                .order_by(text(order_by_clause))
+                .all()
+            )
+            self.resources_db = None
+        else:
+            resources = db.query(Resource).order_by(text(order_by_clause)).all()
+            self.resources_db = resources
+        self.properties = None
 
         # fill the different structures
-        for roid, r in enumerate(self.resources_db):
+        for roid, r in enumerate(resources):
             self.nb_resources_all += 1
             if r.state != "Dead":
                 self.nb_resources_not_dead += 1
@@ -104,22 +135,38 @@ class ResourceSet(object):
 
         # global ordered resources intervals
         # print roids
-        self.roid_itvs = ProcSet(*roids)  # TODO
+        self.roid_itvs = ids_procset(roids)
 
         if "id" in hy_roid:
             hy_roid["resource_id"] = hy_roid["id"]
             del hy_roid["id"]
 
         # create hierarchy
-        self.hierarchy = Hierarchy(hy_rid=hy_roid).hy
+        hy_backend = config.get("HIERARCHY_BACKEND", "default")
+        if (hy_backend == "numpy") and not bitmap_available():
+            logger.warning(
+                "HIERARCHY_BACKEND is numpy but NumPy is not installed, default is used"
+            )
+            hy_backend = "default"
+        self.hierarchy = Hierarchy(hy_rid=hy_roid, backend=hy_backend).hy
 
         # transform available_upto
         for k, v in available_upto.items():
-            self.available_upto[k] = ProcSet(*v)
+            self.available_upto[k] = ids_procset(v)
 
         #
-        self.suspendable_roid_itvs = ProcSet(*suspendable_roids)
+        self.suspendable_roid_itvs = ids_procset(suspendable_roids)
 
         default_roids = [self.rid_i2o[i] for i in default_rids]
-        self.default_itvs = ProcSet(*default_roids)
+        self.default_itvs = ids_procset(default_roids)
         ResourceSet.default_itvs = self.default_itvs  # for Quotas
+
+    def resources_properties(self):
+        """Return the properties of resources stored by column (see ResourcesProperties)."""
+        if self.properties is None:
+            resources = self.resources_db
+            if resources is None:
+                columns = Resource.__mapper__.column_attrs
+                resources = db.query(*[c.class_attribute for c in columns]).all()
+            self.properties = ResourcesProperties(resources, self.rid_i2o)
+        return self.properties
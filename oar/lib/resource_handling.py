@@ -1,8 +1,11 @@
 # coding: utf-8
 """ Functions to handle resource"""
 import os
+import re
 
+from procset import ProcSet
 from sqlalchemy import distinct, func, or_, text
+from sqlalchemy.sql import case
 
 import oar.lib.tools as tools
 from oar.lib import (
@@ -19,12 +22,33 @@ from oar.lib import (
     get_logger,
 )
 from oar.lib.event import add_new_event, is_an_event_exists
+from oar.lib.models import resources_version
 from oar.lib.psycopg2 import pg_bulk_insert
+from oar.lib.resource import RESOURCE_SET_CONFIG, ResourceSet
+from oar.lib.resource_properties import UnsupportedConstraints
 
 State_to_num = {"Alive": 1, "Absent": 2, "Suspected": 3, "Dead": 4}
 
 logger = get_logger("oar.lib.resource_handling")
 
+# Number of constraints evaluated by a same query (see get_resources_constraints)
+RESOURCES_CONSTRAINTS_BATCH_SIZE = 64
+# Maximum number of SQL constraints whose resources are kept between calls
+RESOURCES_CONSTRAINTS_CACHE_SIZE = 4096
+
+# Resources satisfying SQL constraints, valid while the resources change counter
+# is unchanged (see get_resources_change_counter)
+resources_constraints_cache = {}
+resources_constraints_counter = None
+
+# ResourceSet shared by the submissions of a process to estimate jobs, and its key
+# (see get_resource_set_snapshot)
+resource_set_snapshot = None
+resource_set_snapshot_key = None
+
+_sql_quoted_re = re.compile(r"('(?:[^']|'')*')")
+_sql_spaces_re = re.compile(r"\s+")
+
 
 def add_resource(name, state):
     """Adds a new resource in the table resources and resource_properties
@@ -430,6 +454,106 @@ def get_resource_job_to_frag(r_id):
     return [r[0] for r in res]
 
 
+def get_resources_change_counter():
+    """
+    Return a value which changes when resources are added or removed, or when one of
+    their columns is changed, whatever the way they are written: it is the version
+    bumped by the triggers of the resources table (see
+    :data:`oar.lib.models.resources_version`). On PostgreSQL, it also counts the
+    changes not yet committed by the current transaction.
+    """
+    version = func.max(resources_version.c.version)
+    if db.dialect == "postgresql":
+        changes = func.current_setting("oar.resources_changes", True)
+        return tuple(db.query(version, changes).one())
+    return (db.query(version).scalar(),)
+
+
+def get_resource_set_snapshot():
+    """
+    Return a :class:`ResourceSet` built from a column-only query of the resources,
+    shared by the submissions of a process (e.g. the REST API) to estimate jobs, it
+    must not be modified. It is built again when resources change (see
+    :func:`get_resources_change_counter`) or its configuration changes.
+    """
+    global resource_set_snapshot, resource_set_snapshot_key
+
+    key = (get_resources_change_counter(),) + tuple(
+        config.get(k) for k in RESOURCE_SET_CONFIG
+    )
+    if key != resource_set_snapshot_key:
+        resource_set_snapshot = ResourceSet(columns_only=True)
+        resource_set_snapshot_key = key
+    return resource_set_snapshot
+
+
+def clear_resource_set_snapshot():
+    """Forget the ResourceSet shared by submissions."""
+    global resource_set_snapshot, resource_set_snapshot_key
+
+    resource_set_snapshot = None
+    resource_set_snapshot_key = None
+
+
+def normalize_sql_constraints(sql_constraints):
+    """Normalize whitespaces of SQL constraints, outside of quoted strings."""
+    parts = _sql_quoted_re.split(sql_constraints)
+    for i in range(0, len(parts), 2):
+        parts[i] = _sql_spaces_re.sub(" ", parts[i])
+    return "".join(parts).strip()
+
+
+def get_resources_constraints(sql_constraints, resource_set):
+    """
+    Return a dict giving, for each of the `sql_constraints`, the :class:`ProcSet` of
+    resources (in `resource_set` order) satisfying it.
+
+    Results are cached until resources change. Constraints not in cache are evaluated
+    in memory if RESOURCES_PROPERTIES_EVALUATION is "memory" and they are supported,
+    otherwise together, one query returning for each resource which constraints it
+    satisfies.
+    """
+    global resources_constraints_counter
+
+    counter = get_resources_change_counter()
+    if (counter != resources_constraints_counter) or (
+        len(resources_constraints_cache) > RESOURCES_CONSTRAINTS_CACHE_SIZE
+    ):
+        resources_constraints_cache.clear()
+        resources_constraints_counter = counter
+
+    normalized = {c: normalize_sql_constraints(c) for c in sql_constraints}
+    missing = list(
+        {c for c in normalized.values() if c not in resources_constraints_cache}
+    )
+
+    if config["RESOURCES_PROPERTIES_EVALUATION"] == "memory":
+        properties = resource_set.resources_properties()
+        sql_missing = []
+        for sql_constraint in missing:
+            try:
+                itvs = properties.evaluate(sql_constraint)
+            except UnsupportedConstraints:
+                sql_missing.append(sql_constraint)
+            else:
+                resources_constraints_cache[sql_constraint] = itvs
+        missing = sql_missing
+
+    for i in range(0, len(missing), RESOURCES_CONSTRAINTS_BATCH_SIZE):
+        batch = missing[i : i + RESOURCES_CONSTRAINTS_BATCH_SIZE]
+        columns = [case((text("(" + c + ")"), 1), else_=0) for c in batch]
+        roids = [[] for _ in batch]
+        for row in db.query(Resource.id, *columns):
+            roid = resource_set.rid_i2o[int(row[0])]
+            for k, satisfied in enumerate(row[1:]):
+                if satisfied:
+                    roids[k].append(roid)
+        for sql_constraint, c_roids in zip(batch, roids):
+            resources_constraints_cache[sql_constraint] = ProcSet(*c_roids)
+
+    return {c: resources_constraints_cache[n] for c, n in normalized.items()}
+
+
 def get_resources_with_given_sql(sql):
     """Returns the resource ids with specified properties parameters : where SQL constraints."""
     results = db.query(Resource.id).filter(text(sql)).order_by(Resource.id).all()
@@ -495,15 +619,17 @@ def get_resources_state(resource_ids):
 
 
 def get_count_busy_resources():
+    return get_count_busy_resources_query().scalar()
+
+
+def get_count_busy_resources_query():
+    """Query of the number of resources assigned to running jobs."""
     active_moldable_job_ids = db.query(Job.assigned_moldable_job).filter(
         Job.state.in_(("toLaunch", "Running", "Resuming"))
     )
-    count_busy_resources = (
-        db.query(func.count(distinct(AssignedResource.resource_id)))
-        .filter(AssignedResource.moldable_id.in_(active_moldable_job_ids))
-        .scalar()
+    return db.query(func.count(distinct(AssignedResource.resource_id))).filter(
+        AssignedResource.moldable_id.in_(active_moldable_job_ids)
     )
-    return count_busy_resources
 
 
 def resources_creation(node_name, nb_nodes, nb_core=1, vfactor=1):
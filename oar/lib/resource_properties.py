@@ -0,0 +1,234 @@
+# coding: utf-8
+"""
+In-memory evaluation of resources properties constraints (see
+:func:`oar.lib.resource_handling.get_resources_constraints`).
+
+Properties of resources are stored by column and the common subset of SQL used in
+properties constraints is evaluated on them:
+
+    - comparisons: `=`, `<>`, `!=`, and `<`, `<=`, `>`, `>=` on numeric properties
+    - `[NOT] IN (...)` and `[NOT] LIKE '...'`
+    - `AND`, `OR` and parentheses
+
+Other constraints raise :class:`UnsupportedConstraints` and must be evaluated by the
+database. As in SQL, a resource with a NULL property never satisfies a comparison on it.
+"""
+import operator
+import re
+
+from procset import ProcSet
+
+from oar.lib import Resource
+
+
+class UnsupportedConstraints(Exception):
+    """Constraints which cannot be evaluated in memory."""
+
+
+_token_re = re.compile(
+    r"""\s*(?:
+    (?P<string>'(?:[^']|'')*')
+    |(?P<number>-?\d+(?:\.\d+)?(?![\w.]))
+    |(?P<op><>|!=|<=|>=|=|<|>)
+    |(?P<punct>[(),])
+    |(?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    )""",
+    re.VERBOSE,
+)
+
+_keywords = {"and", "or", "not", "in", "like"}
+
+_comparisons = {
+    "=": operator.eq,
+    "<>": operator.ne,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def tokenize(sql_constraints):
+    """Return the list of (kind, value) tokens of `sql_constraints`."""
+    tokens = []
+    pos = 0
+    end = len(sql_constraints.rstrip())
+    while pos < end:
+        m = _token_re.match(sql_constraints, pos)
+        if not m or m.end() == pos:
+            raise UnsupportedConstraints(sql_constraints)
+        pos = m.end()
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == "string":
+            value = value[1:-1].replace("''", "'")
+        elif kind == "number":
+            value = float(value) if "." in value else int(value)
+        elif kind == "name" and value.lower() in _keywords:
+            kind = "keyword"
+            value = value.lower()
+        tokens.append((kind, value))
+    return tokens
+
+
+def like_to_regex(pattern):
+    """Translate a LIKE `pattern` (`\\` being the escape character) to a regex."""
+    regex = []
+    escaped = False
+    for c in pattern:
+        if escaped:
+            regex.append(re.escape(c))
+            escaped = False
+        elif c == "\\":
+            escaped = True
+        elif c == "%":
+            regex.append(".*")
+        elif c == "_":
+            regex.append(".")
+        else:
+            regex.append(re.escape(c))
+    return re.compile("".join(regex), re.DOTALL)
+
+
+class ResourcesProperties(object):
+    """
+    Properties of `resources` (rows of the resources table) stored by column, the
+    constraints satisfied by a resource give the resource order id `rid_i2o[id]`.
+    """
+
+    def __init__(self, resources, rid_i2o):
+        self.resources = resources
+        self.roids = [rid_i2o[int(r.id)] for r in resources]
+        self.columns = {}
+        self.attributes = {}
+        for column in Resource.__table__.columns:
+            prop = Resource.__mapper__.get_property_by_column(column)
+            try:
+                python_type = column.type.python_type
+            except NotImplementedError:
+                python_type = None
+            self.attributes[column.name] = (prop.key, python_type)
+
+    def column(self, name):
+        """Return the values of property `name` for each resource, and their type."""
+        if name not in self.attributes:
+            raise UnsupportedConstraints(name)
+        key, python_type = self.attributes[name]
+        if name not in self.columns:
+            self.columns[name] = [getattr(r, key) for r in self.resources]
+        return (self.columns[name], python_type)
+
+    def evaluate(self, sql_constraints):
+        """
+        Return the :class:`ProcSet` of order ids of resources satisfying
+        `sql_constraints`, raise :class:`UnsupportedConstraints` if they are not in
+        the supported subset of SQL.
+        """
+        parser = ConstraintsParser(self, tokenize(sql_constraints))
+        indices = parser.parse_or()
+        if parser.pos != len(parser.tokens):
+            raise UnsupportedConstraints(sql_constraints)
+        return ProcSet(*[self.roids[i] for i in indices])
+
+
+class ConstraintsParser(object):
+    """
+    Recursive descent parser of constraints `tokens`, each rule returning the indices
+    of the resources of `properties` satisfying the parsed expression.
+    """
+
+    def __init__(self, properties, tokens):
+        self.properties = properties
+        self.tokens = tokens
+        self.pos = 0
+
+    def next_token(self):
+        if self.pos >= len(self.tokens):
+            raise UnsupportedConstraints("unexpected end")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def accept(self, kind, value):
+        if (self.pos < len(self.tokens)) and (self.tokens[self.pos] == (kind, value)):
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, kind, value):
+        if not self.accept(kind, value):
+            raise UnsupportedConstraints("{} expected".format(value))
+
+    def parse_or(self):
+        indices = self.parse_and()
+        while self.accept("keyword", "or"):
+            indices = indices | self.parse_and()
+        return indices
+
+    def parse_and(self):
+        indices = self.parse_factor()
+        while self.accept("keyword", "and"):
+            indices = indices & self.parse_factor()
+        return indices
+
+    def parse_factor(self):
+        if self.accept("punct", "("):
+            indices = self.parse_or()
+            self.expect("punct", ")")
+            return indices
+
+        kind, name = self.next_token()
+        if kind != "name":
+            raise UnsupportedConstraints(name)
+        values, python_type = self.properties.column(name)
+
+        negated = self.accept("keyword", "not")
+        kind, op = self.next_token()
+        if (kind, op) == ("keyword", "in"):
+            self.expect("punct", "(")
+            literals = {self.literal(python_type)}
+            while self.accept("punct", ","):
+                literals.add(self.literal(python_type))
+            self.expect("punct", ")")
+            return self.select(values, lambda v: (v in literals) != negated)
+
+        if (kind, op) == ("keyword", "like"):
+            kind, pattern = self.next_token()
+            if (kind != "string") or (python_type is not str):
+                raise UnsupportedConstraints(pattern)
+            regex = like_to_regex(pattern)
+            return self.select(
+                values, lambda v: (regex.fullmatch(v) is not None) != negated
+            )
+
+        if negated or (kind != "op"):
+            raise UnsupportedConstraints(op)
+        if (python_type is str) and (op not in ("=", "<>", "!=")):
+            # order of strings depends on the database collation
+            raise UnsupportedConstraints(op)
+        compare = _comparisons[op]
+        literal = self.literal(python_type)
+        return self.select(values, lambda v: compare(v, literal))
+
+    def literal(self, python_type):
+        """Return the next literal token converted to the type of the compared property."""
+        kind, value = self.next_token()
+        if python_type is str:
+            if kind != "string":
+                raise UnsupportedConstraints(value)
+            return value
+        if python_type in (int, float):
+            if kind == "string":
+                try:
+                    return python_type(value)
+                except ValueError:
+                    raise UnsupportedConstraints(value)
+            if kind == "number":
+                return value
+        raise UnsupportedConstraints(value)
+
+    @staticmethod
+    def select(values, predicate):
+        """Return the indices of the not NULL `values` satisfying `predicate`."""
+        return {i for i, v in enumerate(values) if (v is not None) and predicate(v)}
@@ -4,10 +4,10 @@ import os
 import random
 import re
 import sys
+import time
 from socket import gethostname
 
-from procset import ProcSet
-from sqlalchemy import exc, text
+from sqlalchemy import exc, or_
 
 import oar.lib.tools as tools
 from oar.lib import (
@@ -21,12 +21,15 @@ from oar.lib import (
     JobType,
     MoldableJobDescription,
     Queue,
-    Resource,
     config,
     db,
+    get_logger,
 )
 from oar.lib.hierarchy import find_resource_hierarchies_scattered
-from oar.lib.resource import ResourceSet
+from oar.lib.resource_handling import (
+    get_resource_set_snapshot,
+    get_resources_constraints,
+)
 from oar.lib.tools import (
     PIPE,
     Popen,
@@ -36,6 +39,14 @@ from oar.lib.tools import (
     sql_to_local,
 )
 
+logger = get_logger("oar.lib.submission")
+
+ADMISSION_RULES_DIR = "/etc/oar/admission_rules.d/"
+
+# Compiled code of the admission rules, by rule id and text (or by file name and
+# modification time), see get_admission_rules
+admission_rules_cache = {}
+
 
 def lstrip_none(s):
     if s:
@@ -109,11 +120,14 @@ def job_key_management(
                 # read key files: oardodo su - user needed in order to be able to read the file for sure
                 # safer way to do a `cmd`, see perl cookbook (come for OAR2)
 
-                os.environ["OARDO_BECOME_USER"] = user
+                oar_user_env = os.environ.copy()
+                oar_user_env["OARDO_BECOME_USER"] = user
 
                 try:
                     process = tools.Popen(
-                        ["oardodo", "cat", import_job_key_file], stdout=PIPE
+                        ["oardodo", "cat", import_job_key_file],
+                        stdout=PIPE,
+                        env=oar_user_env,
                     )
                 except Exception:
                     error = (-14, "Unable to read: " + import_job_key_file)
@@ -238,10 +252,13 @@ def scan_script(submitted_filename, initial_request_str, user=None):
 
     if not user:
         user = os.environ["OARDO_USER"]
-    os.environ["OARDO_BECOME_USER"] = user
+    oar_user_env = os.environ.copy()
+    oar_user_env["OARDO_BECOME_USER"] = user
 
     try:
-        process = tools.Popen(["oardodo", "cat", submitted_filename], stdout=PIPE)
+        process = tools.Popen(
+            ["oardodo", "cat", submitted_filename], stdout=PIPE, env=oar_user_env
+        )
     except Exception:
         error = (-70, "Unable to read: " + submitted_filename)
         return (error, result)
@@ -471,14 +488,17 @@ def parse_resource_descriptions(
     return resource_request
 
 
-def estimate_job_nb_resources(resource_request, j_properties):
+def estimate_job_nb_resources(resource_request, j_properties, resource_set=None):
     """returns an array with an estimation of the number of resources that can be used by a job:
     (resources_available, [(nbresources => int, walltime => int)])
+    the resources are those of the shared resource set snapshot (see
+    get_resource_set_snapshot) unless resource_set is given
     """
     # estimate_job_nb_resources
     estimated_nb_resources = []
     is_resource_available = False
-    resource_set = ResourceSet()
+    if resource_set is None:
+        resource_set = get_resource_set_snapshot()
     resources_itvs = resource_set.roid_itvs
 
     for mld_idx, mld_resource_request in enumerate(resource_request):
@@ -513,9 +533,9 @@ def estimate_job_nb_resources(resource_request, j_properties):
                 sql_constraints = j_properties + and_sql + jrg_grp_property
 
                 try:
-                    request_constraints = (
-                        db.query(Resource.id).filter(text(sql_constraints)).all()
-                    )
+                    constraints = get_resources_constraints(
+                        [sql_constraints], resource_set
+                    )[sql_constraints]
                 except exc.SQLAlchemyError:
                     error_code = -5
                     error_msg = (
@@ -528,9 +548,6 @@ def estimate_job_nb_resources(resource_request, j_properties):
                     error = (error_code, error_msg)
                     return (error, None, None)
 
-                roids = [resource_set.rid_i2o[int(y[0])] for y in request_constraints]
-                constraints = ProcSet(*roids)
-
             hy_levels = []
             hy_nbs = []
             for resource_value in resource_value_lst:
@@ -567,22 +584,9 @@ def estimate_job_nb_resources(resource_request, j_properties):
     return ((0, ""), is_resource_available, estimated_nb_resources)
 
 
-def add_micheline_subjob(
-    job_parameters, ssh_private_key, ssh_public_key, array_id, array_index, command
-):
-    # Estimate_job_nb_resources and incidentally test if properties and resources request are coherent
-    # against available resources
-
-    date = get_date()
+def job_insert_kwargs(job_parameters, command, date, estimated_nb_resources):
+    """Return the values of the row of the jobs table of a job not part of an array"""
     properties = job_parameters.properties
-    resource_request = job_parameters.resource_request
-
-    error, resource_available, estimated_nb_resources = estimate_job_nb_resources(
-        resource_request, properties
-    )
-    if error[0] != 0:
-        return (error, -1)
-
     # Add admin properties to the job
     if hasattr(job_parameters, "properties_applied_after_validation:"):
         if properties:
@@ -615,8 +619,6 @@ def add_micheline_subjob(
     elif name is not None:
         stderr = re.sub(r"%jobname%", name, stderr)
 
-    # Insert job
-
     kwargs = job_parameters.kwargs(command, date)
     estimated_nbr, estimated_walltime = estimated_nb_resources[0]
     kwargs["message"] = format_job_message_text(
@@ -635,10 +637,32 @@ def add_micheline_subjob(
     else:
         kwargs["reservation"] = "None"
 
-    kwargs["array_index"] = array_index
     kwargs["stdout_file"] = stdout
     kwargs["stderr_file"] = stderr
 
+    return kwargs
+
+
+def add_micheline_subjob(
+    job_parameters, ssh_private_key, ssh_public_key, array_id, array_index, command
+):
+    # Estimate_job_nb_resources and incidentally test if properties and resources request are coherent
+    # against available resources
+
+    date = get_date()
+    properties = job_parameters.properties
+    resource_request = job_parameters.resource_request
+
+    error, resource_available, estimated_nb_resources = estimate_job_nb_resources(
+        resource_request, properties
+    )
+    if error[0] != 0:
+        return (error, -1)
+
+    # Insert job
+    kwargs = job_insert_kwargs(job_parameters, command, date, estimated_nb_resources)
+    kwargs["array_index"] = array_index
+
     if array_id > 0:
         kwargs["array_id"] = array_id
 
@@ -999,27 +1023,61 @@ def add_micheline_simple_array_job(
     return ((0, ""), job_id_list)
 
 
-def add_micheline_jobs(
-    job_parameters, import_job_key_inline, import_job_key_file, export_job_key_file
-):
-    """Adds a new job(or multiple in case of array-job) to the table Jobs applying
-    the admission rules from the base  parameters : base, jobtype, nbnodes,
-    , command, infotype, walltime, queuename, jobproperties,
-    startTimeReservation
-    return value : ref. of array of created jobids
-    side effects : adds an entry to the table Jobs
-                 the first jobid is found taking the maximal jobid from
-                 jobs in the table plus 1, the next (if any) takes the next
-                 jobid. Array-job submission is atomic and array_index are
-                 sequential
-                 the rules in the base are pieces of python code directly
-                 evaluated here, so in theory any side effect is possible
-                 in normal use, the unique effect of an admission rule should
-                 be to change parameters
+def get_admission_rules():
+    """Return the enabled admission rules as a list of (name, compiled code), read
+    from ADMISSION_RULES_DIR if ADMISSION_RULES_IN_FILES is "yes" or from the
+    database. Each rule is compiled once, its code is kept while its id and text
+    (or its file modification time) are unchanged.
     """
+    global admission_rules_cache
 
-    array_id = 0
+    rules = []
+    cache = {}
+    if ("ADMISSION_RULES_IN_FILES" in config) and (
+        config["ADMISSION_RULES_IN_FILES"] == "yes"
+    ):
+        # Read admission_rules from files
+        file_names = os.listdir(ADMISSION_RULES_DIR)
+
+        file_names.sort()
+        for file_name in file_names:
+            if re.match(r"^\d+_.*", file_name):
+                rule_file_name = ADMISSION_RULES_DIR + file_name
+                key = (file_name, os.stat(rule_file_name).st_mtime_ns)
+                if key not in admission_rules_cache:
+                    with open(rule_file_name, "r") as rule_file:
+                        admission_rules_cache[key] = compile(
+                            rule_file.read(), rule_file_name, "exec"
+                        )
+                cache[key] = admission_rules_cache[key]
+                rules.append((file_name, cache[key]))
+    else:
+        # Retrieve Micheline's rules from database
+        for rule_id, rule in (
+            db.query(AdmissionRule.id, AdmissionRule.rule)
+            .filter(AdmissionRule.enabled == "YES")
+            .order_by(AdmissionRule.priority, AdmissionRule.id)
+            .all()
+        ):
+            key = (rule_id, rule)
+            if key not in admission_rules_cache:
+                admission_rules_cache[key] = compile(
+                    rule, "<admission rule " + str(rule_id) + ">", "exec"
+                )
+            cache[key] = admission_rules_cache[key]
+            rules.append(("rule " + str(rule_id), cache[key]))
+
+    # Forget the rules removed or modified
+    admission_rules_cache = cache
+    return rules
 
+
+def apply_admission_rules(job_parameters, rules, queues=None):
+    """Check the job parameters then apply the admission rules (see
+    get_admission_rules) on them, queues can be given as the names of the existing
+    queues to avoid querying them
+    return value : error
+    """
     # TODO can we remove it ?
     if job_parameters.reservation_date:
         job_parameters.start_time = job_parameters.reservation_date
@@ -1028,80 +1086,92 @@ def add_micheline_jobs(
 
     # Check the user validity
     if not re.match(r"^[a-zA-Z0-9_-]+$", job_parameters.user):
-        error = (-11, "invalid username:", job_parameters.user)
-        return (error, [])
+        return (-11, "invalid username:", job_parameters.user)
     # Verify notify syntax
     if job_parameters.notify and not re.match(
         r"^\s*(\[\s*(.+)\s*\]\s*)?(mail|exec)\s*:.+$", job_parameters.notify
     ):
-        error = (-6, "bad syntax for the notify option.")
-        return (error, [])
+        return (-6, "bad syntax for the notify option.")
 
     # Check the stdout and stderr path validity
     if job_parameters.stdout and not re.match(
         r"^[a-zA-Z0-9_.\/\-\%\\ ]+$", job_parameters.stdout
     ):
-        error = (12, "invalid stdout file name (bad character)")
-        return (error, [])
+        return (12, "invalid stdout file name (bad character)")
 
     if job_parameters.stderr and not re.match(
         r"^[a-zA-Z0-9_.\/\-\%\\ ]+$", job_parameters.stderr
     ):
-        error = (-13, "invalid stderr file name (bad character)")
-        return (error, [])
+        return (-13, "invalid stderr file name (bad character)")
 
     # Remove no_quotas must set within admission rules or automatically for admin jobs
     if config["QUOTAS"] == "yes" and "no_quotas" in job_parameters.types:
         # TODO print Warning
         job_parameters.types.remove("no_quotas")
 
-    # Retrieve Micheline's rules
-    str_rules = ""
-    if ("ADMISSION_RULES_IN_FILES" in config) and (
-        config["ADMISSION_RULES_IN_FILES"] == "yes"
-    ):
-        # Read admission_rules from files
-        rules_dir = "/etc/oar/admission_rules.d/"
-        file_names = os.listdir(rules_dir)
-
-        file_names.sort()
-        for file_name in file_names:
-            if re.match(r"^\d+_.*", file_name):
-                with open(rules_dir + file_name, "r") as rule_file:
-                    for line in rule_file:
-                        str_rules += line
-    else:
-        # Retrieve Micheline's rules from database
-        rules = (
-            db.query(AdmissionRule.rule)
-            .filter(AdmissionRule.enabled == "YES")
-            .order_by(AdmissionRule.priority, AdmissionRule.id)
-            .all()
-        )
-        str_rules = "\n".join([r[0] for r in rules])
-
     # Apply rules
-    code = compile(str_rules, "<string>", "exec")
-
+    slow_threshold = float(config["ADMISSION_RULES_SLOW_THRESHOLD"])
     try:
-        exec(code, globals(), job_parameters.__dict__)
+        for name, code in rules:
+            t0 = time.perf_counter()
+            exec(code, globals(), job_parameters.__dict__)
+            duration = time.perf_counter() - t0
+            logger.debug("admission %s executed in %.6fs", name, duration)
+            if slow_threshold and (duration > slow_threshold):
+                logger.warning(
+                    "admission %s is slow: executed in %.3fs (user %s)",
+                    name,
+                    duration,
+                    job_parameters.user,
+                )
     except Exception:
         err = sys.exc_info()
-        error = (
+        return (
             -2,
             str(err[1]) + ", a failed admission rule prevented submitting the job.",
         )
-        return (error, [])
 
     # Test if the queue exists
-    if not db.query(Queue).filter(Queue.name == job_parameters.queue).all():
-        error = (-8, "queue " + job_parameters.queue + " does not exist")
-        return (error, [])
+    if queues is None:
+        queues = [
+            q[0]
+            for q in db.query(Queue.name).filter(Queue.name == job_parameters.queue)
+        ]
+    if job_parameters.queue not in queues:
+        return (-8, "queue " + job_parameters.queue + " does not exist")
 
     # Automatically add no quotas restriction for admin job
     if config["QUOTAS"] == "yes" and job_parameters.queue == "admin":
         job_parameters.types.append("no_quotas")
 
+    return (0, "")
+
+
+def add_micheline_jobs(
+    job_parameters, import_job_key_inline, import_job_key_file, export_job_key_file
+):
+    """Adds a new job(or multiple in case of array-job) to the table Jobs applying
+    the admission rules from the base  parameters : base, jobtype, nbnodes,
+    , command, infotype, walltime, queuename, jobproperties,
+    startTimeReservation
+    return value : ref. of array of created jobids
+    side effects : adds an entry to the table Jobs
+                 the first jobid is found taking the maximal jobid from
+                 jobs in the table plus 1, the next (if any) takes the next
+                 jobid. Array-job submission is atomic and array_index are
+                 sequential
+                 the rules in the base are pieces of python code directly
+                 evaluated here, so in theory any side effect is possible
+                 in normal use, the unique effect of an admission rule should
+                 be to change parameters
+    """
+
+    array_id = 0
+
+    error = apply_admission_rules(job_parameters, get_admission_rules())
+    if error[0] != 0:
+        return (error, [])
+
     # TODO move to job class ?
     if job_parameters.array_params:
         array_commands = [
@@ -1135,6 +1205,7 @@ def add_micheline_jobs(
                 import_job_key_inline,
                 import_job_key_file,
                 export_job_key_file,
+                user=job_parameters.user,
             )
             if error[0] != 0:
                 return (error, job_id_list)
@@ -1198,6 +1269,164 @@ def add_micheline_jobs(
     return ((0, ""), job_id_list)
 
 
+def add_micheline_jobs_batch(jobs_parameters):
+    """Adds several independent jobs at once (oarsub --batch, POST /jobs/batch).
+    The admission rules are compiled once, the queues and the resources used by the
+    estimations are retrieved once for the whole batch. Every job is checked before
+    any insertion, then the jobs are inserted with multi-row inserts and committed
+    in a single transaction: either all the jobs are submitted or none of them.
+    Array jobs and job keys are not supported in a batch.
+    return value : (error, job_id_list), the message of the error is prefixed by
+    the index of the faulty job in the batch
+    """
+    if not jobs_parameters:
+        return ((0, ""), [])
+
+    rules = get_admission_rules()
+    queues = [q[0] for q in db.query(Queue.name)]
+    resource_set = get_resource_set_snapshot()
+    date = get_date()
+
+    jobs_kwargs = []
+    for idx, job_parameters in enumerate(jobs_parameters):
+        error = apply_admission_rules(job_parameters, rules, queues)
+        if (error[0] == 0) and (
+            (job_parameters.array_nb > 1)
+            or job_parameters.array_params
+            or job_parameters.use_job_key
+        ):
+            error = (-31, "array jobs and job keys are not supported in a batch")
+        if error[0] == 0:
+            error, _, estimated_nb_resources = estimate_job_nb_resources(
+                job_parameters.resource_request,
+                job_parameters.properties,
+                resource_set,
+            )
+        if error[0] != 0:
+            msg = " ".join([str(e) for e in error[1:]])
+            return ((error[0], "job " + str(idx) + ": " + msg), [])
+
+        kwargs = job_insert_kwargs(
+            job_parameters, job_parameters.command, date, estimated_nb_resources
+        )
+        kwargs["array_index"] = 1
+        # All the jobs are visible at once on commit, there is no need to insert
+        # them in Hold state first
+        if not job_parameters.hold:
+            kwargs["state"] = "Waiting"
+        jobs_kwargs.append(kwargs)
+
+    # Insert the first job alone to get its id, the other ones are inserted with
+    # its opposite as array_id to retrieve their ids, then each job gets its own
+    # id as array_id
+    result = db.session.execute(Job.__table__.insert().values(**jobs_kwargs[0]))
+    first_job_id = result.inserted_primary_key[0]
+    job_id_list = [first_job_id]
+    if len(jobs_kwargs) > 1:
+        for kwargs in jobs_kwargs[1:]:
+            kwargs["array_id"] = -first_job_id
+        db.session.execute(Job.__table__.insert(), jobs_kwargs[1:])
+        result = (
+            db.query(Job.id)
+            .filter(Job.array_id == -first_job_id)
+            .order_by(Job.id)
+            .all()
+        )
+        job_id_list += [r[0] for r in result]
+    db.query(Job).filter(
+        or_(Job.id == first_job_id, Job.array_id == -first_job_id)
+    ).update({Job.array_id: Job.id}, synchronize_session=False)
+
+    # Ids follow the insertion order, rows of other submissions are filtered out
+    challenges = []
+    moldable_job_descriptions = []
+    resource_descs = []
+    for job_id, job_parameters in zip(job_id_list, jobs_parameters):
+        challenges.append(
+            {"job_id": job_id, "challenge": random.randint(1, 1000000000000)}
+        )
+        for resource_desc, walltime in job_parameters.resource_request:
+            if not walltime:
+                walltime = config["DEFAULT_JOB_WALLTIME"]
+            moldable_job_descriptions.append(
+                {"moldable_job_id": job_id, "moldable_walltime": walltime}
+            )
+            resource_descs.append(resource_desc)
+
+    db.session.execute(Challenge.__table__.insert(), challenges)
+    db.session.execute(
+        MoldableJobDescription.__table__.insert(), moldable_job_descriptions
+    )
+    job_ids = set(job_id_list)
+    result = (
+        db.query(MoldableJobDescription.id, MoldableJobDescription.job_id)
+        .filter(MoldableJobDescription.job_id >= first_job_id)
+        .order_by(MoldableJobDescription.id)
+        .all()
+    )
+    moldable_ids = [r[0] for r in result if r[1] in job_ids]
+
+    job_resource_groups = []
+    for moldable_id, resource_desc in zip(moldable_ids, resource_descs):
+        for prop_res in resource_desc:
+            job_resource_groups.append(
+                {
+                    "res_group_moldable_id": moldable_id,
+                    "res_group_property": prop_res["property"],
+                }
+            )
+    db.session.execute(JobResourceGroup.__table__.insert(), job_resource_groups)
+    mld_ids = set(moldable_ids)
+    result = (
+        db.query(JobResourceGroup.id, JobResourceGroup.moldable_id)
+        .filter(JobResourceGroup.moldable_id >= moldable_ids[0])
+        .order_by(JobResourceGroup.id)
+        .all()
+    )
+    res_group_ids = iter([r[0] for r in result if r[1] in mld_ids])
+
+    job_resource_descriptions = []
+    for resource_desc in resource_descs:
+        for prop_res in resource_desc:
+            res_group_id = next(res_group_ids)
+            for order, res_val in enumerate(prop_res["resources"]):
+                job_resource_descriptions.append(
+                    {
+                        "res_job_group_id": res_group_id,
+                        "res_job_resource_type": res_val["resource"],
+                        "res_job_value": res_val["value"],
+                        "res_job_order": order,
+                    }
+                )
+    db.session.execute(
+        JobResourceDescription.__table__.insert(), job_resource_descriptions
+    )
+
+    jobs_types = []
+    jobs_dependencies = []
+    job_state_logs = []
+    for job_id, job_parameters in zip(job_id_list, jobs_parameters):
+        for typ in job_parameters.types:
+            jobs_types.append({"job_id": job_id, "type": typ})
+        for dep in job_parameters.dependencies or []:
+            jobs_dependencies.append({"job_id": job_id, "job_id_required": dep})
+        job_state_logs.append(
+            {
+                "job_id": job_id,
+                "job_state": "Hold" if job_parameters.hold else "Waiting",
+                "date_start": date,
+            }
+        )
+    if jobs_types:
+        db.session.execute(JobType.__table__.insert(), jobs_types)
+    if jobs_dependencies:
+        db.session.execute(JobDependencie.__table__.insert(), jobs_dependencies)
+    db.session.execute(JobStateLog.__table__.insert(), job_state_logs)
+    db.commit()
+
+    return ((0, ""), job_id_list)
+
+
 def check_reservation(reservation_date_str):
     reservationn_date_str = lstrip_none(reservation_date_str)
     if reservationn_date_str:
@@ -10,7 +10,13 @@ This module is the OAR server. It decides what actions must be performed. It is
     - The third one handles a pool of forked processes that are used to launch and
       stop the jobs.
 
+The modules called by the automaton (meta scheduler, sarko, finaud, leon and
+node change state) are launched as processes, or run in the Almighty process with
+ALMIGHTY_MODULES_MODE="internal", which avoids the startup of a process (python,
+configuration, database connection) for each call. With META_SCHED_DAEMON="yes", the
+scheduling rounds are requested to a resident meta scheduler (`kao --daemon`).
 """
+import importlib
 import os
 import re
 import signal
@@ -21,7 +27,7 @@ import time
 import zmq
 
 import oar.lib.tools as tools
-from oar.lib import config, get_logger
+from oar.lib import config, db, get_logger
 
 # Set undefined config value to default one
 DEFAULT_CONFIG = {
@@ -32,6 +38,8 @@ DEFAULT_CONFIG = {
     "FINAUD_FREQUENCY": "300",
     "LOG_FILE": "/var/log/oar.log",
     "ENERGY_SAVING_INTERNAL": "no",
+    "ALMIGHTY_MODULES_MODE": "process",
+    "META_SCHED_DAEMON": "no",
 }
 
 config.setdefault_config(DEFAULT_CONFIG)
@@ -87,8 +95,27 @@ read_commands_timeout = 5 * 1000  # in ms
 # This parameter sets the number of pending commands read from
 # appendice before proceeding with internal work
 # should not be set at a too high value as this would make the
-# Almighty weak against flooding
-max_successive_read = 1
+# Almighty weak against flooding (commands being coalesced in the queue, a
+# burst of notifications only delays the internal work)
+max_successive_read = 32
+
+# State of the automaton handling each command, commands handled by the same
+# state are coalesced in the command queue (e.g. a burst of submissions
+# triggers one scheduling)
+command_states = {
+    "Qsub": "Scheduler",
+    "Qsub -I": "Scheduler",
+    "Term": "Scheduler",
+    "BipBip": "Scheduler",
+    "Scheduling": "Scheduler",
+    "Qresume": "Scheduler",
+    "Walltime": "Scheduler",
+    "Qdel": "Leon",
+    "Villains": "Check for villains",
+    "Finaud": "Check node states",
+    "Time": "Time update",
+    "ChState": "Change node state",
+}
 
 # Max waiting time before new scheduling attempt (in the case of
 # no notification)
@@ -149,6 +176,91 @@ def launch_command(command):
     return return_code
 
 
+def run_module(name, run):
+    """
+    Run in the Almighty process the module `name`, `run` being a function returning
+    its exit code. Like the process of the module, an exception gives the exit
+    code 1 and an exit() of the module gives its exit code, Almighty goes on.
+    """
+    logger.debug("Running module : [" + name + "]")
+
+    try:
+        return_code = run()
+    except SystemExit as e:
+        logger.error(name + " exited with code " + str(e.code))
+        db.rollback()
+        if e.code is None:
+            return_code = 0
+        elif isinstance(e.code, int):
+            return_code = e.code
+        else:
+            return_code = 1
+    except Exception:
+        logger.exception(name + " failed")
+        db.rollback()
+        return_code = 1
+    finally:
+        # next runs must not use objects loaded by this one
+        db.session.close()
+
+    logger.debug(name + " terminated")
+    logger.debug("Exit value : " + str(return_code))
+
+    return return_code
+
+
+def run_internal_meta_scheduler():
+    meta_sched = importlib.import_module("oar.kao.meta_sched")
+    platform = importlib.import_module("oar.kao.platform")
+    # as in a new process, jobs to launch are notified again
+    meta_sched.to_launch_jobs_already_treated.clear()
+    return meta_sched.meta_schedule(
+        config["METASCHEDULER_MODE"], platform.Platform(keep_resource_set=True)
+    )
+
+
+kao_daemon_client = None
+
+
+def request_kao_daemon():
+    """Request a scheduling round to the resident meta scheduler (kao --daemon)."""
+    global kao_daemon_client
+    if kao_daemon_client is None:
+        kao_daemon_client = importlib.import_module("oar.kao.kao").KaoDaemonClient()
+    return kao_daemon_client.schedule()
+
+
+def run_internal_sarko():
+    sarko = importlib.import_module("oar.modules.sarko").Sarko()
+    sarko.run()
+    return sarko.guilty_found
+
+
+def run_internal_finaud():
+    finaud = importlib.import_module("oar.modules.finaud").Finaud()
+    finaud.run()
+    return finaud.return_value
+
+
+def run_internal_leon():
+    leon = importlib.import_module("oar.modules.leon").Leon()
+    leon.run()
+    return leon.exit_code
+
+
+def run_internal_node_change_state():
+    node_change_state = importlib.import_module(
+        "oar.modules.node_change_state"
+    ).NodeChangeState()
+    node_change_state.run()
+    return node_change_state.exit_code
+
+
+def internal_modules():
+    """Return True if the modules are run in the Almighty process."""
+    return config["ALMIGHTY_MODULES_MODE"] == "internal"
+
+
 def start_hulot():
     """Start :mod:`oar.kao.hulot`"""
     return tools.Popen(hulot_command)
@@ -166,26 +278,39 @@ def check_hulot(hulot):
 
 def meta_scheduler():
     """Start :mod:`oar.kao.meta_sched`"""
+    if config["META_SCHED_DAEMON"] == "yes":
+        return request_kao_daemon()
+    # an external meta scheduler command is always launched
+    if internal_modules() and config["META_SCHED_CMD"] == "kao":
+        return run_module("kao", run_internal_meta_scheduler)
     return launch_command(meta_sched_command)
 
 
 def check_for_villains():
     """Start :mod:`oar.modules.sarko`"""
+    if internal_modules():
+        return run_module("sarko", run_internal_sarko)
     return launch_command(check_for_villains_command)
 
 
 def check_nodes():
     """Start :mod:`oar.modules.finaud`"""
+    if internal_modules():
+        return run_module("finaud", run_internal_finaud)
     return launch_command(check_for_node_changes)
 
 
 def leon():
     """Start :mod:`oar.modules.leon`"""
+    if internal_modules():
+        return run_module("leon", run_internal_leon)
     return launch_command(leon_command)
 
 
 def nodeChangeState():
     """Start :mod:`oar.modules.node_change_state`"""
+    if internal_modules():
+        return run_module("node_change_state", run_internal_node_change_state)
     return launch_command(nodeChangeState_command)
 
 
@@ -285,36 +410,40 @@ class Almighty(object):
     def add_command(self, command):
         """as commands are just notifications that will
         handle all the modifications in the base up to now, we should
-        avoid duplication in the command file"""
+        avoid duplication in the command file: a command is not added if
+        a pending command is handled by the same state of the automaton"""
 
-        m = re.compile("^" + command + "$")
-        flag = True
+        state = command_states.get(command)
         for cmd in self.command_queue:
-            if re.match(m, cmd):
-                flag = False
-                break
+            if (cmd == command) or (
+                (state is not None) and (command_states.get(cmd) == state)
+            ):
+                return
 
-        if flag:
-            self.command_queue.append(command)
+        self.command_queue.append(command)
 
     def read_commands(self, timeout=read_commands_timeout):  # TODO
         """read commands until reaching the maximal successive read value or
         having read all of the pending commands"""
 
-        command = None
         remaining = max_successive_read
 
-        while (command != "Time") and remaining:
+        while remaining:
             command = self.qget(timeout)
-            if remaining != max_successive_read:
-                timeout = 0
             if command is None:
                 break
+            if (timeout == 0) and (command["cmd"] == "Time"):
+                # no more pending command
+                break
             self.add_command(command["cmd"])
             remaining -= 1
             logger.debug(
                 "Got command " + command["cmd"] + ", " + str(remaining) + " remaining"
             )
+            if command["cmd"] == "Time":
+                break
+            # only pending commands are read then
+            timeout = 0
 
     def run(self, loop=True):
         """Start :mod:`oar.modules.almigthy` main loop."""
@@ -341,11 +470,11 @@ class Almighty(object):
                 start_hulot(self)
             # QGET
             elif self.state == "Qget":
-                # if len(self.command_queue) > 0:
-                # self.read_commands(0)
-                #    pass
-                # else:
-                self.read_commands(read_commands_timeout)
+                # do not wait for new commands if some are pending
+                if len(self.command_queue) > 0:
+                    self.read_commands(0)
+                else:
+                    self.read_commands(read_commands_timeout)
 
                 logger.debug("Command queue : " + str(self.command_queue))
                 command = self.command_queue.pop(0)
@@ -354,26 +483,8 @@ class Almighty(object):
                     command = self.command_queue.pop(0)
 
                 logger.debug("Qtype = [" + command + "]")
-                if (
-                    (command == "Qsub")
-                    or (command == "Qsub -I")
-                    or (command == "Term")
-                    or (command == "BipBip")
-                    or (command == "Scheduling")
-                    or (command == "Qresume")
-                    or (command == "Walltime")
-                ):
-                    self.state = "Scheduler"
-                elif command == "Qdel":
-                    self.state = "Leon"
-                elif command == "Villains":
-                    self.state = "Check for villains"
-                elif command == "Finaud":
-                    self.state = "Check node states"
-                elif command == "Time":
-                    self.state = "Time update"
-                elif command == "ChState":
-                    self.state = "Change node state"
+                if command in command_states:
+                    self.state = command_states[command]
                 else:
                     logger.error("Unknown command found in queue : " + command)
 
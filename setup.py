@@ -86,7 +86,7 @@ setup(
     .oarproperty=oar.cli.oarproperty:cli
     .oarwalltime=oar.cli.oarwalltime:cli
     oar2trace=oar.cli.oar2trace:cli
-    kao=oar.kao.kao:main
+    kao=oar.kao.kao:cli
     kamelot=oar.kao.kamelot:main
     kamelot-fifo=oar.kao.kamelot_fifo:main
     bataar=oar.kao.bataar:bataar
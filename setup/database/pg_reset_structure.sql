@@ -10,6 +10,9 @@ DROP TABLE job_state_logs;
 DROP TABLE frag_jobs;
 DROP TABLE assigned_resources;
 DROP TABLE resources;
+DROP TABLE resources_version;
+DROP FUNCTION resources_changed();
+DROP FUNCTION resources_version_bump();
 DROP TABLE resource_logs;
 DROP TABLE queues;
 DROP TABLE scheduler;
@@ -18,6 +21,7 @@ DROP TABLE gantt_jobs_predictions;
 DROP TABLE gantt_jobs_predictions_visu;
 DROP TABLE gantt_jobs_predictions_log;
 DROP TABLE gantt_jobs_resources;
+DROP TABLE gantt_jobs_resources_intervals;
 DROP TABLE gantt_jobs_resources_visu;
 DROP TABLE gantt_jobs_resources_log;
 DROP TABLE files;
@@ -4,7 +4,7 @@ CREATE TABLE schema (
   version VARCHAR( 255 ) NOT NULL,
   name VARCHAR( 255 ) NOT NULL
 );
-INSERT INTO schema VALUES ('2.6.0','');
+INSERT INTO schema VALUES ('2.6.1','');
 
 CREATE TABLE accounting (
   window_start integer NOT NULL ,
@@ -121,6 +121,14 @@ CREATE TABLE gantt_jobs_resources (
 );
 
 
+CREATE TABLE gantt_jobs_resources_intervals (
+  moldable_job_id integer NOT NULL default '0',
+  resource_id_first integer NOT NULL default '0',
+  resource_id_last integer NOT NULL default '0',
+  PRIMARY KEY  (moldable_job_id,resource_id_first)
+);
+
+
 CREATE TABLE gantt_jobs_resources_visu (
   moldable_job_id integer NOT NULL default '0',
   resource_id integer NOT NULL default '0',
@@ -313,6 +321,51 @@ CREATE INDEX resource_suspended_jobs ON resources (suspended_jobs);
 CREATE INDEX resource_type ON resources (type);
 CREATE INDEX resource_network_address ON resources (network_address);
 
+-- Version of the resources, bumped by the triggers below whenever resources are
+-- added, removed or changed, whatever the column and the way they are written.
+-- It is bumped once per transaction when it commits, changes not yet committed
+-- are counted in the oar.resources_changes setting, local to the transaction.
+CREATE TABLE resources_version (
+  version bigint NOT NULL default '0'
+);
+
+CREATE OR REPLACE FUNCTION resources_changed() RETURNS trigger AS $$
+DECLARE
+  txid text := txid_current()::text;
+  changes text := current_setting('oar.resources_changes', true);
+BEGIN
+  IF split_part(coalesce(changes, ''), ':', 1) = txid THEN
+    changes := txid || ':' || (split_part(changes, ':', 2)::bigint + 1)::text;
+  ELSE
+    changes := txid || ':1';
+  END IF;
+  PERFORM set_config('oar.resources_changes', changes, true);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION resources_version_bump() RETURNS trigger AS $$
+BEGIN
+  IF current_setting('oar.resources_version_txid', true)
+     IS DISTINCT FROM txid_current()::text THEN
+    PERFORM set_config('oar.resources_version_txid', txid_current()::text, true);
+    UPDATE resources_version SET version = version + 1;
+    IF NOT FOUND THEN
+      INSERT INTO resources_version (version) VALUES (1);
+    END IF;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER resources_changed AFTER INSERT OR UPDATE OR DELETE ON resources
+  FOR EACH STATEMENT EXECUTE PROCEDURE resources_changed();
+
+CREATE CONSTRAINT TRIGGER resources_version_bump
+  AFTER INSERT OR UPDATE OR DELETE ON resources
+  DEFERRABLE INITIALLY DEFERRED
+  FOR EACH ROW EXECUTE PROCEDURE resources_version_bump();
+
 CREATE TABLE walltime_change (
   job_id integer NOT NULL default '0',
   pending integer NOT NULL default '0',
@@ -0,0 +1,57 @@
+-- Resources of the jobs in gantt stored as intervals of resource ids
+-- (GANTT_RESOURCES_STORAGE="intervals")
+CREATE TABLE gantt_jobs_resources_intervals (
+  moldable_job_id integer NOT NULL default '0',
+  resource_id_first integer NOT NULL default '0',
+  resource_id_last integer NOT NULL default '0',
+  PRIMARY KEY  (moldable_job_id,resource_id_first)
+);
+
+-- Version of the resources, bumped by the triggers below whenever resources are
+-- added, removed or changed, whatever the column and the way they are written.
+-- It is bumped once per transaction when it commits, changes not yet committed
+-- are counted in the oar.resources_changes setting, local to the transaction.
+CREATE TABLE resources_version (
+  version bigint NOT NULL default '0'
+);
+
+CREATE OR REPLACE FUNCTION resources_changed() RETURNS trigger AS $$
+DECLARE
+  txid text := txid_current()::text;
+  changes text := current_setting('oar.resources_changes', true);
+BEGIN
+  IF split_part(coalesce(changes, ''), ':', 1) = txid THEN
+    changes := txid || ':' || (split_part(changes, ':', 2)::bigint + 1)::text;
+  ELSE
+    changes := txid || ':1';
+  END IF;
+  PERFORM set_config('oar.resources_changes', changes, true);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION resources_version_bump() RETURNS trigger AS $$
+BEGIN
+  IF current_setting('oar.resources_version_txid', true)
+     IS DISTINCT FROM txid_current()::text THEN
+    PERFORM set_config('oar.resources_version_txid', txid_current()::text, true);
+    UPDATE resources_version SET version = version + 1;
+    IF NOT FOUND THEN
+      INSERT INTO resources_version (version) VALUES (1);
+    END IF;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER resources_changed AFTER INSERT OR UPDATE OR DELETE ON resources
+  FOR EACH STATEMENT EXECUTE PROCEDURE resources_changed();
+
+CREATE CONSTRAINT TRIGGER resources_version_bump
+  AFTER INSERT OR UPDATE OR DELETE ON resources
+  DEFERRABLE INITIALLY DEFERRED
+  FOR EACH ROW EXECUTE PROCEDURE resources_version_bump();
+
+-- Update the database schema version
+DELETE FROM schema;
+INSERT INTO schema(version, name) VALUES ('2.6.1', '');
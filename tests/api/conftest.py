@@ -2,6 +2,8 @@
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.schema import CreateTable
 
 import oar.lib.tools  # for monkeypatching
 from oar.api.query import APIQuery
@@ -27,11 +29,31 @@ def assign_node_list(nodes):  # TODO TOREPLACE
     node_list = nodes
 
 
+class TestReadSession(object):
+    """Executes the statements of the read endpoints in the session of the test, which
+    holds the data of the test (not committed)."""
+
+    async def execute(self, statement):
+        return db.session.execute(statement)
+
+    async def scalar(self, statement):
+        return db.session.scalar(statement)
+
+    async def get(self, entity, ident):
+        return db.session.get(entity, ident)
+
+
+async def get_test_read_session():
+    yield TestReadSession()
+
+
 @pytest.fixture()
 def fastapi_app():
     from oar.api.app import create_app
+    from oar.api.dependencies import get_read_session
 
     app = create_app()
+    app.dependency_overrides[get_read_session] = get_test_read_session
 
     # force to use APIQuery needed when all tests are launched and previous ones have set BaseQuery
     db.sessionmaker.configure(query_cls=APIQuery)
@@ -47,6 +69,27 @@ def client(fastapi_app):
         yield app
 
 
+@pytest.fixture()
+def read_database(fastapi_app, monkeypatch, tmp_path):
+    """Database of the asynchronous sessions of the read endpoints, in a SQLite file
+    (data of the session of a test are not committed, they are not seen by other
+    connections)."""
+    import oar.api.dependencies
+    from oar.api.dependencies import create_read_engine, get_read_session
+
+    uri = "sqlite:///{}".format(tmp_path / "read.sqlite")
+    engine = create_engine(uri)
+    # without the indexes, defined twice in the reflected metadata
+    for table in db.metadata.sorted_tables:
+        engine.execute(CreateTable(table))
+    del fastapi_app.dependency_overrides[get_read_session]
+    monkeypatch.setattr(oar.api.dependencies, "read_engine", create_read_engine(uri))
+
+    yield engine
+
+    engine.dispose()
+
+
 @pytest.fixture(scope="function", autouse=False)
 def monkeypatch_tools(request, monkeypatch):
     monkeypatch.setattr(oar.lib.tools, "create_almighty_socket", lambda: None)
@@ -67,9 +110,10 @@ def monkeypatch_tools(request, monkeypatch):
 
 
 @pytest.fixture(scope="function", autouse=False)
-def monkeypatch_scoped_session(request, monkeypatch):
+def monkeypatch_scoped_session(request, monkeypatch, client):
     from sqlalchemy.util import ScopedRegistry
 
+    # replaces the registry of sessions by request installed at the start of the app
     monkeypatch.setattr(
         db.session,
         "registry",
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import os
 from tempfile import mkstemp
 
 from oar import VERSION
@@ -63,3 +64,32 @@ def test_app_frontend_authentication_wrong_passwd(client):
     )
     print(res.json())
     assert res.status_code == 400
+
+
+def test_app_frontend_whoami_authenticated(client):
+    res = client.get("/whoami", headers={"x-remote-ident": "bob"})
+    assert res.status_code == 200
+    assert res.json()["authenticated_user"] == "bob"
+    # the user is kept in the request, not in the environment of the process
+    assert "OARDO_USER" not in os.environ
+    res = client.get("/whoami")
+    assert res.json()["authenticated_user"] is None
+
+
+def test_app_session_by_request(client, monkeypatch):
+    registry = client.app.state.session_registry
+    createfunc = registry.createfunc
+    sessions = []
+
+    def create_session():
+        sessions.append(createfunc())
+        return sessions[-1]
+
+    monkeypatch.setattr(registry, "createfunc", create_session)
+    for _ in range(2):
+        res = client.get("/resources/busy")
+        assert res.status_code == 200
+
+    # one session by request, released at the end of the request
+    assert len(sessions) == 2
+    assert registry.registry == {}
@@ -136,6 +136,39 @@ def test_app_jobs_get_array(client):
     assert len(res.json()["items"]) == 2
 
 
+def test_app_jobs_read_engine(client, read_database):
+    read_database.execute(
+        Job.__table__.insert(),
+        [
+            {
+                "job_user": "bob",
+                "state": "Waiting",
+                "launching_directory": "/tmp",
+                "checkpoint_signal": 0,
+            },
+            {
+                "job_user": "alice",
+                "state": "Hold",
+                "launching_directory": "/tmp",
+                "checkpoint_signal": 0,
+            },
+        ],
+    )
+    res = client.get("/jobs", params={"user": "bob"})
+    assert res.status_code == 200
+    assert res.json()["total"] == 1
+    assert res.json()["items"][0]["user"] == "bob"
+
+    res = client.get("/jobs", params={"offset": 1, "limit": 1})
+    assert res.json()["total"] == 2
+    assert [job["user"] for job in res.json()["items"]] == ["alice"]
+
+    job_id = res.json()["items"][0]["id"]
+    res = client.get("/jobs/{}".format(job_id))
+    assert res.json()["state"] == "Hold"
+    assert client.get("/jobs/{}".format(job_id + 1)).status_code == 404
+
+
 @pytest.mark.skip(reason="debug pending")
 @pytest.mark.usefixtures("minimal_db_initialization")
 @pytest.mark.usefixtures("monkeypatch_tools")
@@ -188,6 +221,36 @@ def test_app_job_post(client):
     assert res.status_code == 200
 
 
+@pytest.mark.usefixtures("minimal_db_initialization")
+def test_app_job_post_batch(client):
+    data = [
+        {"resource": [], "command": 'sleep "1"'},
+        {"resource": [], "command": 'sleep "2"', "type": ["foo"]},
+    ]
+
+    res = client.post("/jobs/batch", json=data, headers={"x-remote-ident": "bob"})
+
+    print(res.json())
+    assert res.status_code == 200
+    job_ids = [j[0] for j in db.query(Job.id).order_by(Job.id).all()]
+    assert res.json()["ids"] == job_ids
+    assert len(job_ids) == 2
+
+
+@pytest.mark.usefixtures("minimal_db_initialization")
+def test_app_job_post_batch_error(client):
+    data = [
+        {"resource": [], "command": 'sleep "1"'},
+        {"resource": [], "command": 'sleep "2"', "queue": "noexist"},
+    ]
+
+    res = client.post("/jobs/batch", json=data, headers={"x-remote-ident": "bob"})
+
+    print(res.json())
+    assert res.status_code == 400
+    assert db.query(Job.id).all() == []
+
+
 @pytest.mark.usefixtures("minimal_db_initialization")
 @pytest.mark.usefixtures("monkeypatch_tools")
 def test_app_jobs_delete_1(client, monkeypatch):
@@ -137,3 +137,22 @@ def test_app_busy_resources(client, monkeypatch):
     print(res.json())
     assert res.status_code == 200
     assert res.json()["busy"] == 6
+
+
+def test_app_resources_read_engine(client, read_database):
+    read_database.execute(
+        Resource.__table__.insert(),
+        [{"network_address": "node{}".format(i), "state": "Alive"} for i in range(4)],
+    )
+    res = client.get("/resources", params={"network_address": "node2"})
+    assert res.status_code == 200
+    assert res.json()["total"] == 1
+    resource_id = res.json()["items"][0]["id"]
+
+    res = client.get("/resources/{}".format(resource_id))
+    assert res.json()["network_address"] == "node2"
+    assert client.get("/resources/{}".format(resource_id + 10)).status_code == 404
+
+    res = client.get("/resources/{}/jobs".format(resource_id))
+    assert res.json()["total"] == 0
+    assert client.get("/resources/busy").json()["busy"] == 0
@@ -29,7 +29,7 @@ class FakeProcessStdout(object):
 
 
 class FakePopen(object):
-    def __init__(self, cmd, stdout):
+    def __init__(self, cmd, stdout, env=None):
         pass
 
     def communicate(self):
@@ -340,6 +340,33 @@ def test_oarsub_multiple_types(monkeypatch):
     assert result.exit_code == 0
 
 
+def test_oarsub_batch(monkeypatch):
+    runner = CliRunner()
+    batch = (
+        '[{"command": "sleep 1"}, {"command": "sleep 2", "type": ["t1"], "hold": true}]'
+    )
+    result = runner.invoke(cli, ["--batch", "-", "-t", "t0"], input=batch)
+    print(result.output)
+    jobs = db["Job"].query.order_by(Job.id).all()
+    assert result.exit_code == 0
+    assert [j.command for j in jobs] == ["sleep 1", "sleep 2"]
+    assert [j.state for j in jobs] == ["Waiting", "Hold"]
+    assert get_job_types(jobs[0].id) == {"t0": True}
+    assert get_job_types(jobs[1].id) == {"t1": True}
+    assert re.findall(r"OAR_JOB_ID=\d+", result.output) == [
+        "OAR_JOB_ID=" + str(j.id) for j in jobs
+    ]
+
+
+def test_oarsub_batch_unknown_key(monkeypatch):
+    runner = CliRunner()
+    batch = '[{"command": "sleep 1"}, {"command": "sleep 2", "foo": 1}]'
+    result = runner.invoke(cli, ["--batch", "-"], input=batch)
+    print(result.output)
+    assert result.exit_code == 1
+    assert db["Job"].query.all() == []
+
+
 def test_oarsub_connect_job_function(monkeypatch):
     os.environ["OARDO_USER"] = "oar"
     os.environ["DISPLAY"] = ""
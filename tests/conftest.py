@@ -7,7 +7,12 @@ from codecs import open
 
 import pytest
 
+from oar.kao.platform import Platform
 from oar.lib import config, db
+from oar.lib.resource_handling import (
+    clear_resource_set_snapshot,
+    resources_constraints_cache,
+)
 
 from . import DEFAULT_CONFIG
 
@@ -61,3 +66,12 @@ def setup_config(request):
     yield
     db.close()
     shutil.rmtree(tempdir)
+
+
+@pytest.fixture(scope="function", autouse=True)
+def clear_resources_caches():
+    # Changes of resources are rolled back between tests, the change counter can be
+    # the same with other resources
+    resources_constraints_cache.clear()
+    clear_resource_set_snapshot()
+    Platform.clear_resource_set()
@@ -53,6 +53,9 @@ class FakeZmqSocket(object):
             else:
                 return msg.encode("utf8")
 
+    def poll(self, timeout=None):
+        return len(self.fakezmq.recv_msgs.get(self.socket_id, []))
+
     def recv_json(self):
         return self._pop_msg()
 
@@ -1,10 +1,18 @@
 # coding: utf-8
 import pytest
+import zmq
 
+import oar.kao.kao
 import oar.lib.tools  # for monkeypatching
-from oar.kao.kao import main
+from oar.kao.kao import KaoDaemon, KaoDaemonClient, main
+from oar.kao.platform import Platform
 from oar.lib import config, db
 from oar.lib.job_handling import insert_job
+from oar.lib.resource_handling import set_resource_state
+
+from ..fakezmq import FakeZmq
+
+fakezmq = FakeZmq()
 
 
 @pytest.fixture(scope="function", autouse=True)
@@ -76,3 +84,68 @@ def test_db_kao_moldable(monkeypatch):
     print(job.state)
 
     assert job.state == "toLaunch"
+
+
+def test_db_kao_daemon(monkeypatch):
+    monkeypatch.setattr(zmq, "Context", FakeZmq)
+    fakezmq.reset()
+    insert_job(res=[(60, [("resource_id=4", "")])], properties="")
+
+    daemon = KaoDaemon()
+    fakezmq.recv_msgs[0] = [{"cmd": "SCHEDULE"}, {"cmd": "UNKNOWN"}]
+    daemon.run(False)
+    daemon.run(False)
+
+    assert fakezmq.sent_msgs[0] == [{"exit_code": 0}, {"error": "unknown request"}]
+    assert db["Job"].query.one().state == "toLaunch"
+
+
+def test_db_kao_daemon_failed_round(monkeypatch):
+    monkeypatch.setattr(zmq, "Context", FakeZmq)
+    fakezmq.reset()
+
+    def meta_schedule_exit(mode, plt):
+        # as with a bad quotas file
+        exit(1)
+
+    monkeypatch.setattr(oar.kao.kao, "meta_schedule", meta_schedule_exit)
+    daemon = KaoDaemon()
+    fakezmq.recv_msgs[0] = [{"cmd": "SCHEDULE"}, {"cmd": "SCHEDULE"}]
+    daemon.run(False)
+    monkeypatch.setattr(oar.kao.kao, "meta_schedule", lambda mode, plt: 0)
+    daemon.run(False)
+
+    answer, next_answer = fakezmq.sent_msgs[0]
+    assert answer["exit_code"] == 1
+    assert "SystemExit" in answer["error"]
+    assert next_answer == {"exit_code": 0}
+
+
+def test_db_kao_daemon_client(monkeypatch):
+    monkeypatch.setattr(zmq, "Context", FakeZmq)
+    fakezmq.reset()
+
+    client = KaoDaemonClient()
+    fakezmq.recv_msgs[0] = [{"exit_code": 2}, {"exit_code": 1, "error": "failed"}]
+    assert client.schedule() == 2
+    assert client.schedule() == 1
+    assert fakezmq.sent_msgs[0] == [{"cmd": "SCHEDULE"}, {"cmd": "SCHEDULE"}]
+
+    # no answer, the request is sent again on a new socket
+    assert client.schedule() == 1
+    assert fakezmq.num_socket == 2
+
+
+def test_db_kao_platform_keep_resource_set():
+    plt = Platform(keep_resource_set=True)
+    resource_set = plt.resource_set()
+    assert plt.resource_set() is resource_set
+    assert Platform().resource_set() is not resource_set
+
+    resource_id = db["Resource"].query.first().id
+    set_resource_state(resource_id, "Absent", "NO")
+    db.commit()
+    new_resource_set = plt.resource_set()
+    assert new_resource_set is not resource_set
+    assert plt.resource_set() is new_resource_set
+    assert len(new_resource_set.roid_itvs) == 5
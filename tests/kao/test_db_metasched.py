@@ -3,18 +3,26 @@ from os import environ
 
 import pytest
 
+import oar.kao.meta_sched
+import oar.kao.platform
+import oar.lib.job_handling
 import oar.lib.tools  # for monkeypatching
-from oar.kao.meta_sched import meta_schedule
+from oar.kao.meta_sched import meta_schedule, update_gantt_visualization
 from oar.lib import (
     AssignedResource,
     FragJob,
+    GanttJobsPrediction,
+    GanttJobsPredictionsVisu,
+    GanttJobsResource,
+    GanttJobsResourcesInterval,
+    GanttJobsResourcesVisu,
     Job,
     MoldableJobDescription,
     Resource,
     config,
     db,
 )
-from oar.lib.job_handling import insert_job
+from oar.lib.job_handling import NOT_CONSIDERED_MESSAGE, insert_job
 from oar.lib.queue import get_all_queue_by_priority
 from oar.lib.tools import get_date
 
@@ -294,3 +302,194 @@ def test_db_metasched_ar_2(monkeypatch):
 
     # Restore the get date function
     monkeypatch.setattr(oar.lib.tools, "get_date", get_date)
+
+
+@pytest.fixture(scope="function")
+def incremental_gantt(request, monkeypatch):
+    monkeypatch.setitem(config, "SCHEDULER_INCREMENTAL_GANTT", "yes")
+    oar.kao.meta_sched.incremental_gantt.reset()
+    yield oar.kao.meta_sched.incremental_gantt
+    oar.kao.meta_sched.incremental_gantt.reset()
+
+
+def gantt_start_times():
+    return {p.moldable_id: p.start_time for p in db["GanttJobsPrediction"].query.all()}
+
+
+def test_db_metasched_incremental_gantt(monkeypatch, incremental_gantt):
+    saved_job_ids = []
+
+    def save_assigns(self, jobs, resource_set):
+        saved_job_ids.extend(jobs)
+        return oar.lib.job_handling.save_assigns(jobs, resource_set)
+
+    monkeypatch.setattr(oar.kao.platform.Platform, "save_assigns", save_assigns)
+
+    job_ids = [insert_job(res=[(60, [("resource_id=4", "")])]) for _ in range(3)]
+
+    monkeypatch.setattr(oar.lib.tools, "get_date", lambda: 1000)
+    meta_schedule()
+    start_times = gantt_start_times()
+    assert sorted(saved_job_ids) == job_ids
+    assert db["Job"].query.get(job_ids[0]).state == "toLaunch"
+
+    # Nothing changed, no assignment is saved again
+    del saved_job_ids[:]
+    monkeypatch.setattr(oar.lib.tools, "get_date", lambda: 1010)
+    meta_schedule()
+    assert saved_job_ids == []
+    assert gantt_start_times() == start_times
+
+    # The first job ends, the second one can be launched
+    db.query(Job).filter(Job.id == job_ids[0]).update(
+        {Job.state: "Terminated"}, synchronize_session=False
+    )
+    db.commit()
+    monkeypatch.setattr(oar.lib.tools, "get_date", lambda: 1020)
+    meta_schedule()
+    assert sorted(saved_job_ids) == job_ids[1:]
+    assert db["Job"].query.get(job_ids[1]).state == "toLaunch"
+    start_times = gantt_start_times()
+    assert len(start_times) == 2
+
+    # Same gantt as without the incremental gantt
+    incremental_gantt.reset()
+    monkeypatch.setitem(config, "SCHEDULER_INCREMENTAL_GANTT", "no")
+    meta_schedule()
+    assert gantt_start_times() == start_times
+
+
+def test_update_gantt_visualization():
+    db.session.execute(
+        GanttJobsPredictionsVisu.__table__.insert(),
+        [{"moldable_job_id": 1, "start_time": 10}],
+    )
+    db.session.execute(
+        GanttJobsResourcesVisu.__table__.insert(),
+        [{"moldable_job_id": 1, "resource_id": 1}],
+    )
+    db.session.execute(
+        GanttJobsPrediction.__table__.insert(),
+        [{"moldable_job_id": 2, "start_time": 20}],
+    )
+    db.session.execute(
+        GanttJobsResource.__table__.insert(),
+        [{"moldable_job_id": 2, "resource_id": r} for r in (2, 3)],
+    )
+    db.commit()
+
+    update_gantt_visualization()
+
+    assert db.query(
+        GanttJobsPredictionsVisu.moldable_id, GanttJobsPredictionsVisu.start_time
+    ).all() == [(2, 20)]
+    assert sorted(
+        db.query(
+            GanttJobsResourcesVisu.moldable_id, GanttJobsResourcesVisu.resource_id
+        ).all()
+    ) == [(2, 2), (2, 3)]
+
+
+def test_db_metasched_gantt_resources_intervals(monkeypatch):
+    monkeypatch.setitem(config, "GANTT_RESOURCES_STORAGE", "intervals")
+    monkeypatch.setattr(oar.lib.tools, "get_date", lambda: 1000)
+    job_ids = [insert_job(res=[(60, [("resource_id=3", "")])]) for _ in range(3)]
+
+    meta_schedule()
+
+    assert db.query(GanttJobsResource).count() == 0
+    intervals = db.query(
+        GanttJobsResourcesInterval.resource_id_first,
+        GanttJobsResourcesInterval.resource_id_last,
+    ).all()
+    assert len(intervals) == 3
+    assert all(last - first == 2 for first, last in intervals)
+    assert db.query(GanttJobsResourcesVisu).count() == 9
+
+    assert db["Job"].query.get(job_ids[0]).state == "toLaunch"
+    job = db["Job"].query.get(job_ids[0])
+    assert (
+        db.query(AssignedResource)
+        .filter(AssignedResource.moldable_id == job.assigned_moldable_job)
+        .count()
+        == 3
+    )
+
+    # the next round reads the gantt from the intervals
+    monkeypatch.setattr(oar.lib.tools, "get_date", lambda: 1010)
+    meta_schedule()
+    assert db["Job"].query.get(job_ids[1]).state == "Waiting"
+    assert len(gantt_start_times()) == 3
+
+
+def test_db_metasched_timings_file(monkeypatch, tmp_path):
+    timings_file = str(tmp_path / "oar_scheduler.prom")
+    monkeypatch.setitem(config, "SCHEDULER_TIMINGS_FILE", timings_file)
+    for _ in range(2):
+        insert_job(res=[(60, [("resource_id=4", "")])], properties="")
+
+    meta_schedule()
+
+    with open(timings_file) as metrics_file:
+        lines = metrics_file.read().splitlines()
+    samples = dict(line.rsplit(" ", 1) for line in lines if not line.startswith("#"))
+    for phase in ["gantt_init", "jobs_to_launch_load", "launch", "visu_update"]:
+        assert 'oar_scheduler_phase_seconds{phase="%s"}' % phase in samples
+    for phase in ["waiting_jobs_load", "sorting", "schedule", "save_assigns"]:
+        assert (
+            'oar_scheduler_phase_seconds{phase="%s",queues="default"}' % phase
+            in samples
+        )
+    assert samples['oar_scheduler_jobs{kind="waiting",queues="default"}'] == "2"
+    assert samples['oar_scheduler_jobs{kind="scheduled",queues="default"}'] == "2"
+    assert samples['oar_scheduler_jobs{kind="to_launch"}'] == "1"
+    assert float(samples["oar_scheduler_round_seconds"]) > 0
+    assert samples["oar_scheduler_round_failed"] == "0"
+
+
+def test_db_metasched_timings_file_failed_round(monkeypatch, tmp_path):
+    timings_file = str(tmp_path / "oar_scheduler.prom")
+    monkeypatch.setitem(config, "SCHEDULER_TIMINGS_FILE", timings_file)
+    insert_job(res=[(60, [("resource_id=4", "")])], properties="")
+
+    def update_gantt_visualization_error():
+        raise RuntimeError("visualization update error")
+
+    monkeypatch.setattr(
+        oar.kao.meta_sched,
+        "update_gantt_visualization",
+        update_gantt_visualization_error,
+    )
+    with pytest.raises(RuntimeError):
+        meta_schedule()
+
+    with open(timings_file) as metrics_file:
+        lines = metrics_file.read().splitlines()
+    samples = dict(line.rsplit(" ", 1) for line in lines if not line.startswith("#"))
+    assert samples["oar_scheduler_round_failed"] == "1"
+    assert 'oar_scheduler_phase_seconds{phase="gantt_init"}' in samples
+    assert 'oar_scheduler_phase_seconds{phase="visu_update"}' in samples
+
+
+def test_db_metasched_time_budget(monkeypatch):
+    monkeypatch.setitem(config, "SCHEDULER_ROUND_TIME_BUDGET", 1e-9)
+    job_id = insert_job(res=[(60, [("resource_id=4", "")])], properties="")
+
+    meta_schedule()
+
+    job = db["Job"].query.get(job_id)
+    assert job.state == "Waiting"
+    assert job.message == NOT_CONSIDERED_MESSAGE
+    assert db.query(GanttJobsPrediction).count() == 0
+
+
+def test_db_metasched_backfilling_horizon(monkeypatch):
+    monkeypatch.setitem(config, "SCHEDULER_BACKFILLING_HORIZON", 30)
+    for _ in range(3):
+        insert_job(res=[(60, [("resource_id=4", "")])], properties="")
+
+    meta_schedule()
+
+    # the next jobs would start after the horizon
+    assert db.query(GanttJobsPrediction).count() == 1
+    assert db["Job"].query.filter(db["Job"].state == "toLaunch").count() == 1
@@ -0,0 +1,126 @@
+# coding: utf-8
+from procset import ProcSet
+
+from oar.kao.gantt import IncrementalGantt
+from oar.kao.meta_sched import gantt_default_slot_set
+from oar.kao.quotas import Quotas
+from oar.kao.slot import MAX_TIME
+from oar.lib import config
+from oar.lib.job_handling import JobPseudo
+
+config["LOG_FILE"] = ":stderr:"
+
+
+class FakeResourceSet(object):
+    def __init__(self, roid_itvs, available_upto):
+        self.roid_itvs = roid_itvs
+        self.available_upto = available_upto
+
+
+def job(moldable_id, start_time, walltime, res_set):
+    return JobPseudo(
+        id=moldable_id,
+        moldable_id=moldable_id,
+        start_time=start_time,
+        walltime=walltime,
+        res_set=res_set,
+        ts=False,
+        ph=0,
+    )
+
+
+def itvs_at(slot_set, t):
+    sid = 1
+    while sid:
+        slot = slot_set.slots[sid]
+        if slot.b <= t <= slot.e:
+            return slot.itvs
+        sid = slot.next
+    return None
+
+
+def assert_same_gantt(ss1, ss2):
+    assert ss1.begin == ss2.begin
+    times = set()
+    for ss in [ss1, ss2]:
+        for slot in ss.slots.values():
+            times.update([slot.b, slot.e])
+    for t in sorted(times):
+        assert itvs_at(ss1, t) == itvs_at(ss2, t), t
+
+
+def slot_set_at(gantt, now, resource_set, jobs):
+    builds = []
+    jobs = sorted(jobs, key=lambda j: j.start_time)
+
+    def build():
+        builds.append(now)
+        return gantt_default_slot_set(resource_set, now, jobs)
+
+    slot_set = gantt.slot_set_at(now, resource_set, jobs, build)
+    assert_same_gantt(slot_set, gantt_default_slot_set(resource_set, now, jobs))
+    return slot_set, builds
+
+
+def test_incremental_gantt_update():
+    resource_set = FakeResourceSet(
+        ProcSet((1, 32)), {MAX_TIME - 1: ProcSet((1, 30)), 500: ProcSet((31, 32))}
+    )
+    gantt = IncrementalGantt()
+
+    jobs = [
+        job(1, 0, 100, ProcSet((1, 8))),
+        job(2, 50, 100, ProcSet((9, 16))),
+        job(3, 200, 50, ProcSet((1, 30))),
+    ]
+    slot_set, builds = slot_set_at(gantt, 10, resource_set, jobs)
+    assert builds == [10]
+
+    # job 1 ends earlier than expected and job 4 started
+    jobs = [
+        job(2, 50, 100, ProcSet((9, 16))),
+        job(3, 200, 50, ProcSet((1, 30))),
+        job(4, 55, 30, ProcSet((1, 4))),
+    ]
+    slot_set, builds = slot_set_at(gantt, 60, resource_set, jobs)
+    assert builds == []
+
+    # the copy given to scheduling can be modified
+    slot_set.split_slots_jobs([job(5, 60, 1000, ProcSet((1, 32)))])
+    slot_set, builds = slot_set_at(gantt, 70, resource_set, jobs)
+    assert builds == []
+
+    # the advance reservation 3 is moved
+    jobs[1] = job(3, 300, 50, ProcSet((1, 30)))
+    slot_set, builds = slot_set_at(gantt, 80, resource_set, jobs)
+    assert builds == []
+
+
+def test_incremental_gantt_rebuild():
+    resource_set = FakeResourceSet(ProcSet((1, 32)), {100: ProcSet((1, 2))})
+    gantt = IncrementalGantt()
+
+    jobs = [job(1, 0, 200, ProcSet((1, 8))), job(2, 0, 50, ProcSet((9, 16)))]
+    slot_set, builds = slot_set_at(gantt, 10, resource_set, jobs)
+    assert builds == [10]
+
+    # resources of job 1 are also unavailable from 100
+    slot_set, builds = slot_set_at(gantt, 20, resource_set, jobs[1:])
+    assert builds == [20]
+
+    # a resource is not alive anymore
+    resource_set = FakeResourceSet(ProcSet((1, 31)), {100: ProcSet((1, 2))})
+    slot_set, builds = slot_set_at(gantt, 30, resource_set, jobs[1:])
+    assert builds == [30]
+
+    # time goes back
+    slot_set, builds = slot_set_at(gantt, 25, resource_set, jobs[1:])
+    assert builds == [25]
+
+    slot_set, builds = slot_set_at(gantt, 40, resource_set, [])
+    assert builds == []
+
+    # counters keys of quotas were reset
+    Quotas.reset_counters_keys()
+    slot_set, builds = slot_set_at(gantt, 50, resource_set, [])
+    assert builds == [50]
@@ -1,11 +1,12 @@
 # coding: utf-8
+import random
 from codecs import open
 from tempfile import mkstemp
 
 import pytest
 from procset import ProcSet
 
-from oar.kao.quotas import Quotas
+from oar.kao.quotas import Quotas, QuotasRulesIndex
 from oar.kao.scheduling import schedule_id_jobs_ct, set_slots_with_prev_scheduled_jobs
 from oar.kao.slot import Slot, SlotSet
 from oar.lib import config, get_logger
@@ -340,3 +341,214 @@ def test_quotas_two_jobs_job_type_proc():
 
     assert j1.start_time == 0
     assert j2.start_time == 50
+
+
+def test_quotas_rules_file_reload():
+    _, quotas_file_name = mkstemp()
+    config["QUOTAS_CONF_FILE"] = quotas_file_name
+
+    with open(config["QUOTAS_CONF_FILE"], "w", encoding="utf-8") as quotas_fd:
+        quotas_fd.write('{"quotas": {"*,*,yop,*": [-1,1,-1]}, "job_types": ["yop"]}')
+
+    Quotas.enable()
+    rules = Quotas.default_rules
+    Quotas.enable()
+    # unchanged file, rules are kept and job types are not added again
+    assert Quotas.default_rules is rules
+    assert Quotas.job_types == ["*", "yop"]
+
+    with open(config["QUOTAS_CONF_FILE"], "w", encoding="utf-8") as quotas_fd:
+        quotas_fd.write('{"quotas": {"*,*,*,*": [16,-1,-1]}, "job_types": ["yip"]}')
+
+    Quotas.enable()
+    assert Quotas.default_rules is not rules
+    assert Quotas.job_types == ["*", "yip"]
+    Quotas.job_types = ["*"]
+
+
+def test_quotas_reset_counters_keys():
+    _, quotas_file_name = mkstemp()
+    config["QUOTAS_CONF_FILE"] = quotas_file_name
+    with open(config["QUOTAS_CONF_FILE"], "w", encoding="utf-8") as quotas_fd:
+        quotas_fd.write('{"quotas": {"*,*,*,/": [16,-1,-1]}}')
+
+    Quotas.enable()
+    job = JobPseudo(queue_name="default", project="", user="toto", types={})
+    quotas = Quotas()
+    quotas.update(job, 4, 60)
+    assert quotas.check(job)[0]
+    generation = Quotas.counters_keys_generation
+    assert Quotas.counters_keys and Quotas.jobs_counters_ids and Quotas.rules_indexes
+
+    # next round, keys of the jobs of the previous one are forgotten
+    Quotas.enable()
+    assert Quotas.counters_keys_generation == generation + 1
+    assert not (Quotas.counters_keys or Quotas.counters_ids)
+    assert not (Quotas.jobs_counters_ids or Quotas.rules_indexes)
+
+
+def test_quotas_check_slots_quotas_absent_counters(monkeypatch):
+    Quotas.enabled = True
+    Quotas.default_rules = {("*", "*", "*", "/"): [16, -1, -1]}
+    ResourceSet.default_itvs = ProcSet((1, 32))
+
+    # counters keys of users without job in the slots
+    for user in ["lulu", "john"]:
+        Quotas.job_counters_ids(
+            JobPseudo(queue_name="default", project="", user=user, types={})
+        )
+    ss = SlotSet(Slot(1, 0, 0, ProcSet((1, 32)), 0, 100))
+    job = JobPseudo(queue_name="default", project="", user="toto", types={})
+
+    checked = []
+
+    def check(rules_index, job, counters):
+        for key, counters_id in Quotas.counters_ids.items():
+            checked.append((key, counters(counters_id)))
+        return (True, "quotas ok", "", 0)
+
+    monkeypatch.setattr(QuotasRulesIndex, "check", check)
+    Quotas.check_slots_quotas(ss.slots, 1, 1, job, 8, 60)
+
+    checked = dict(checked)
+    assert checked[("*", "*", "*", "toto")] == (8, 1, 480)
+    assert checked[("*", "*", "*", "lulu")] is None
+    assert checked[("*", "*", "*", "john")] is None
+
+
+def test_quotas_copy_on_write():
+    Quotas.enabled = True
+    ss = SlotSet(Slot(1, 0, 0, ProcSet((1, 32)), 0, 100))
+    j1 = JobPseudo(
+        id=1,
+        start_time=10,
+        walltime=20,
+        res_set=ProcSet((1, 8)),
+        types={},
+        queue_name="default",
+        user="toto",
+        project="",
+        ts=False,
+        ph=0,
+    )
+    ss.split_slots_jobs([j1])
+
+    a_slot, b_slot, c_slot = [ss.slots[sid] for sid in [1, 2, 3]]
+    assert (a_slot.b, b_slot.b, c_slot.b) == (0, 10, 30)
+    # slots before and after the job share their (empty) counters
+    assert a_slot.quotas.counters is c_slot.quotas.counters
+    assert not a_slot.quotas.counters
+    assert b_slot.quotas.counter(("*", "*", "*", "*")) == [8, 1, 160]
+
+    c_slot.quotas.update(j1)
+    assert c_slot.quotas.counter(("*", "*", "*", "*")) == [8, 1, 160]
+    assert not a_slot.quotas.counters
+
+
+def reference_check(rules, counters, job):
+    """Quotas check matching each rule against each counter."""
+    for rl_fields, rl_quotas in rules.items():
+        rl_queue, rl_project, rl_job_type, rl_user = rl_fields
+        for (queue, project, job_type, user), c in counters.items():
+            if (
+                (
+                    ((rl_queue == "*") and (queue == "*"))
+                    or ((rl_queue == queue) and (job.queue_name == queue))
+                    or (rl_queue == "/")
+                )
+                and (
+                    ((rl_project == "*") and (project == "*"))
+                    or ((rl_project == project) and (job.project == project))
+                    or (rl_project == "/")
+                )
+                and (
+                    ((rl_job_type == "*") and (job_type == "*"))
+                    or ((rl_job_type == job_type) and (job_type in job.types))
+                )
+                and (
+                    ((rl_user == "*") and (user == "*"))
+                    or ((rl_user == user) and (job.user == user))
+                    or (rl_user == "/")
+                )
+            ):
+                for rl_value, value in zip(rl_quotas, c):
+                    if (rl_value > -1) and (rl_value < value):
+                        return False
+    return True
+
+
+def test_quotas_check_slots_quotas_rules_index():
+    random.seed(0)
+    Quotas.enabled = True
+    Quotas.job_types = ["*", "besteffort"]
+    ResourceSet.default_itvs = ProcSet((1, 32))
+
+    queues = ["default", "besteffort"]
+    projects = ["", "projA", "projB"]
+    users = ["toto", "lulu", "john"]
+
+    def random_job(id, start_time=None):
+        return JobPseudo(
+            id=id,
+            start_time=start_time,
+            walltime=random.randint(10, 100),
+            queue_name=random.choice(queues),
+            project=random.choice(projects),
+            user=random.choice(users),
+            types=random.choice([{}, {"besteffort": ""}]),
+            res_set=ProcSet((1, random.randint(1, 16))),
+            ts=False,
+            ph=0,
+        )
+
+    for _ in range(20):
+        Quotas.default_rules = {
+            (
+                random.choice(["*", "/"] + queues),
+                random.choice(["*", "/"] + projects),
+                random.choice(["*", "besteffort"]),
+                random.choice(["*", "/"] + users),
+            ): [random.choice([-1, 8, 16, 24]), random.choice([-1, 1, 2]), -1]
+            for _ in range(5)
+        }
+        ss = SlotSet(Slot(1, 0, 0, ProcSet((1, 32)), 0, 1000))
+        jobs = sorted(
+            [random_job(i, random.randint(0, 200)) for i in range(10)],
+            key=lambda j: j.start_time,
+        )
+        ss.split_slots_jobs(jobs)
+
+        for _ in range(20):
+            job = random_job(10)
+            del job.res_set
+            nb_res = random.randint(1, 16)
+            sid_left, sid_right = ss.encompassing_slots(
+                *sorted(random.sample(range(300), 2))
+            )
+            res = Quotas.check_slots_quotas(
+                ss.slots, sid_left, sid_right, job, nb_res, 50
+            )
+
+            # counters combined over slots and updated with the job
+            counters = {}
+            sid = sid_left
+            while True:
+                slot = ss.slots[sid]
+                for key in Quotas.counters_ids:
+                    c = slot.quotas.counter(key)
+                    acc = counters.setdefault(key, [0, 0, 0])
+                    counters[key] = [
+                        max(acc[0], c[0]),
+                        max(acc[1], c[1]),
+                        acc[2] + c[2],
+                    ]
+                if sid == sid_right:
+                    break
+                sid = slot.next
+            job_quotas = Quotas()
+            job_quotas.update(job, nb_res, 50)
+            for key in Quotas.counters_ids:
+                c = job_quotas.counter(key)
+                counters[key] = [a + b for a, b in zip(counters[key], c)]
+
+            assert res[0] == reference_check(Quotas.default_rules, counters, job)
@@ -1,14 +1,20 @@
 # coding: utf-8
+import os
+import signal
+import time
+
 from procset import ProcSet
 
+import oar.kao.scheduling
 from oar.kao.scheduling import (
     assign_resources_mld_job_split_slots,
     schedule_id_jobs_ct,
     set_slots_with_prev_scheduled_jobs,
+    time_budget_deadline,
 )
 from oar.kao.slot import Slot, SlotSet
 from oar.lib import config
-from oar.lib.job_handling import JobPseudo
+from oar.lib.job_handling import JobPseudo, RequestSignature
 
 # import pdb
 
@@ -158,6 +164,54 @@ def test_schedule_id_jobs_ct_1():
     assert compare_slots_val_ref(ss.slots, v) is True
 
 
+def test_schedule_id_jobs_ct_deadline(monkeypatch):
+    res = ProcSet(*[(1, 32)])
+    ss = SlotSet(Slot(1, 0, 0, res, 0, 1000))
+    all_ss = {"default": ss}
+    hy = {"node": [ProcSet(*x) for x in [[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]]}
+
+    jobs = {}
+    for jid in range(1, 5):
+        jobs[jid] = JobPseudo(id=jid, types={}, deps=[], key_cache={}, ts=False, ph=0)
+        jobs[jid].simple_req(("node", 4), 60, res)
+
+    # the deadline is reached after the scheduling of 2 jobs
+    clock = iter(range(10))
+    monkeypatch.setattr(oar.kao.scheduling.time, "monotonic", lambda: next(clock))
+    not_considered = schedule_id_jobs_ct(all_ss, jobs, hy, [1, 2, 3, 4], 20, 1.5)
+
+    assert not_considered == [3, 4]
+    assert [jobs[jid].start_time for jid in [1, 2, 3, 4]] == [0, 60, -1, -1]
+    assert jobs[3].not_considered and jobs[4].not_considered
+    assert not hasattr(jobs[2], "not_considered")
+
+
+def test_schedule_id_jobs_ct_backfilling_horizon():
+    res = ProcSet(*[(1, 32)])
+    hy = {"node": [ProcSet(*x) for x in [[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]]}
+
+    for depth, start_times in [(0, [0, 60, -1, -1]), (3, [0, 60, 120, -1])]:
+        all_ss = {"default": SlotSet(Slot(1, 0, 0, res, 0, 1000))}
+        jobs = {}
+        for jid in range(1, 5):
+            jobs[jid] = JobPseudo(
+                id=jid, types={}, deps=[], key_cache={}, ts=False, ph=0
+            )
+            jobs[jid].simple_req(("node", 4), 60, res)
+
+        schedule_id_jobs_ct(all_ss, jobs, hy, [1, 2, 3, 4], 20, None, 100, depth)
+
+        assert [jobs[jid].start_time for jid in [1, 2, 3, 4]] == start_times
+
+
+def test_time_budget_deadline():
+    assert time_budget_deadline(0) is None
+    assert time_budget_deadline("0", 10.0) == 10.0
+    now = time.monotonic()
+    assert now + 5 <= time_budget_deadline(5) <= time.monotonic() + 5
+    assert time_budget_deadline(3600, now) == now
+
+
 def test_schedule_error_1():
     # Be careful you need a deepcopy for resources constraint when declare
     res = ProcSet(*[(1, 32)])
@@ -790,3 +844,182 @@ def test_schedule_timesharing1():
     print("j1.start_time:", j1.start_time, " j2.start_time:", j2.start_time)
 
     assert j1.start_time == j2.start_time
+
+
+def test_assign_resources_mld_job_split_slots_workers(monkeypatch):
+    res = ProcSet(*[(1, 32)])
+    hy = {"node": [ProcSet(*x) for x in [[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]]}
+    mld_res_rqts = [
+        (1, 100, [([("node", 4)], res)]),
+        (2, 40, [([("node", 3)], res)]),
+        (3, 60, [([("node", 1)], res)]),
+        (4, 30, [([("node", 3)], res)]),
+    ]
+
+    results = []
+    for nb_workers in ["0", "3"]:
+        monkeypatch.setitem(config, "KAMELOT_MOLDABLE_WORKERS", nb_workers)
+        monkeypatch.setattr(os, "cpu_count", lambda: 4)
+        ss = SlotSet(Slot(1, 0, 0, res, 0, 1000))
+        j0 = JobPseudo(
+            id=0, start_time=0, walltime=50, res_set=ProcSet((1, 16)), ts=False, ph=0
+        )
+        ss.split_slots_jobs([j0])
+        j1 = JobPseudo(
+            id=1,
+            key_cache={mld_id: str(mld_id) for mld_id, _, _ in mld_res_rqts},
+            mld_res_rqts=mld_res_rqts,
+            ts=False,
+            ph=0,
+        )
+        assign_resources_mld_job_split_slots(ss, j1, hy, -1)
+        results.append(
+            (j1.moldable_id, j1.start_time, j1.res_set, ss.cache, list(ss.slots))
+        )
+
+    assert results[0] == results[1]
+    # alternatives 2 and 4 finish at 90 and 80, 3 at 60: the first to finish
+    assert results[0][:3] == (3, 0, ProcSet((17, 24)))
+
+
+def test_assign_resources_mld_job_split_slots_workers_one_cpu(monkeypatch):
+    res = ProcSet(*[(1, 32)])
+    hy = {"node": [ProcSet(*x) for x in [[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]]}
+    monkeypatch.setitem(config, "KAMELOT_MOLDABLE_WORKERS", "4")
+    monkeypatch.setattr(os, "cpu_count", lambda: 1)
+
+    def find_mld_alternatives(*args):
+        raise AssertionError("no process is forked with one processor")
+
+    monkeypatch.setattr(
+        oar.kao.scheduling, "find_mld_alternatives", find_mld_alternatives
+    )
+    ss = SlotSet(Slot(1, 0, 0, res, 0, 1000))
+    j1 = JobPseudo(
+        id=1,
+        key_cache={},
+        mld_res_rqts=[
+            (1, 100, [([("node", 4)], res)]),
+            (2, 40, [([("node", 3)], res)]),
+        ],
+        ts=False,
+        ph=0,
+    )
+    assign_resources_mld_job_split_slots(ss, j1, hy, -1)
+    assert j1.moldable_id == 2
+
+
+def test_find_mld_alternatives_sigterm_handler():
+    # the workers are terminated even if the parent process handles SIGTERM, the pool
+    # may terminate workers waiting for tasks (it hanged from time to time)
+    res = ProcSet(*[(1, 32)])
+    hy = {"node": [ProcSet(*x) for x in [[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]]}
+    previous_handler = signal.signal(signal.SIGTERM, lambda sig, stack: None)
+    try:
+        for _ in range(10):
+            ss = SlotSet(Slot(1, 0, 0, res, 0, 1000))
+            j1 = JobPseudo(
+                id=1,
+                key_cache={},
+                mld_res_rqts=[
+                    (1, 100, [([("node", 4)], res)]),
+                    (2, 40, [([("node", 3)], res)]),
+                ],
+                ts=False,
+                ph=0,
+            )
+            results = oar.kao.scheduling.find_mld_alternatives(ss, j1, hy, -1, 2)
+            assert [r[0] for r in results] == [res, ProcSet((1, 24))]
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+
+
+def test_find_first_suitable_contiguous_slots_cache():
+    res = ProcSet(*[(1, 32)])
+    ss = SlotSet(Slot(1, 0, 0, res, 0, 1000))
+    ss.split_slots_jobs(
+        [JobPseudo(id=0, start_time=0, walltime=100, res_set=ProcSet((1, 24)))]
+    )
+    hy = {"node": [ProcSet(*x) for x in [[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]]}
+    key_cache = {1: RequestSignature(60, [([("node", 2)], res)])}
+
+    def job(id, deps=[]):
+        return JobPseudo(
+            id=id,
+            types={},
+            deps=deps,
+            key_cache=key_cache,
+            mld_res_rqts=[(1, 60, [([("node", 2)], ProcSet(*res))])],
+            ts=False,
+            ph=0,
+        )
+
+    jobs = {1: job(1), 2: job(2, [(1, "Waiting", 0)]), 3: job(3), 4: job(4)}
+
+    schedule_id_jobs_ct({"default": ss}, jobs, hy, [1], 20)
+    assert jobs[1].start_time == 100
+    assert ss.slots[ss.cache[key_cache[1]]].b == 100
+
+    # dependency: the search begins after the cached slot, which is not updated
+    schedule_id_jobs_ct({"default": ss}, jobs, hy, [2], 20)
+    assert jobs[2].start_time == 160
+    assert ss.slots[ss.cache[key_cache[1]]].b == 100
+
+    schedule_id_jobs_ct({"default": ss}, jobs, hy, [3, 4], 20)
+    assert (jobs[3].start_time, jobs[4].start_time) == (100, 160)
+    assert ss.slots[ss.cache[key_cache[1]]].b == 160
+
+    # dependency on a job ending at the cached slot: the search begins at it
+    jobs[5] = job(5, [(3, "Waiting", 0)])
+    schedule_id_jobs_ct({"default": ss}, jobs, hy, [5], 20)
+    assert jobs[5].start_time == 220
+    assert ss.slots[ss.cache[key_cache[1]]].b == 220
+
+
+def test_find_first_suitable_contiguous_slots_cache_added_resources():
+    res = ProcSet(*[(1, 32)])
+    ss = SlotSet(Slot(1, 0, 0, res, 0, 1000))
+    # nodes 3-4 are busy before 100 and nodes 1-2 from 100
+    j_b = JobPseudo(id=-2, start_time=100, walltime=200, res_set=ProcSet((1, 16)))
+    ss.split_slots_jobs(
+        [JobPseudo(id=-1, start_time=0, walltime=100, res_set=ProcSet((17, 32))), j_b]
+    )
+    hy = {"node": [ProcSet(*x) for x in [[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]]}
+    key_cache = {1: RequestSignature(150, [([("node", 2)], res)])}
+
+    def job(id):
+        return JobPseudo(
+            id=id,
+            types={},
+            deps=[],
+            key_cache=key_cache,
+            mld_res_rqts=[(1, 150, [([("node", 2)], ProcSet(*res))])],
+            ts=False,
+            ph=0,
+        )
+
+    jobs = {1: job(1), 2: job(2)}
+    schedule_id_jobs_ct({"default": ss}, jobs, hy, [1], 20)
+    assert jobs[1].start_time == 100
+    assert ss.slots[ss.cache[key_cache[1]]].b == 100
+
+    # nodes 1-2 are released from 100, the same nodes are free from 0
+    ss.split_slots_jobs([j_b], False)
+    schedule_id_jobs_ct({"default": ss}, jobs, hy, [2], 20)
+    assert jobs[2].start_time == 0
+    assert jobs[2].res_set == ProcSet((1, 16))
+
+
+def test_request_signature():
+    res = ProcSet(*[(1, 32)])
+    s1 = RequestSignature(60, [([("node", 2)], res), ([("gpu", 1)], ProcSet(3, 5))])
+    s2 = RequestSignature(60, [([("node", 2)], res), ([("gpu", 1)], ProcSet(3, 5))])
+    assert (s1 == s2) and (hash(s1) == hash(s2))
+    assert s1 != RequestSignature(60, [([("node", 2)], res)])
+    assert s1 != RequestSignature(
+        60, [([("node", 2)], res), ([("gpu", 1)], ProcSet(3, 6))]
+    )
+    assert s1 != RequestSignature(
+        61, [([("node", 2)], res), ([("gpu", 1)], ProcSet(3, 5))]
+    )
+    assert len({s1: 1, s2: 2}) == 1
@@ -1,8 +1,17 @@
 # coding: utf-8
 from procset import ProcSet
 
-from oar.kao.slot import MAX_TIME, Slot, SlotSet, intersec_itvs_slots
-from oar.lib.job_handling import JobPseudo
+from oar.kao.slot import (
+    MAX_TIME,
+    ArraySlotSet,
+    ItvsSlidingWindow,
+    Slot,
+    SlotSet,
+    intersec_itvs_slots,
+    new_slot_set,
+)
+from oar.lib import config
+from oar.lib.job_handling import JobPseudo, RequestSignature
 
 
 def compare_slots_val_ref(slots, v):
@@ -33,6 +42,24 @@ def test_intersec_itvs_slots():
     assert itvs == ProcSet(*[(1, 8), (12, 16), (24, 26)])
 
 
+def test_itvs_sliding_window():
+    ss = SlotSet(Slot(1, 0, 0, ProcSet((1, 32)), 1, 100))
+    ss.split_slots_jobs(split_jobs_pseudo())
+    sids = []
+    sid = 1
+    while sid:
+        sids.append(sid)
+        sid = ss.slots[sid].next
+
+    window = ItvsSlidingWindow(ss.slots)
+    # slide forward, with windows of varying lengths, then jump backward
+    for i, j in [(0, 0), (0, 2), (1, 3), (1, 3), (2, 6), (5, 6), (6, 7), (1, 4)]:
+        sid_left, sid_right = sids[i], sids[j]
+        assert window.intersec_itvs(sid_left, sid_right) == intersec_itvs_slots(
+            ss.slots, sid_left, sid_right
+        )
+
+
 def test_split_slots_ab():
     v = [(1, 4, ProcSet(*[(1, 32)])), (5, 20, ProcSet(*[(1, 9), (21, 32)]))]
 
@@ -195,3 +222,226 @@ def test_add_split_slots_jobs_2_jobs_2():
     ss.split_slots_jobs([j2, j1], False)
 
     assert compare_slots_val_ref(ss.slots, v)
+
+
+def slots_2_val(slots):
+    sid = 1
+    v = []
+    while sid:
+        slot = slots[sid]
+        v.append((slot.b, slot.e, slot.itvs))
+        sid = slot.next
+    return v
+
+
+def split_jobs_pseudo():
+    return [
+        JobPseudo(
+            id=1, start_time=5, walltime=10, res_set=ProcSet((10, 20)), ts=False, ph=0
+        ),
+        JobPseudo(
+            id=2, start_time=12, walltime=40, res_set=ProcSet((1, 4)), ts=False, ph=0
+        ),
+        JobPseudo(
+            id=3, start_time=30, walltime=5, res_set=ProcSet((25, 32)), ts=False, ph=0
+        ),
+        JobPseudo(
+            id=4, start_time=60, walltime=30, res_set=ProcSet((5, 9)), ts=False, ph=0
+        ),
+    ]
+
+
+def test_array_split_slots_jobs():
+    ss = SlotSet(Slot(1, 0, 0, ProcSet((1, 32)), 1, 100))
+    ass = ArraySlotSet(Slot(1, 0, 0, ProcSet((1, 32)), 1, 100))
+
+    ss.split_slots_jobs(split_jobs_pseudo())
+    ass.split_slots_jobs(split_jobs_pseudo())
+
+    v = slots_2_val(ss.slots)
+    assert slots_2_val(ass.slots) == v
+    assert ass.begins == [b for (b, _, _) in v]
+    assert ass.ends == [e for (_, e, _) in v]
+    assert ass.itvss == [itvs for (_, _, itvs) in v]
+    assert [ass.slots[sid].b for sid in ass.sids] == ass.begins
+
+
+def test_array_add_split_slots_jobs_2_jobs():
+    v = [
+        (10, 19, ProcSet()),
+        (20, 99, ProcSet(*[(40, 50)])),
+        (100, 129, ProcSet(*[(10, 20), (40, 50)])),
+        (130, 219, ProcSet(*[(40, 50)])),
+        (220, MAX_TIME, ProcSet()),
+    ]
+
+    ss = ArraySlotSet((ProcSet(), 10))
+
+    j1 = JobPseudo(
+        id=1, start_time=100, walltime=30, res_set=ProcSet(*[(10, 20)]), ts=False, ph=0
+    )
+
+    j2 = JobPseudo(
+        id=2, start_time=20, walltime=200, res_set=ProcSet(*[(40, 50)]), ts=False, ph=0
+    )
+
+    ss.split_slots_jobs([j1, j2], False)
+
+    assert compare_slots_val_ref(ss.slots, v)
+    assert ss.itvss == [itvs for (_, _, itvs) in v]
+
+
+def test_array_slot_set_lookups():
+    ss = SlotSet(Slot(1, 0, 0, ProcSet((1, 32)), 1, 100))
+    ass = ArraySlotSet(Slot(1, 0, 0, ProcSet((1, 32)), 1, 100))
+    ss.split_slots_jobs(split_jobs_pseudo())
+    ass.split_slots_jobs(split_jobs_pseudo())
+
+    for t in [0, 1, 5, 6, 14, 15, 59, 100]:
+        assert ass.first_slot_from(t) == ss.first_slot_from(t)
+    assert ass.first_slot_from(101) == ss.first_slot_from(101) == 0
+
+    for t_begin, t_end in [(1, 1), (3, 40), (12, 51), (52, 100)]:
+        sids = ass.encompassing_slots(t_begin, t_end)
+        assert sids == ss.encompassing_slots(t_begin, t_end)
+        assert ass.intersec_itvs(*sids) == ss.intersec_itvs(*sids)
+
+    sid = ass.first_slot_from(5)
+    for walltime in [1, 10, 50, 96]:
+        assert ass.slot_reaching_walltime(sid, sid, walltime) == (
+            ss.slot_reaching_walltime(sid, sid, walltime)
+        )
+    assert ass.slot_reaching_walltime(sid, sid, 97) == 0
+
+
+def test_new_slot_set():
+    assert type(new_slot_set((ProcSet((1, 32)), 0))) is SlotSet
+    config["KAMELOT_SLOTSET_MODE"] = "array"
+    try:
+        assert type(new_slot_set((ProcSet((1, 32)), 0))) is ArraySlotSet
+    finally:
+        config["KAMELOT_SLOTSET_MODE"] = "default"
+
+
+def test_slot_set_copy():
+    for slot_set_class in [SlotSet, ArraySlotSet]:
+        ss = slot_set_class(Slot(1, 0, 0, ProcSet((1, 32)), 1, 100))
+        ss.split_slots_jobs(split_jobs_pseudo())
+        v = slots_2_val(ss.slots)
+
+        ss_copy = ss.copy()
+        assert type(ss_copy) is slot_set_class
+        assert slots_2_val(ss_copy.slots) == v
+
+        j = JobPseudo(
+            id=5, start_time=1, walltime=100, res_set=ProcSet((1, 32)), ts=False, ph=0
+        )
+        ss_copy.split_slots_jobs([j])
+        assert slots_2_val(ss.slots) == v
+        assert all(not slot.itvs for slot in ss_copy.slots.values())
+
+
+def test_slot_set_advance_to():
+    for slot_set_class in [SlotSet, ArraySlotSet]:
+        ss = slot_set_class(Slot(1, 0, 0, ProcSet((1, 32)), 1, 100))
+        ss.split_slots_jobs(split_jobs_pseudo())
+        v = slots_2_val(ss.slots)
+
+        ss.advance_to(13)
+        assert ss.begin == 13
+        assert ss.slots[1].prev == 0
+        assert slots_2_val(ss.slots) == [(13, 14, v[2][2])] + v[3:]
+        assert len(ss.slots) == len(v) - 2
+
+        ss.split_slots_jobs(
+            [
+                JobPseudo(
+                    id=5,
+                    start_time=20,
+                    walltime=10,
+                    res_set=ProcSet((32, 32)),
+                    ts=False,
+                    ph=0,
+                )
+            ]
+        )
+        assert slots_2_val(ss.slots)[1:3] == [
+            (15, 19, v[3][2]),
+            (20, 29, v[3][2] - ProcSet((32, 32))),
+        ]
+        if slot_set_class is ArraySlotSet:
+            assert ss.begins == [b for (b, _, _) in slots_2_val(ss.slots)]
+
+
+def test_slot_set_invalidate_cache():
+    for slot_set_class in [SlotSet, ArraySlotSet]:
+        ss = slot_set_class(Slot(1, 0, 0, ProcSet((1, 32)), 1, 100))
+        ss.split_slots_jobs(
+            [
+                JobPseudo(id=1, start_time=20, walltime=10, res_set=ProcSet((1, 8))),
+                JobPseudo(id=2, start_time=50, walltime=10, res_set=ProcSet((1, 8))),
+            ]
+        )
+        sids = {b: slot.id for slot in ss.slots.values() for b in [slot.b]}
+        # keys are signatures beginning with the walltime
+        ss.cache = {
+            RequestSignature(10, []): sids[1],
+            RequestSignature(11, []): sids[20],
+            RequestSignature(12, []): sids[20],
+            RequestSignature(1, []): sids[30],
+            RequestSignature(2, []): sids[50],
+        }
+
+        # resources are substracted, cache entries are kept
+        ss.split_slots_jobs(
+            [JobPseudo(id=3, start_time=1, walltime=100, res_set=ProcSet(32))]
+        )
+        assert len(ss.cache) == 5
+
+        # resources are added from time 30, jobs beginning before the slot of an
+        # entry could be suitable if they end at or after 30
+        ss.split_slots_jobs(
+            [JobPseudo(id=4, start_time=30, walltime=40, res_set=ProcSet(32))], False
+        )
+        assert sorted(key[0] for key in ss.cache) == [1, 10, 11]
+
+
+def test_slot_split_shares_resources():
+    ss = SlotSet(Slot(1, 0, 0, ProcSet((1, 32)), 1, 100))
+    assert not hasattr(ss.slots[1], "__dict__")
+
+    j1 = JobPseudo(
+        id=1,
+        start_time=10,
+        walltime=20,
+        res_set=ProcSet((1, 8)),
+        ts=True,
+        ts_user="toto",
+        ts_name="*",
+        ph=0,
+    )
+    ss.split_slots_jobs([j1])
+    a_slot, b_slot, c_slot = [ss.slots[sid] for sid in [1, 2, 3]]
+    assert a_slot.itvs is c_slot.itvs
+    assert a_slot.ts_itvs is c_slot.ts_itvs
+    assert (dict(a_slot.ts_itvs), b_slot.ts_itvs) == ({}, {"toto": {"*": j1.res_set}})
+
+    # dicts of a split slot are not modified by the other parts
+    ss.split_slots_jobs(
+        [
+            JobPseudo(
+                id=2,
+                start_time=10,
+                walltime=5,
+                res_set=ProcSet(9),
+                ts=True,
+                ts_user="titi",
+                ts_name="*",
+                ph=0,
+            )
+        ]
+    )
+    slots = {slot.b: slot for slot in ss.slots.values()}
+    assert slots[10].ts_itvs == {"toto": {"*": j1.res_set}, "titi": {"*": ProcSet(9)}}
+    assert slots[15].ts_itvs == {"toto": {"*": j1.res_set}}
+    assert slots[1].ts_itvs == {}
@@ -1,14 +1,16 @@
 # coding: utf-8
+import json
 import time
 from copy import deepcopy
 from datetime import datetime, timedelta
+from tempfile import mkstemp
 
 import pytest
 from procset import ProcSet
 
 from oar.kao.quotas import Calendar, Quotas
 from oar.kao.scheduling import schedule_id_jobs_ct
-from oar.kao.slot import Slot, SlotSet
+from oar.kao.slot import MAX_TIME, Slot, SlotSet
 from oar.lib import config, get_logger
 from oar.lib.job_handling import JobPseudo
 from oar.lib.resource import ResourceSet
@@ -197,6 +199,34 @@ def test_calendar_rules_at_2():
     assert remaining_period == 129600
 
 
+def test_calendar_rules_file_reload_without_calendar():
+    # a daemon (kao --daemon) loads the rules at each round, temporal rules removed
+    # from the file are not enforced anymore
+    config["QUOTAS_PERIOD"] = 3 * 7 * 86400  # 3 weeks
+    _, quotas_file_name = mkstemp()
+    config["QUOTAS_CONF_FILE"] = quotas_file_name
+    res = ProcSet(*[(1, 32)])
+    t0 = period_weekstart()
+
+    with open(quotas_file_name, "w", encoding="utf-8") as quotas_fd:
+        rules = dict(rules_example_simple, job_types=["yop"])
+        quotas_fd.write(json.dumps(rules))
+    Quotas.enable()
+    assert Quotas.calendar is not None
+    assert Quotas.job_types == ["*", "yop"]
+    ss = SlotSet(Slot(1, 0, 0, res, t0, t0 + 4 * 86400))
+    assert ss.slots[1].quotas_rules_id == 0
+
+    with open(quotas_file_name, "w", encoding="utf-8") as quotas_fd:
+        quotas_fd.write("{}")
+    Quotas.enable()
+    assert Quotas.calendar is None
+    assert Quotas.default_rules == {}
+    assert Quotas.job_types == ["*"]
+    ss = SlotSet(Slot(1, 0, 0, res, t0, t0 + 4 * 86400))
+    assert [slot.quotas_rules_id for slot in ss.slots.values()] == [-1]
+
+
 def test_calendar_simple_slotSet_1():
     config["QUOTAS_PERIOD"] = 3 * 7 * 86400  # 3 weeks
     Quotas.enabled = True
@@ -545,3 +575,136 @@ def test_temporal_quotas_window_time_limit_reached():
 
     assert j1.res_set == ProcSet(*[(1, 24)])
     assert j2.res_set == ProcSet()
+
+
+def test_calendar_rules_at_3():
+    config["QUOTAS_PERIOD"] = 3 * 7 * 86400  # 3 weeks
+    Quotas.enabled = True
+    Quotas.calendar = Calendar(rules_example_simple)
+    t0 = period_weekstart()
+
+    assert Quotas.calendar.rules_at(t0 + 86400) == (0, 2 * 86400)
+    assert Quotas.calendar.rules_at(t0 + 4 * 86400) == (1, 3 * 86400)
+
+
+def test_calendar_transitions():
+    config["QUOTAS_PERIOD"] = 3 * 7 * 86400  # 3 weeks
+    Quotas.enabled = True
+    Quotas.calendar = Calendar(rules_example_simple)
+    t0 = period_weekstart()
+
+    calendar = Quotas.calendar
+    assert calendar.transitions(t0) == t0 + 3 * 7 * 86400
+    assert calendar.table_times[:4] == [
+        t0,
+        t0 + 3 * 86400,
+        t0 + 7 * 86400,
+        t0 + 10 * 86400,
+    ]
+    assert calendar.table_rules_ids[:4] == [0, 1, 0, 1]
+    assert calendar.table_end >= t0 + config["QUOTAS_WINDOW_TIME_LIMIT"]
+
+    assert calendar.table_rules_at(t0) == calendar.rules_at(t0)
+    for t in [t0 + 3600, t0 + 3 * 86400, t0 + 12 * 86400 + 1]:
+        assert calendar.table_rules_at(t) == calendar.rules_at(t)
+
+    # beyond the table, it is extended
+    t = calendar.table_end + 7 * 86400
+    assert calendar.table_rules_at(t) == calendar.rules_at(t)
+    assert calendar.table_end > t
+
+
+def test_calendar_transitions_earlier_begin():
+    config["QUOTAS_PERIOD"] = 3 * 7 * 86400  # 3 weeks
+    Quotas.enabled = True
+    Quotas.calendar = Calendar(rules_example_simple)
+    t0 = period_weekstart()
+
+    calendar = Quotas.calendar
+    calendar.transitions(t0)
+    table_times = list(calendar.table_times)
+
+    # container slot sets begin at 1, the table is not built again from it
+    ss = SlotSet(Slot(1, 0, 0, ProcSet(), 1, MAX_TIME))
+    assert (calendar.table_begin, calendar.table_times) == (t0, table_times)
+    assert ss.slots[1].quotas_rules_id != -1
+
+    # before the table, rules are looked up directly until its beginning
+    t = t0 - 7 * 86400 + 3600
+    assert calendar.table_rules_at(t) == calendar.rules_at(t)
+    rules_id, _ = calendar.rules_at(t0 - 1)
+    assert calendar.table_rules_at(t0 - 1) == (rules_id, 1)
+
+    # a slot set beginning after the table builds it again
+    t1 = calendar.table_end + 7 * 86400
+    calendar.transitions(t1)
+    assert calendar.table_begin == t1
+
+
+def test_temporal_quotas_lazy_split(monkeypatch):
+    monkeypatch.setitem(config, "QUOTAS_CALENDAR_SPLIT", "lazy")
+    config["QUOTAS_PERIOD"] = 3 * 7 * 86400  # 3 weeks
+    Quotas.enabled = True
+    Quotas.calendar = Calendar(rules_example_simple)
+    res = ProcSet(*[(1, 32)])
+    ResourceSet.default_itvs = ProcSet(*res)
+
+    t0 = period_weekstart()
+    t1 = t0 + 2 * 7 * 86400 - 1
+
+    ss = SlotSet(Slot(1, 0, 0, ProcSet(*res), t0, t1))
+    assert len(ss.slots) == 1
+    assert ss.slots[1].quotas_rules_id == -1
+
+    all_ss = {"default": ss}
+    hy = {"node": [ProcSet(*x) for x in [[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]]}
+
+    j1 = JobPseudo(id=1, queue="default", user="toto", project="")
+    j1.simple_req(("node", 3), 60, res)
+
+    j2 = JobPseudo(id=2, queue="default", user="toto", project="")
+    j2.simple_req(("node", 4), 60, res)
+
+    j3 = JobPseudo(id=3, queue="default", user="toto", project="")
+    j3.simple_req(("node", 1), int(3.5 * 86400), res)
+
+    j4 = JobPseudo(id=4, queue="default", user="toto", project="")
+    j4.simple_req(("node", 1), 60, res)
+
+    schedule_id_jobs_ct(all_ss, {1: j1, 2: j2, 3: j3, 4: j4}, hy, [1, 2, 3, 4], 20)
+
+    # same placements as with slots split at the creation of the slot set
+    assert j1.start_time - t0 == 259200
+    assert j2.start_time == -1
+    assert j3.start_time - t0 == 259260
+    assert j4.start_time - t0 == 0
+
+    # slots are split at rules changes once reached
+    v = []
+    sid = 1
+    while sid:
+        s = ss.slots[sid]
+        v.append((s.b - t0, s.quotas_rules_id))
+        sid = s.next
+    assert v == [
+        (0, 0),
+        (60, 0),
+        (259200, 1),
+        (259260, 1),
+        (561660, 1),
+        (604800, 0),
+        (864000, 1),
+    ]
+
+    # slots after the job are not reached
+    ss = SlotSet(Slot(1, 0, 0, ProcSet(*res), t0, t1))
+    j5 = JobPseudo(id=5, queue="default", user="toto", project="")
+    j5.simple_req(("node", 1), 60, res)
+    schedule_id_jobs_ct({"default": ss}, {5: j5}, hy, [5], 20)
+
+    assert j5.start_time == t0
+    assert sorted((s.b - t0, s.quotas_rules_id) for s in ss.slots.values()) == [
+        (0, 0),
+        (60, 0),
+        (259200, -1),
+    ]
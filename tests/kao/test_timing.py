@@ -0,0 +1,19 @@
+# coding: utf-8
+from oar.kao.timing import RoundTimings
+
+
+def test_round_timings_metrics():
+    timings = RoundTimings()
+    with timings.phase("schedule", queues="default"):
+        pass
+    with timings.phase("schedule", queues="default"):
+        pass
+    timings.count("waiting", 3, queues='a"b')
+    timings.count("waiting", 2, queues='a"b')
+    timings.stop(export=False)
+
+    lines = timings.metrics()
+    assert "# TYPE oar_scheduler_phase_seconds gauge" in lines
+    assert len([line for line in lines if line.startswith("oar_scheduler_phase")]) == 1
+    assert 'oar_scheduler_jobs{kind="waiting",queues="a\\"b"} 5' in lines
+    assert lines[2].startswith("oar_scheduler_round_seconds ")
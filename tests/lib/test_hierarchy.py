@@ -1,9 +1,15 @@
 # coding: utf-8
+import random
+
 from procset import ProcSet
 
+import oar.lib.hierarchy
 from oar.lib.hierarchy import (
+    Hierarchy,
+    HierarchyLevel,
     extract_n_scattered_block_itv,
     find_resource_hierarchies_scattered,
+    ids_procset,
     keep_no_empty_scat_bks,
 )
 
@@ -167,3 +173,68 @@ def test_find_resource_hierarchies_scattere6_fail():
         ProcSet(*[(1, 32)]), [h0, h1, h2], [1, 2, 1]
     )
     assert x == ProcSet(*[(1, 4), (9, 12)])
+
+
+def nodes_cpus_cores_hierarchy(nb_nodes):
+    hy_rid = {"network_address": {}, "cpu": {}, "core": {}}
+    rid = 1
+    for node in range(nb_nodes):
+        for cpu in range(2):
+            for _ in range(4):
+                hy_rid["network_address"].setdefault(node, []).append(rid)
+                hy_rid["cpu"].setdefault((node, cpu), []).append(rid)
+                hy_rid["core"][rid] = [rid]
+                rid += 1
+    return Hierarchy(hy_rid=hy_rid).hy
+
+
+def test_hierarchy_level_children():
+    hy = nodes_cpus_cores_hierarchy(4)
+    assert all(isinstance(level, HierarchyLevel) for level in hy.values())
+
+    nodes = hy["network_address"]
+    children = nodes.children(nodes[1], hy["cpu"])
+    assert children == [ProcSet((9, 12)), ProcSet((13, 16))]
+    assert isinstance(children, HierarchyLevel)
+    assert nodes.children(nodes[1], hy["cpu"]) is children
+    assert nodes.sub_blocks(nodes[1], hy["core"]) == [ProcSet(i) for i in range(9, 17)]
+
+
+def test_find_resource_hierarchies_scattered_hierarchy_level():
+    random.seed(0)
+    hy = nodes_cpus_cores_hierarchy(8)
+    levels = [hy["network_address"], hy["cpu"], hy["core"]]
+    plain_levels = [list(level) for level in levels]
+
+    for _ in range(50):
+        itvs = ProcSet((1, 64)) - ProcSet(*random.sample(range(1, 65), 10))
+        for rqts in [[1, 1, 1], [2, 2, 2], [3, 1, 4], [4, 2, 1], [8, 1, 1]]:
+            x = find_resource_hierarchies_scattered(itvs, levels, rqts)
+            assert x == find_resource_hierarchies_scattered(itvs, plain_levels, rqts)
+            # cached
+            assert find_resource_hierarchies_scattered(itvs, levels, rqts) == x
+
+
+def test_find_resource_hierarchies_scattered_cache(monkeypatch):
+    monkeypatch.setattr(oar.lib.hierarchy, "HIERARCHY_SEARCH_CACHE_SIZE", 2)
+    hy = nodes_cpus_cores_hierarchy(4)
+    levels = [hy["network_address"], hy["core"]]
+
+    x = find_resource_hierarchies_scattered(ProcSet((1, 32)), levels, [2, 1])
+    assert x == ProcSet(1, 9)
+    assert len(levels[0].search_cache) == 1
+
+    y = find_resource_hierarchies_scattered(ProcSet((1, 32)), levels, [2, 1])
+    assert (y == x) and (y is not x)
+    assert len(levels[0].search_cache) == 1
+
+    find_resource_hierarchies_scattered(ProcSet((2, 32)), levels, [2, 1])
+    find_resource_hierarchies_scattered(ProcSet((3, 32)), levels, [2, 1])
+    assert len(levels[0].search_cache) == 2
+
+
+def test_ids_procset():
+    random.seed(1)
+    for _ in range(20):
+        ids = random.sample(range(200), random.randint(0, 100))
+        assert ids_procset(ids) == ProcSet(*ids)
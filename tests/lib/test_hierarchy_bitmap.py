@@ -0,0 +1,90 @@
+# coding: utf-8
+import random
+
+import pytest
+from procset import ProcSet
+
+from oar.lib.hierarchy import Hierarchy, find_resource_hierarchies_scattered
+from oar.lib.hierarchy_bitmap import (
+    BitmapLevel,
+    bitmap_available,
+    find_resource_hierarchies_bitmap,
+    procset_from_ids,
+    procset_to_bitmap,
+)
+
+pytestmark = pytest.mark.skipif(not bitmap_available(), reason="NumPy not installed")
+
+
+def nodes_cpus_cores_hy_rid(nb_nodes):
+    hy_rid = {"network_address": {}, "cpu": {}, "core": {}}
+    rid = 1
+    for node in range(nb_nodes):
+        for cpu in range(2):
+            for _ in range(4):
+                hy_rid["network_address"].setdefault(node, []).append(rid)
+                hy_rid["cpu"].setdefault((node, cpu), []).append(rid)
+                hy_rid["core"][rid] = [rid]
+                rid += 1
+    return hy_rid
+
+
+def test_procset_bitmap():
+    itvs = ProcSet((1, 4), 7, (10, 12))
+    bitmap = procset_to_bitmap(itvs, 16)
+    assert [i for i, b in enumerate(bitmap) if b] == list(itvs)
+    assert procset_from_ids(bitmap.nonzero()[0]) == itvs
+    assert procset_from_ids([]) == ProcSet()
+    # resources beyond the size are ignored
+    assert procset_from_ids(procset_to_bitmap(itvs, 11).nonzero()[0]) == ProcSet(
+        (1, 4), 7, 10
+    )
+
+
+def test_find_resource_hierarchies_bitmap():
+    random.seed(0)
+    hy_rid = nodes_cpus_cores_hy_rid(8)
+    hy = Hierarchy(hy_rid=hy_rid, backend="numpy").hy
+    plain_hy = Hierarchy(hy_rid=hy_rid).hy
+
+    for labels in [["core"], ["network_address", "core"], ["cpu", "core"]] + [
+        ["network_address", "cpu", "core"]
+    ]:
+        levels = [hy[label] for label in labels]
+        plain_levels = [list(plain_hy[label]) for label in labels]
+        for _ in range(20):
+            itvs = ProcSet((1, 64)) - ProcSet(*random.sample(range(1, 65), 12))
+            for rqts in [[1, 1, 1], [2, 2, 2], [3, 1, 4], [4, 2, 1], [8, 1, 1]]:
+                rqts = rqts[: len(labels)]
+                x = find_resource_hierarchies_bitmap(
+                    itvs, [level.bitmap for level in levels], rqts
+                )
+                assert x == find_resource_hierarchies_scattered(
+                    itvs, plain_levels, rqts
+                )
+                assert find_resource_hierarchies_scattered(itvs, levels, rqts) == x
+
+
+def test_find_resource_hierarchies_bitmap_not_enough():
+    hy = Hierarchy(hy_rid=nodes_cpus_cores_hy_rid(2), backend="numpy").hy
+    levels = [hy["network_address"].bitmap, hy["core"].bitmap]
+    assert find_resource_hierarchies_bitmap(ProcSet((1, 16)), levels, [3, 1]) == (
+        ProcSet()
+    )
+    assert find_resource_hierarchies_bitmap(ProcSet((2, 16)), levels, [2, 8]) == (
+        ProcSet()
+    )
+    assert find_resource_hierarchies_bitmap(ProcSet((2, 16)), levels, [1, 8]) == (
+        ProcSet((9, 16))
+    )
+
+
+def test_find_resource_hierarchies_bitmap_not_nested():
+    h0 = [ProcSet((1, 16)), ProcSet((17, 32))]
+    h1 = [ProcSet((1, 8)), ProcSet((9, 20)), ProcSet((21, 32))]
+    levels = [BitmapLevel(h0), BitmapLevel(h1)]
+    assert find_resource_hierarchies_bitmap(ProcSet((1, 32)), levels, [2, 1]) is None
+
+    # overlapping blocks
+    levels = [BitmapLevel([ProcSet((1, 16)), ProcSet((9, 32))]), BitmapLevel(h1)]
+    assert find_resource_hierarchies_bitmap(ProcSet((1, 32)), levels, [2, 1]) is None
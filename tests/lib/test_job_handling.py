@@ -1,10 +1,45 @@
 # coding: utf-8
 import pytest
+from procset import ProcSet
 
+import oar.lib.resource_handling
 import oar.lib.tools  # for monkeypatching
 from oar.kao.platform import Platform
-from oar.lib import EventLog, config, db
-from oar.lib.job_handling import check_end_of_job, get_data_jobs, insert_job
+from oar.lib import (
+    AssignedResource,
+    EventLog,
+    GanttJobsPrediction,
+    GanttJobsResource,
+    Job,
+    JobDependencie,
+    MoldableJobDescription,
+    Resource,
+    ResourceLog,
+    config,
+    db,
+)
+from oar.lib.job_handling import (
+    JobPseudo,
+    add_resource_job_pairs,
+    check_end_of_job,
+    extract_scheduled_jobs,
+    gantt_remove_jobs,
+    gantt_resources_model,
+    get_data_jobs,
+    get_gantt_resources,
+    insert_job,
+    remove_gantt_resource_job,
+    save_assigns,
+    save_assigns_bulk,
+)
+from oar.lib.resource import ResourceSet
+from oar.lib.resource_handling import (
+    get_resource_set_snapshot,
+    get_resources_constraints,
+    normalize_sql_constraints,
+    set_resource_nextState,
+    set_resource_state,
+)
 
 
 @pytest.fixture(scope="function", autouse=True)
@@ -91,3 +126,256 @@ def test_get_data_jobs_moldable(monkeypatch):
         test_nb_mold = job_and_nb_moldable[1]
         # Assert that the jobs has two moldable
         assert len(jobs[0][test_job_id].mld_res_rqts) == test_nb_mold
+
+
+def test_get_data_jobs_constraints_types_dependencies():
+    for i in range(4):
+        Resource.create(network_address="localhost" + str(i // 2))
+    db.commit()
+
+    job_id_1 = insert_job(res=[(60, [("resource_id=2", "")])], properties="")
+    job_id_2 = insert_job(
+        res=[(60, [("resource_id=1", "network_address='localhost1'")])],
+        properties="resource_id > 1",
+        types=["timesharing=*,*", "besteffort"],
+    )
+    db.session.execute(
+        JobDependencie.__table__.insert(),
+        [{"job_id": job_id_2, "job_id_required": job_id_1}],
+    )
+
+    plt = Platform()
+    resource_set = plt.resource_set()
+    jobs, jids, _ = plt.get_waiting_jobs("default")
+    get_data_jobs(jobs, jids, resource_set, 5)
+
+    (_, _, [(_, res_constraints)]) = jobs[job_id_2].mld_res_rqts[0]
+    assert (
+        res_constraints
+        == get_resources_constraints(
+            ["resource_id > 1 AND network_address='localhost1'"], resource_set
+        )["resource_id > 1 AND network_address='localhost1'"]
+    )
+    assert len(res_constraints) == 2
+
+    assert jobs[job_id_2].ts
+    assert jobs[job_id_2].types == {"besteffort": ""}
+    assert jobs[job_id_2].deps == [(job_id_1, "Waiting", None)]
+    assert jobs[job_id_1].deps == []
+
+
+def test_get_resources_constraints(monkeypatch):
+    monkeypatch.setattr(
+        oar.lib.resource_handling, "RESOURCES_CONSTRAINTS_BATCH_SIZE", 2
+    )
+    for i in range(4):
+        Resource.create(network_address="localhost" + str(i // 2))
+    db.commit()
+
+    resource_set = Platform().resource_set()
+    constraints = [
+        "network_address='localhost0'",
+        "network_address='localhost1'",
+        "resource_id > 1 OR network_address='localhost0'",
+        "network_address='localhost2'",
+    ]
+    resources_constraints = get_resources_constraints(constraints, resource_set)
+
+    for constraint in constraints:
+        roids = [
+            resource_set.rid_i2o[r.id]
+            for r in db.query(Resource).filter(db.text(constraint))
+        ]
+        assert resources_constraints[constraint] == ProcSet(*roids)
+    assert len(resources_constraints["network_address='localhost2'"]) == 0
+
+
+def test_normalize_sql_constraints():
+    assert (
+        normalize_sql_constraints("  cluster='a  b'   AND\n gpu = 'YES' ")
+        == "cluster='a  b' AND gpu = 'YES'"
+    )
+    assert normalize_sql_constraints("name = 'it''s  x'") == "name = 'it''s  x'"
+
+
+def test_get_resources_constraints_cache():
+    for i in range(4):
+        Resource.create(network_address="localhost" + str(i // 2))
+    db.commit()
+
+    resource_set = Platform().resource_set()
+    constraint = "network_address='localhost0'"
+    itvs = get_resources_constraints([constraint], resource_set)[constraint]
+    assert len(itvs) == 2
+
+    same_constraint = " network_address='localhost0'  "
+    assert get_resources_constraints([same_constraint], resource_set) == {
+        same_constraint: itvs
+    }
+    assert list(oar.lib.resource_handling.resources_constraints_cache) == [constraint]
+
+    # changes of resources not logged in resource_logs invalidate the cache too
+    resource_ids = [r.id for r in db.query(Resource).order_by(Resource.id)]
+    nb_logs = db.query(ResourceLog).count()
+    db.query(Resource).filter(Resource.id == resource_ids[2]).update(
+        {Resource.network_address: "localhost0"}, synchronize_session=False
+    )
+    db.commit()
+    assert len(get_resources_constraints([constraint], resource_set)[constraint]) == 3
+
+    next_state = "next_state='Absent'"
+    assert len(get_resources_constraints([next_state], resource_set)[next_state]) == 0
+    set_resource_nextState(resource_ids[3], "Absent")
+    assert len(get_resources_constraints([next_state], resource_set)[next_state]) == 1
+    assert db.query(ResourceLog).count() == nb_logs
+
+    # change of resources invalidates the cache
+    set_resource_state(resource_ids[3], "Absent", "NO")
+    db.commit()
+    assert len(get_resources_constraints([constraint], resource_set)[constraint]) == 3
+
+
+def test_get_resource_set_snapshot():
+    for i in range(4):
+        Resource.create(network_address="localhost" + str(i // 2))
+    db.commit()
+
+    snapshot = get_resource_set_snapshot()
+    resource_set = ResourceSet()
+    assert snapshot.resources_db is None
+    assert snapshot.roid_itvs == resource_set.roid_itvs
+    for label in ("resource_id", "network_address"):
+        assert list(snapshot.hierarchy[label]) == list(resource_set.hierarchy[label])
+    constraint = "network_address='localhost1'"
+    assert snapshot.resources_properties().evaluate(
+        constraint
+    ) == resource_set.resources_properties().evaluate(constraint)
+    assert get_resource_set_snapshot() is snapshot
+
+    # change of resources invalidates the snapshot
+    set_resource_state(db.query(Resource.id).first()[0], "Dead", "NO")
+    db.commit()
+    assert get_resource_set_snapshot() is not snapshot
+    assert len(get_resource_set_snapshot().roid_itvs) == 3
+
+
+def test_extract_scheduled_jobs_suspended():
+    for i in range(4):
+        Resource.create(
+            network_address="localhost" + str(i // 2),
+            type="default" if i < 3 else "licence",
+        )
+    db.commit()
+    rids = [r.id for r in db.query(Resource).order_by(Resource.id)]
+    resource_set = Platform().resource_set()
+    result = []
+    resources = {}
+    for i in range(2):
+        job_id = insert_job(
+            res=[(60, [("resource_id=2", "")])], properties="", state="Suspended"
+        )
+        job = db.query(Job).get(job_id)
+        moldable_id = (
+            db.query(MoldableJobDescription.id)
+            .filter(MoldableJobDescription.job_id == job_id)
+            .scalar()
+        )
+        result.append((job, moldable_id, 10, 60))
+        resources[moldable_id] = ProcSet(*rids[2 * i : 2 * i + 2])
+
+    jobs, jobs_lst, jids, rid2jid = extract_scheduled_jobs(
+        result, resources, resource_set, 60, 100
+    )
+    # suspendable resources (default type) are available for other jobs, for each
+    # suspended job and not only the last one
+    assert jobs_lst[0].res_set == ProcSet()
+    assert jobs_lst[1].res_set == ProcSet(resource_set.rid_i2o[rids[3]])
+
+
+def assigns_for_test():
+    for i in range(4):
+        Resource.create(network_address="localhost" + str(i // 2))
+    db.commit()
+    job_ids = [
+        insert_job(res=[(60, [("resource_id=2", "")])], properties="") for _ in range(3)
+    ]
+    resource_set = Platform().resource_set()
+    jobs = [
+        JobPseudo(
+            id=job_id,
+            moldable_id=db.query(MoldableJobDescription.id)
+            .filter(MoldableJobDescription.job_id == job_id)
+            .scalar(),
+            start_time=start_time,
+            walltime=60,
+            type="PASSIVE",
+            res_set=ProcSet((i, i + 1)),
+        )
+        for i, (job_id, start_time) in enumerate(zip(job_ids, [10, 70, -1]))
+    ]
+    return (jobs, resource_set)
+
+
+def check_saved_assigns(jobs, resource_set):
+    predictions = db.query(
+        GanttJobsPrediction.moldable_id, GanttJobsPrediction.start_time
+    ).all()
+    assert sorted(predictions) == [(j.moldable_id, j.start_time) for j in jobs[:2]]
+    assert get_gantt_resources() == {
+        j.moldable_id: ProcSet(*[resource_set.rid_o2i[rid] for rid in j.res_set])
+        for j in jobs[:2]
+    }
+    messages = dict(db.query(Job.id, Job.message).all())
+    assert messages[jobs[0].id].startswith("R=2,W=60,J=P,Q=default")
+    assert messages[jobs[2].id] == ""
+
+
+@pytest.mark.parametrize("gantt_resources_storage", ["default", "intervals"])
+@pytest.mark.parametrize("save_assigns_mode", ["default", "copy"])
+def test_save_assigns(monkeypatch, save_assigns_mode, gantt_resources_storage):
+    # copy mode falls back to INSERT statements without PostgreSQL
+    monkeypatch.setitem(config, "SCHEDULER_SAVE_ASSIGNS_MODE", save_assigns_mode)
+    monkeypatch.setitem(config, "GANTT_RESOURCES_STORAGE", gantt_resources_storage)
+    jobs, resource_set = assigns_for_test()
+    save_assigns(jobs, resource_set)
+    check_saved_assigns(jobs, resource_set)
+
+
+@pytest.mark.skipif(
+    "os.environ.get('DB_TYPE', '') != 'postgresql'", reason="need postgresql database"
+)
+def test_save_assigns_bulk():
+    jobs, resource_set = assigns_for_test()
+    save_assigns_bulk(jobs, resource_set)
+    check_saved_assigns(jobs, resource_set)
+
+
+@pytest.mark.parametrize("gantt_resources_storage", ["default", "intervals"])
+def test_gantt_resources_storage(monkeypatch, gantt_resources_storage):
+    monkeypatch.setitem(config, "GANTT_RESOURCES_STORAGE", gantt_resources_storage)
+    jobs, resource_set = assigns_for_test()
+    jobs[0].res_set = ProcSet((0, 1), 3)
+    save_assigns(jobs, resource_set)
+
+    nb_rows = db.query(gantt_resources_model()).count()
+    assert nb_rows == (3 if gantt_resources_storage == "intervals" else 5)
+    assert db.query(GanttJobsResource).count() == (
+        0 if gantt_resources_storage == "intervals" else 5
+    )
+
+    mld_id = jobs[0].moldable_id
+    remove_gantt_resource_job(mld_id, ProcSet(1, 3), resource_set)
+    assert get_gantt_resources([mld_id]) == {
+        mld_id: ProcSet(resource_set.rid_o2i[1], resource_set.rid_o2i[3])
+    }
+
+    add_resource_job_pairs(mld_id)
+    assert sorted(
+        r[0]
+        for r in db.query(AssignedResource.resource_id).filter(
+            AssignedResource.moldable_id == mld_id
+        )
+    ) == [resource_set.rid_o2i[1], resource_set.rid_o2i[3]]
+
+    gantt_remove_jobs([mld_id])
+    assert list(get_gantt_resources()) == [jobs[1].moldable_id]
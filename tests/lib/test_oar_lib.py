@@ -23,6 +23,7 @@ def test_all_module_api():
         "GanttJobsPredictionsLog",
         "GanttJobsPredictionsVisu",
         "GanttJobsResource",
+        "GanttJobsResourcesInterval",
         "GanttJobsResourcesLog",
         "GanttJobsResourcesVisu",
         "InvalidConfiguration",
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import os
+from struct import pack
 
 import pytest
 
@@ -9,6 +10,14 @@ from oar.lib.fixture import load_fixtures
 REFTIME = 1437050120
 
 
+class FakeCursor(object):
+    def __init__(self):
+        self.copies = []
+
+    def copy_expert(self, query, buf):
+        self.copies.append((query, buf.read()))
+
+
 @pytest.fixture(scope="function", autouse=True)
 def minimal_db_initialization(request):
     with db.session(ephemeral=True):
@@ -70,3 +79,36 @@ def test_pg_bulk_insert_csv():
         assert queue.priority == row[1]
         assert queue.scheduler_policy == row[2]
         assert queue.state == row[3]
+
+
+def test_pg_bulk_insert_binary_encoding():
+    from oar.lib.psycopg2 import pg_bulk_insert
+
+    cursor = FakeCursor()
+    columns = ("queue_name", "priority", "scheduler_policy", "state")
+    rows = [("vip", 10, "FIFO", "Active"), ("old", -1, None, "Inactive")]
+    pg_bulk_insert(cursor, db["queues"], rows, columns, binary=True)
+
+    [(query, data)] = cursor.copies
+    assert query == (
+        "COPY queues(queue_name, priority, scheduler_policy, state) "
+        "FROM STDIN WITH BINARY"
+    )
+    assert data == (
+        # signature, flags and header extension length
+        b"PGCOPY\n\377\r\n\0"
+        + pack("!ii", 0, 0)
+        # rows: number of fields, then length and value of each field (-1 is NULL)
+        + pack("!h", 4)
+        + pack("!i3s", 3, b"vip")
+        + pack("!ii", 4, 10)
+        + pack("!i4s", 4, b"FIFO")
+        + pack("!i6s", 6, b"Active")
+        + pack("!h", 4)
+        + pack("!i3s", 3, b"old")
+        + pack("!ii", 4, -1)
+        + pack("!i", -1)
+        + pack("!i8s", 8, b"Inactive")
+        # trailer
+        + pack("!h", -1)
+    )
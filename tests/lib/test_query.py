@@ -33,6 +33,7 @@ def test_simple_models():
         "GanttJobsPredictionsLog",
         "GanttJobsPredictionsVisu",
         "GanttJobsResource",
+        "GanttJobsResourcesInterval",
         "GanttJobsResourcesLog",
         "GanttJobsResourcesVisu",
         "Job",
@@ -51,8 +52,8 @@ def test_simple_models():
     assert set(list(db.models.keys())) == set(expected_models)
     assert set(list(dict(all_models()).keys())) == set(expected_models)
 
-    # len(tables) = len(Models) + table schema
-    assert len(dict(all_tables()).keys()) == len(expected_models) + 1
+    # len(tables) = len(Models) + tables schema and resources_version
+    assert len(dict(all_tables()).keys()) == len(expected_models) + 2
 
 
 def test_get_jobs_for_user_query():
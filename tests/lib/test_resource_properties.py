@@ -0,0 +1,92 @@
+# coding: utf-8
+import pytest
+from procset import ProcSet
+
+from oar.lib import Resource, config, db
+from oar.lib.resource import ResourceSet
+from oar.lib.resource_handling import get_resources_constraints
+from oar.lib.resource_properties import UnsupportedConstraints, like_to_regex
+
+
+@pytest.fixture(scope="function", autouse=True)
+def minimal_db_initialization(request):
+    with db.session(ephemeral=True):
+        for i in range(8):
+            Resource.create(
+                network_address="node-" + str(i // 2),
+                type="default" if i < 6 else "licence",
+                cpu=i // 2,
+                core=i if i != 5 else None,
+                host="host_" + str(i % 3),
+            )
+        db.commit()
+        yield
+
+
+def sql_evaluation(sql_constraints, resource_set):
+    resources = db.query(Resource.id).filter(db.text(sql_constraints))
+    return ProcSet(*[resource_set.rid_i2o[int(r[0])] for r in resources])
+
+
+@pytest.mark.parametrize(
+    "sql_constraints",
+    [
+        "network_address='node-1'",
+        "network_address = 'node-1' OR network_address='node-3'",
+        "network_address <> 'node-1'",
+        "type = 'default' AND cpu >= 1",
+        "type='licence' or (cpu < 2 AND core > 0)",
+        "core != 3",
+        "core <= 5",
+        "cpu = '2'",
+        "resource_id > 3",
+        "network_address IN ('node-0', 'node-2')",
+        "core NOT IN (1, 2, 3)",
+        "host LIKE 'host_1'",
+        "network_address LIKE 'node-%' AND host NOT LIKE '%2'",
+        "network_address like 'node-_'",
+        "((cpu = 1) OR (cpu = 3)) AND core IN (2, 6, 7)",
+    ],
+)
+def test_resources_properties_evaluate(sql_constraints):
+    resource_set = ResourceSet()
+    properties = resource_set.resources_properties()
+    assert properties.evaluate(sql_constraints) == sql_evaluation(
+        sql_constraints, resource_set
+    )
+
+
+@pytest.mark.parametrize(
+    "sql_constraints",
+    [
+        "network_address > 'node-1'",
+        "NOT cpu = 1",
+        "core IS NULL",
+        "cpu + 1 = 2",
+        "unknown_property = 'x'",
+        "network_address = 1",
+        "cpu = 1 AND",
+        "lower(network_address) = 'node-1'",
+    ],
+)
+def test_resources_properties_unsupported(sql_constraints):
+    properties = ResourceSet().resources_properties()
+    with pytest.raises(UnsupportedConstraints):
+        properties.evaluate(sql_constraints)
+
+
+def test_like_to_regex():
+    assert like_to_regex("a%b_c").fullmatch("axyzb-c")
+    assert not like_to_regex("a\\%").fullmatch("ab")
+    assert like_to_regex("a\\%").fullmatch("a%")
+
+
+def test_get_resources_constraints_memory(monkeypatch):
+    monkeypatch.setitem(config, "RESOURCES_PROPERTIES_EVALUATION", "memory")
+    resource_set = ResourceSet()
+    constraints = ["cpu = 1", "lower(host) = 'host_1'"]
+    resources_constraints = get_resources_constraints(constraints, resource_set)
+    for sql_constraints in constraints:
+        assert resources_constraints[sql_constraints] == sql_evaluation(
+            sql_constraints, resource_set
+        )
@@ -1,11 +1,30 @@
 # coding: utf-8
+import os
+
 import pytest
 
+import oar.lib.submission
 import oar.lib.tools  # for monkeypatching
 from oar.kao.quotas import Quotas
-from oar.lib import AdmissionRule, config, db
+from oar.lib import (
+    AdmissionRule,
+    Job,
+    JobResourceDescription,
+    JobResourceGroup,
+    JobStateLog,
+    MoldableJobDescription,
+    config,
+    db,
+)
 from oar.lib.job_handling import get_job_types
-from oar.lib.submission import JobParameters, add_micheline_jobs, scan_script
+from oar.lib.submission import (
+    JobParameters,
+    add_micheline_jobs,
+    add_micheline_jobs_batch,
+    apply_admission_rules,
+    get_admission_rules,
+    scan_script,
+)
 
 fake_popen_process_stdout = ""
 
@@ -19,7 +38,7 @@ class FakeProcessStdout(object):
 
 
 class FakePopen(object):
-    def __init__(self, cmd, stdout):
+    def __init__(self, cmd, stdout, env=None):
         pass
 
     def communicate(self):
@@ -243,6 +262,138 @@ def test_add_micheline_simple_array_job():
     config["OARSUB_NODES_RESOURCES"] = prev_conf1
 
 
+def test_add_micheline_jobs_batch():
+    jobs_parameters = [default_job_parameters(None) for _ in range(3)]
+    jobs_parameters[0].types = ["foo"]
+    jobs_parameters[1].hold = True
+    jobs_parameters[2].resource = ["resource_id=2,walltime=1:0:0", "resource_id=1"]
+    jobs_parameters[2].resource_request = JobParameters(
+        resource=jobs_parameters[2].resource, user="bob"
+    ).resource_request
+
+    (error, job_id_lst) = add_micheline_jobs_batch(jobs_parameters)
+
+    print("job id:", job_id_lst)
+    assert error == (0, "")
+    assert len(job_id_lst) == 3
+    jobs = db.query(Job).order_by(Job.id).all()
+    assert [j.id for j in jobs] == job_id_lst
+    # admission rule applied, each job is its own array
+    assert [(j.name, j.array_id) for j in jobs] == [("yop", j.id) for j in jobs]
+    assert [j.state for j in jobs] == ["Waiting", "Hold", "Waiting"]
+    assert [
+        s.job_state for s in db.query(JobStateLog).order_by(JobStateLog.job_id)
+    ] == [
+        "Waiting",
+        "Hold",
+        "Waiting",
+    ]
+    assert get_job_types(job_id_lst[0]) == {"foo": True}
+
+    moldables = db.query(MoldableJobDescription).order_by(MoldableJobDescription.id)
+    assert [(m.job_id, m.walltime) for m in moldables] == [
+        (job_id_lst[0], config["DEFAULT_JOB_WALLTIME"]),
+        (job_id_lst[1], config["DEFAULT_JOB_WALLTIME"]),
+        (job_id_lst[2], 3600),
+        (job_id_lst[2], config["DEFAULT_JOB_WALLTIME"]),
+    ]
+    assert db.query(JobResourceGroup).count() == 4
+    values = db.query(JobResourceDescription.value).order_by(
+        JobResourceDescription.group_id
+    )
+    assert [v[0] for v in values] == [1, 1, 2, 1]
+
+
+def test_add_micheline_jobs_batch_error():
+    jobs_parameters = [default_job_parameters(None) for _ in range(2)]
+    jobs_parameters[1].queue = "noexist"
+
+    (error, job_id_lst) = add_micheline_jobs_batch(jobs_parameters)
+
+    assert error == (-8, "job 1: queue noexist does not exist")
+    assert job_id_lst == []
+    assert db.query(Job).count() == 0
+
+
+def test_add_micheline_jobs_batch_array():
+    job_parameters = default_job_parameters(None)
+    job_parameters.array_nb = 2
+
+    (error, job_id_lst) = add_micheline_jobs_batch([job_parameters])
+
+    assert error[0] == -31
+    assert db.query(Job).count() == 0
+
+
+def counting_compile(monkeypatch):
+    compiled = []
+
+    def compile_(source, filename, mode):
+        compiled.append(filename)
+        return compile(source, filename, mode)
+
+    monkeypatch.setattr(oar.lib.submission, "compile", compile_, raising=False)
+    monkeypatch.setattr(oar.lib.submission, "admission_rules_cache", {})
+    return compiled
+
+
+def test_get_admission_rules_cache(monkeypatch):
+    compiled = counting_compile(monkeypatch)
+    rule = db.query(AdmissionRule).one()
+
+    rules = get_admission_rules()
+    assert [name for name, _ in rules] == ["rule " + str(rule.id)]
+    assert get_admission_rules() == rules
+    assert len(compiled) == 1
+
+    db.query(AdmissionRule).update({AdmissionRule.rule: "name='poy'"})
+    job_parameters = default_job_parameters(None)
+    assert apply_admission_rules(job_parameters, get_admission_rules()) == (0, "")
+    assert job_parameters.name == "poy"
+    assert len(compiled) == 2
+    assert len(oar.lib.submission.admission_rules_cache) == 1
+
+
+def test_get_admission_rules_files_cache(monkeypatch, tmp_path):
+    compiled = counting_compile(monkeypatch)
+    monkeypatch.setitem(config, "ADMISSION_RULES_IN_FILES", "yes")
+    monkeypatch.setattr(oar.lib.submission, "ADMISSION_RULES_DIR", str(tmp_path) + "/")
+    (tmp_path / "02_project.py").write_text("project='poy'\n")
+    (tmp_path / "01_name.py").write_text("name='poy'\n")
+    (tmp_path / "README").write_text("not a rule\n")
+
+    rules = get_admission_rules()
+    assert [name for name, _ in rules] == ["01_name.py", "02_project.py"]
+    assert len(compiled) == 2
+    get_admission_rules()
+    assert len(compiled) == 2
+
+    (tmp_path / "02_project.py").write_text("project='yop2'\n")
+    st = os.stat(tmp_path / "02_project.py")
+    os.utime(tmp_path / "02_project.py", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    job_parameters = default_job_parameters(None)
+    assert apply_admission_rules(job_parameters, get_admission_rules()) == (0, "")
+    assert (job_parameters.name, job_parameters.project) == ("poy", "yop2")
+    assert compiled[2:] == [str(tmp_path) + "/02_project.py"]
+
+
+def test_apply_admission_rules_slow_rule(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(
+        oar.lib.submission.logger, "warning", lambda *args: warnings.append(args)
+    )
+    rule = db.query(AdmissionRule).one()
+
+    monkeypatch.setitem(config, "ADMISSION_RULES_SLOW_THRESHOLD", 1e-9)
+    job_parameters = default_job_parameters(None)
+    assert apply_admission_rules(job_parameters, get_admission_rules()) == (0, "")
+    assert [w[1] for w in warnings] == ["rule " + str(rule.id)]
+
+    monkeypatch.setitem(config, "ADMISSION_RULES_SLOW_THRESHOLD", 0)
+    apply_admission_rules(job_parameters, get_admission_rules())
+    assert len(warnings) == 1
+
+
 def test_scan_script(monkeypatch_tools):
     global fake_popen_process_stdout
     fake_popen_process_stdout = (
@@ -1,13 +1,21 @@
 # coding: utf-8
 
 import signal
+import sys
 
 import pytest
 import zmq
 
 import oar.lib.tools
-from oar.lib import config
-from oar.modules.almighty import Almighty, signal_handler
+import oar.modules.almighty
+from oar.kao.quotas import Calendar
+from oar.lib import config, db
+from oar.modules.almighty import (
+    Almighty,
+    run_internal_node_change_state,
+    run_module,
+    signal_handler,
+)
 
 from ..faketools import FakePopen, fake_call, fake_get_date, fake_popen, set_fake_date
 from ..fakezmq import FakeZmq
@@ -168,3 +176,132 @@ def test_almighty_finishTag():
     # This below doesn't work
     # global finishTag
     # finishTag = False
+
+
+def test_almighty_coalesce_commands():
+    almighty = Almighty()
+    almighty.command_queue = ["Qsub"]
+    almighty.add_command("Term")
+    almighty.add_command("Scheduling")
+    almighty.add_command("Qdel")
+    almighty.add_command("FOO")
+    almighty.add_command("FOO")
+    assert almighty.command_queue == ["Qsub", "Qdel", "FOO"]
+
+
+def test_almighty_read_pending_commands():
+    fakezmq.recv_msgs[0] = [
+        {"cmd": "Qsub"},
+        {"cmd": "Qsub"},
+        {"cmd": "Term"},
+        {"cmd": "Qdel"},
+        {"cmd": "Qsub -I"},
+    ]
+    almighty = Almighty()
+    almighty.read_commands()
+    assert almighty.command_queue == ["Qsub", "Qdel"]
+    assert fakezmq.recv_msgs[0] == []
+
+
+@pytest.mark.parametrize(
+    "state_in, module, exit_value, state_out",
+    [
+        ("Check for villains", "sarko", 1, "Leon"),
+        ("Check node states", "finaud", 1, "Change node state"),
+        ("Leon", "leon", 0, "Time update"),
+        ("Change node state", "node_change_state", 2, "Leon"),
+        ("Scheduler", "meta_scheduler", 0, "Time update"),
+    ],
+)
+def test_almighty_internal_modules(
+    state_in, module, exit_value, state_out, monkeypatch
+):
+    set_fake_date(1000)
+    monkeypatch.setattr(oar.modules.almighty, "finishTag", False)
+    monkeypatch.setitem(config, "ALMIGHTY_MODULES_MODE", "internal")
+    called = []
+
+    def run_internal_module():
+        called.append(module)
+        return exit_value
+
+    monkeypatch.setattr(
+        oar.modules.almighty, "run_internal_" + module, run_internal_module
+    )
+    if module != "node_change_state":
+        monkeypatch.setattr(
+            oar.modules.almighty, "run_internal_node_change_state", lambda: 0
+        )
+    almighty = Almighty()
+    fake_popen["cmd"] = None
+    almighty.state = state_in
+    almighty.run(False)
+    assert called == [module]
+    assert almighty.state == state_out
+    assert fake_popen["cmd"] is None
+    set_fake_date(0)
+
+
+def test_almighty_internal_module_failure():
+    def failing_module():
+        raise RuntimeError("module failure")
+
+    assert run_module("failing", failing_module) == 1
+
+
+@pytest.mark.parametrize("code, exit_value", [(None, 0), (2, 2), ("error", 1)])
+def test_almighty_internal_module_exit(code, exit_value):
+    def exiting_module():
+        sys.exit(code)
+
+    assert run_module("exiting", exiting_module) == exit_value
+
+
+def test_almighty_internal_meta_scheduler_exit(monkeypatch):
+    set_fake_date(1000)
+    monkeypatch.setattr(oar.modules.almighty, "finishTag", False)
+    monkeypatch.setitem(config, "ALMIGHTY_MODULES_MODE", "internal")
+    monkeypatch.setattr(
+        oar.modules.almighty, "run_internal_node_change_state", lambda: 0
+    )
+
+    def run_internal_meta_scheduler():
+        # as kao with an unsupported periodical of the quotas calendar
+        Calendar({"periodical": [["* mon 1 *", "quotas_1", "test"]], "quotas_1": {}})
+
+    monkeypatch.setattr(
+        oar.modules.almighty, "run_internal_meta_scheduler", run_internal_meta_scheduler
+    )
+    almighty = Almighty()
+    almighty.state = "Scheduler"
+    almighty.run(False)
+    assert almighty.state == "Scheduler"
+    assert not oar.modules.almighty.finishTag
+    set_fake_date(0)
+
+
+def test_almighty_internal_node_change_state(monkeypatch):
+    with db.session(ephemeral=True):
+        assert run_module("node_change_state", run_internal_node_change_state) == 0
+
+
+def test_almighty_meta_scheduler_daemon(monkeypatch):
+    set_fake_date(1000)
+    monkeypatch.setattr(oar.modules.almighty, "finishTag", False)
+    monkeypatch.setitem(config, "META_SCHED_DAEMON", "yes")
+    monkeypatch.setattr(oar.modules.almighty, "nodeChangeState", lambda: 0)
+
+    class FakeKaoDaemonClient(object):
+        def schedule(self):
+            return 2
+
+    monkeypatch.setattr(
+        oar.modules.almighty, "kao_daemon_client", FakeKaoDaemonClient()
+    )
+    almighty = Almighty()
+    fake_popen["cmd"] = None
+    almighty.state = "Scheduler"
+    almighty.run(False)
+    assert almighty.state == "Leon"
+    assert fake_popen["cmd"] is None
+    set_fake_date(0)